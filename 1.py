@@ -1,12 +1,13 @@
 import threading
 import socket
 import time
-import requests
 import schedule
-from bs4 import BeautifulSoup
 import openpyxl
 from concurrent.futures import ThreadPoolExecutor
 
+from extractor import extract_price
+from fetcher import get_fetcher
+
 EXCEL_FILE = "price_data.xlsx"
 
 
@@ -23,18 +24,13 @@ class ItemThread(threading.Thread):
 
     def crawl_product_price(self):
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
-                "Accept-Language": "ko-KR,ko;q=0.8,en-US;q=0.5,en;q=0.3"
-            }
-            res = requests.get(self.product_link, headers=headers)
-            res.raise_for_status()
-
-            soup = BeautifulSoup(res.text, "html.parser")
-            price_element = soup.select_one(".total-price")
-
-            if price_element:
-                crawled_price = int(price_element.get_text(strip=True).replace(",", "").replace("원", ""))
+            # 공유 Fetcher (keep-alive 커넥션 풀, 호스트별 동시 요청 제한, 재시도)
+            res = get_fetcher().get(self.product_link)
+
+            price = extract_price(res.text)
+
+            if price is not None:
+                crawled_price = price
                 self.client_socket.send(str(crawled_price).encode())
                 current_time = time.strftime("%H:%M")
                 self.hourly_prices.append(crawled_price)
@@ -0,0 +1,112 @@
+import datetime
+import time
+from array import array
+
+from history import HOURS, MISSING, day_number
+from price_store import MONTHLY, WEEKLY, day_of
+
+# numpy가 있으면 상품 x 24 행렬을 한 번에 계산, 없으면 같은 결과를 파이썬 루프로
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INT_MAX = 2 ** 31 - 1
+
+
+class PeriodStats:
+    # 기간 하나(하루)에 대한 모든 상품의 집계 결과 (열 단위 리스트, i번째 값이 links[i] 상품)
+    __slots__ = ("period", "links", "average", "minimum", "maximum", "samples", "missing")
+
+    def __init__(self, period, links, average, minimum, maximum, samples, missing):
+        self.period = period
+        self.links = links
+        self.average = average
+        self.minimum = minimum
+        self.maximum = maximum
+        self.samples = samples
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.links)
+
+    def rows(self):
+        # 가격이 하나라도 수집된 상품만 (link, period, 평균, 최저, 최고, 수집 수, 누락 수)
+        for index, link in enumerate(self.links):
+            if self.samples[index]:
+                yield (link, self.period, self.average[index], self.minimum[index], self.maximum[index],
+                       self.samples[index], self.missing[index])
+
+
+def day_matrix(watches, day):
+    # 감시 중인 상품들의 하루치 24칸을 이어 붙여 상품 x 24 행렬(평평한 array('i'))로 만든다
+    links = []
+    matrix = array("i")
+    empty = array("i", [MISSING]) * HOURS
+    for watch in watches:
+        slots = watch.history.day_slots(day)
+        links.append(watch.product_link)
+        matrix.extend(empty if slots is None else slots)
+    return links, matrix
+
+
+def aggregate(period, links, matrix, width=HOURS):
+    # 행마다 평균(정수 버림), 최저, 최고, 수집된 칸 수, 비어 있는 칸 수
+    if numpy is not None and links:
+        values = numpy.frombuffer(matrix, dtype=numpy.intc).reshape(len(links), width)
+        present = values != MISSING
+        samples = present.sum(axis=1)
+        totals = numpy.where(present, values, 0).sum(axis=1, dtype=numpy.int64)
+        average = totals // numpy.maximum(samples, 1)
+        minimum = numpy.where(present, values, INT_MAX).min(axis=1)
+        # MISSING(-1)은 어떤 가격보다 작으므로 max는 그대로
+        maximum = values.max(axis=1)
+        return PeriodStats(period, links, average.tolist(), minimum.tolist(), maximum.tolist(), samples.tolist(),
+                           (width - samples).tolist())
+
+    average, minimum, maximum, samples, missing = [], [], [], [], []
+    for row in range(len(links)):
+        prices = [price for price in matrix[row * width:(row + 1) * width] if price != MISSING]
+        count = len(prices)
+        average.append(sum(prices) // count if count else 0)
+        minimum.append(min(prices) if count else INT_MAX)
+        maximum.append(max(prices) if count else MISSING)
+        samples.append(count)
+        missing.append(width - count)
+    return PeriodStats(period, links, average, minimum, maximum, samples, missing)
+
+
+def aggregate_day(watches, day, period):
+    # day: history.day_number 값, period: 저장할 날짜 문자열 ("YYYY-MM-DD")
+    links, matrix = day_matrix(watches, day)
+    return aggregate(period, links, matrix)
+
+
+def period_start(kind, day):
+    # 주/월 묶음을 다시 계산할 때 시작일 (주는 월요일, 월은 1일)
+    date = datetime.date.fromisoformat(day)
+    if kind == WEEKLY:
+        date -= datetime.timedelta(days=date.weekday())
+    else:
+        date = date.replace(day=1)
+    return date.isoformat()
+
+
+def aggregate_and_persist(watches, writer, now=None, keep_days=7):
+    # 하루 한 번 모든 상품의 오늘 가격을 한 번에 집계해 저장 큐에 넣고, 이번 주/달 묶음도 다시 계산
+    now = time.time() if now is None else now
+    day = day_of(now)
+    started = time.perf_counter()
+    stats = aggregate_day(watches, day_number(now), day)
+    recorded = 0
+    for row in stats.rows():
+        writer.add_daily_average(*row)
+        recorded += 1
+    for kind in (WEEKLY, MONTHLY):
+        writer.add_rollup(kind, period_start(kind, day), day)
+
+    # 메모리에는 최근 keep_days일만 남긴다 (전체 기록은 SQLite에)
+    for watch in watches:
+        watch.history.trim(keep_days)
+    print(f"Daily aggregate {day}: {recorded}/{len(stats)} products in {time.perf_counter() - started:.2f}s")
+    return stats
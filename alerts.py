@@ -0,0 +1,162 @@
+from bisect import bisect_left, bisect_right
+
+# 알림을 보낸 구독은 가격이 desired_price보다 이 비율 이상 다시 올라야 다음 알림을 받을 수 있다 (히스테리시스)
+REARM_RATIO = 0.02
+
+# 한 버킷의 최대 크기, 넘치면 반으로 나눈다
+BUCKET_SIZE = 1024
+
+
+def rearm_price(desired_price, rearm_ratio=REARM_RATIO):
+    return desired_price + max(1, int(desired_price * rearm_ratio))
+
+
+class SortedBuckets:
+    # 키 순으로 정렬된 (키, 값) 목록을 작은 버킷들로 나눠 보관
+    # 한 상품에 구독이 수십만 개여도 삽입/삭제는 버킷 하나만큼만 옮기고, 앞/뒤 구간은 통째로 떼어 낸다
+    __slots__ = ("keys", "values", "maxes", "size")
+
+    def __init__(self):
+        self.keys = []      # 버킷별 정렬된 키 리스트
+        self.values = []    # 버킷별 값 리스트 (keys와 같은 순서)
+        self.maxes = []     # 버킷별 가장 큰 키
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, key, value):
+        self.size += 1
+        if not self.maxes:
+            self.keys.append([key])
+            self.values.append([value])
+            self.maxes.append(key)
+            return
+        bucket = min(bisect_right(self.maxes, key), len(self.maxes) - 1)
+        keys, values = self.keys[bucket], self.values[bucket]
+        index = bisect_right(keys, key)
+        keys.insert(index, key)
+        values.insert(index, value)
+        self.maxes[bucket] = keys[-1]
+        if len(keys) > BUCKET_SIZE:
+            half = len(keys) // 2
+            self.keys[bucket:bucket + 1] = [keys[:half], keys[half:]]
+            self.values[bucket:bucket + 1] = [values[:half], values[half:]]
+            self.maxes[bucket:bucket + 1] = [keys[half - 1], keys[-1]]
+
+    def remove(self, key, value):
+        # 같은 키가 여러 개면 value와 같은 객체를 찾아 지운다
+        bucket = bisect_left(self.maxes, key)
+        index = bisect_left(self.keys[bucket], key)
+        while self.values[bucket][index] is not value:
+            index += 1
+            if index == len(self.values[bucket]):
+                bucket += 1
+                index = 0
+        keys, values = self.keys[bucket], self.values[bucket]
+        del keys[index]
+        del values[index]
+        self.size -= 1
+        if keys:
+            self.maxes[bucket] = keys[-1]
+        else:
+            del self.keys[bucket]
+            del self.values[bucket]
+            del self.maxes[bucket]
+
+    def pop_below(self, key):
+        # 키 < key 인 값을 모두 떼어 낸다 (앞쪽 구간)
+        bucket = bisect_left(self.maxes, key)
+        popped = [value for values in self.values[:bucket] for value in values]
+        del self.keys[:bucket]
+        del self.values[:bucket]
+        del self.maxes[:bucket]
+        if self.keys:
+            index = bisect_left(self.keys[0], key)
+            if index:
+                popped.extend(self.values[0][:index])
+                del self.keys[0][:index]
+                del self.values[0][:index]
+        self.size -= len(popped)
+        return popped
+
+    def pop_from(self, key):
+        # 키 >= key 인 값을 모두 떼어 낸다 (뒤쪽 구간)
+        bucket = bisect_left(self.maxes, key)
+        if bucket == len(self.maxes):
+            return []
+        index = bisect_left(self.keys[bucket], key)
+        popped = self.values[bucket][index:]
+        popped.extend(value for values in self.values[bucket + 1:] for value in values)
+        del self.keys[bucket + 1:]
+        del self.values[bucket + 1:]
+        del self.maxes[bucket + 1:]
+        del self.keys[bucket][index:]
+        del self.values[bucket][index:]
+        if self.keys[bucket]:
+            self.maxes[bucket] = self.keys[bucket][-1]
+        else:
+            del self.keys[bucket]
+            del self.values[bucket]
+            del self.maxes[bucket]
+        self.size -= len(popped)
+        return popped
+
+
+class ThresholdIndex:
+    # 한 상품의 구독을 기준 가격 순으로 정렬해 두고, 새 가격이 들어오면 넘어선 구독만 O(log n + k)로 찾는다
+    #   armed: 아직 알림을 받지 않은 구독 (desired_price 순) -> 가격 <= desired_price면 알림
+    #   disarmed: 알림을 받은 구독 (재무장 가격 순) -> 가격 > 재무장 가격이면 다시 armed
+    # 같은 클라이언트가 다시 구독하면 desired_price만 바꾼다 (중복 알림 없음)
+    __slots__ = ("rearm_ratio", "armed", "disarmed", "by_client")
+
+    def __init__(self, rearm_ratio=REARM_RATIO):
+        self.rearm_ratio = rearm_ratio
+        self.armed = SortedBuckets()
+        self.disarmed = SortedBuckets()
+        self.by_client = {}
+
+    def __len__(self):
+        return len(self.by_client)
+
+    def __iter__(self):
+        return iter(list(self.by_client.values()))
+
+    def get(self, client):
+        return self.by_client.get(client)
+
+    def highest_armed(self):
+        # 아직 알림을 받지 않은 구독 중 가장 높은 desired_price (가격이 여기까지 내려오면 첫 알림)
+        return self.armed.maxes[-1] if self.armed.maxes else None
+
+    def add(self, subscription):
+        previous = self.by_client.get(subscription.client)
+        if previous is not None:
+            self._remove(previous)
+        subscription.alerted = False
+        self.by_client[subscription.client] = subscription
+        self.armed.insert(subscription.desired_price, subscription)
+
+    def _remove(self, subscription):
+        if subscription.alerted:
+            self.disarmed.remove(rearm_price(subscription.desired_price, self.rearm_ratio), subscription)
+        else:
+            self.armed.remove(subscription.desired_price, subscription)
+
+    def remove(self, client):
+        subscription = self.by_client.pop(client, None)
+        if subscription is not None:
+            self._remove(subscription)
+        return subscription
+
+    def update(self, price):
+        # 새 가격으로 재무장/알림 대상을 옮기고, 이번에 알림을 보내야 하는 구독 목록을 돌려준다
+        for subscription in self.disarmed.pop_below(price):
+            subscription.alerted = False
+            self.armed.insert(subscription.desired_price, subscription)
+
+        crossed = self.armed.pop_from(price)
+        for subscription in crossed:
+            subscription.alerted = True
+            self.disarmed.insert(rearm_price(subscription.desired_price, self.rearm_ratio), subscription)
+        return crossed
@@ -0,0 +1,297 @@
+import asyncio
+import time
+from aggregation import aggregate_and_persist
+from alerts import ThresholdIndex
+from bulk import MAX_BULK_ITEMS, MAX_REPORTED_ERRORS, prepare, validate_link
+from connection import EVICTIONS, MAX_BUFFER_BYTES
+from extractor import extract_price
+from fetcher import AsyncFetcher
+from governor import CircuitOpenError, get_governor
+from history import PriceHistory
+from latest_price import LatestPriceCache
+from metrics import SamplingProfiler, get_metrics
+from price_store import PriceStore
+from protocol import (ACK, ADD, ALERT, BULK_ADD, BULK_RESULT, ERROR, MAX_BULK_MESSAGE_BYTES, PRICE, QUERY, REMOVE,
+                      STATS, MessageReader, ProtocolError, encode_message,
+                      is_framed, parse_legacy, require)
+from registry import SubscriptionRegistry
+from scheduler import HourlyScheduler
+from writer import SAMPLE, PersistenceWriter
+
+DAILY_AVERAGE_HOUR = 23
+DAILY_AVERAGE_MINUTE = 50
+MAX_PROFILE_SECONDS = 60
+
+
+def seconds_until(hour=None, minute=0, now=None):
+    # hour가 None이면 다음 정각까지, 아니면 다음 hour:minute까지 남은 초
+    now = time.time() if now is None else now
+    current = time.localtime(now)
+    if hour is None:
+        target = now - current.tm_min * 60 - current.tm_sec + 3600
+    else:
+        target = time.mktime((current.tm_year, current.tm_mon, current.tm_mday,
+                              hour, minute, 0, 0, 0, -1))
+        if target <= now:
+            target += 24 * 3600
+    return max(0.0, target - now)
+
+
+class AsyncClient:
+    # 이벤트 루프 서버의 연결 하나: 구독(Subscription)의 client, 알림은 writer에 바로 쓴다
+    __slots__ = ("writer", "framed")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.framed = None
+
+    def send_alert(self, product_name, product_link, price, desired_price, ts=None):
+        if self.framed:
+            self.writer.write(encode_message({"type": ALERT, "name": product_name, "link": product_link,
+                                              "price": price, "desired_price": desired_price,
+                                              "ts": int(time.time() if ts is None else ts)}))
+        else:
+            self.writer.write(str(price).encode())
+        # drain을 기다리지 않는다 (읽지 않는 클라이언트 때문에 크롤링이 멈추지 않도록), 버퍼가 넘치면 끊는다
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFER_BYTES:
+            print(f"Evicting slow client {self.writer.get_extra_info('peername')}: buffer_full")
+            EVICTIONS.inc(label="buffer_full")
+            self.writer.transport.abort()
+
+
+class AsyncItemWatch:
+    # 스레드 서버의 ItemWatch처럼 상품(정규화된 URL) 하나당 하나, 구독한 연결 모두에게 알린다
+    # 모든 작업이 이벤트 루프 스레드에서 실행되므로 구독 목록에 잠금이 없다
+    __slots__ = ("server", "subscribers", "product_name", "product_link", "crawled_price", "history")
+
+    def __init__(self, server, product_name, product_link):
+        self.server = server
+        self.subscribers = ThresholdIndex()
+        self.product_name = product_name
+        self.product_link = product_link
+        self.crawled_price = None
+        self.history = PriceHistory()
+
+    def add_subscriber(self, subscription):
+        self.subscribers.add(subscription)
+
+    def remove_subscriber(self, client):
+        self.subscribers.remove(client)
+        return len(self.subscribers)
+
+    async def crawl_product_price(self):
+        try:
+            self.crawled_price = await self.server.fetch_price(self.product_link)
+        except CircuitOpenError:
+            # 쿠팡이 막고 있는 동안은 건너뛰고 다음 슬롯에 (governor가 차단/복구를 한 번씩 출력)
+            self.crawled_price = None
+            return None
+        except Exception as e:
+            print(f"Exception occurred during crawling: {e}")
+            self.crawled_price = None
+            return None
+
+        if self.crawled_price is not None:
+            now = time.time()
+            # 구매희망가격 이하로 내려간 구독자에게만 알림
+            for subscription in self.subscribers.update(self.crawled_price):
+                subscription.client.send_alert(subscription.product_name, self.product_link, self.crawled_price,
+                                               subscription.desired_price, now)
+            self.server.latest.put(self.product_link, self.crawled_price, now)
+            self.history.record(now, self.crawled_price)
+            await self.server.persist((SAMPLE, self.product_link, now, self.crawled_price))
+        return self.crawled_price
+
+    def start(self):
+        # 스레드 서버와 같은 중앙 스케줄러 (정각 슬롯 안에서 jitter만큼 분산)
+        self.server.scheduler.every_hour((id(self), "hourly"), self.crawl_product_price)
+
+    def stop(self):
+        self.server.scheduler.remove((id(self), "hourly"))
+        self.server.latest.forget(self.product_link)
+
+
+class AsyncPriceServer:
+    # 모든 클라이언트 소켓과 아이템 감시를 하나의 이벤트 루프에서 처리
+    # 같은 상품을 여러 연결이 구독해도 크롤링은 상품당 한 번 (SubscriptionRegistry), 정각 요청은 HourlyScheduler로 분산
+    def __init__(self, host='localhost', port=12345, fetch_page=None, store=None):
+        self.server_host = host
+        self.server_port = port
+        self.server = None
+        self.loop = None
+        self.store = PriceStore() if store is None else store
+        self.persistence = PersistenceWriter(self.store)
+        # 스레드 서버와 같은 governor (429/403, 봇 확인 페이지에 따라 호스트별 속도를 줄이고 차단)
+        self.fetcher = AsyncFetcher(governor=get_governor())
+        self.registry = SubscriptionRegistry(self.create_watch)
+        self.fetch_jitter_seconds = 300
+        self.scheduler = HourlyScheduler(jitter_seconds=self.fetch_jitter_seconds)
+        self.crawls = set()     # 실행 중인 크롤링 Task (끝나기 전에 GC되지 않도록)
+        self.latest = LatestPriceCache()
+        self.history_days = 7
+        self.aggregate_task = None
+        self.connections = 0
+        if fetch_page is not None:
+            self.fetch_page = fetch_page
+        metrics = get_metrics()
+        metrics.gauge("watches", "products being watched", lambda: len(self.registry))
+        metrics.gauge("connections", "connected clients", lambda: self.connections)
+        metrics.gauge("persistence_pending", "records waiting in the persistence queue", self.persistence.pending)
+
+    async def fetch_page(self, url):
+        return await self.fetcher.get_text(url)
+
+    async def fetch_price(self, url):
+        price = extract_price(await self.fetch_page(url))
+        if self.fetcher.governor is not None:
+            # 가격 태그가 없는 200 응답이 계속되면 봇 확인 페이지로 보고 속도를 줄인다
+            self.fetcher.governor.record_parse(url, price is not None)
+        return price
+
+    async def persist(self, record):
+        # 저장 큐가 가득 차면 이벤트 루프를 막지 않도록 실행기 스레드에서 기다린다
+        if not self.persistence.try_put(record):
+            await asyncio.get_running_loop().run_in_executor(None, self.persistence.put, record)
+
+    def create_watch(self, product_name, product_link):
+        return AsyncItemWatch(self, product_name, product_link)
+
+    def dispatch_batch(self, slot, callbacks):
+        # 스케줄러 스레드에서 호출된다: 같은 슬롯의 크롤링을 이벤트 루프에 Task로 넘긴다
+        self.loop.call_soon_threadsafe(self.start_crawls, callbacks)
+
+    def start_crawls(self, callbacks):
+        for callback in callbacks:
+            task = asyncio.ensure_future(callback())
+            self.crawls.add(task)
+            task.add_done_callback(self.crawls.discard)
+
+    def add_watch(self, client, product_name, desired_price, product_link):
+        # 스레드 서버와 같은 규칙으로 링크 검증 (아니면 ValueError), 같은 연결이 다시 구독하면 구매희망가격만 바꾼다
+        watch, created = self.registry.subscribe(client, product_name, desired_price, validate_link(product_link))
+        if created:
+            watch.start()
+
+    async def handle_message(self, client, message):
+        kind = message["type"]
+        reply = {"id": message["id"]} if "id" in message else {}
+        if kind == ADD:
+            product_name, desired_price, product_link = require(message, "name", "desired_price", "link")
+            self.add_watch(client, product_name, int(desired_price), product_link)
+            reply["type"] = ACK
+        elif kind == REMOVE:
+            (product_link,) = require(message, "link")
+            self.registry.unsubscribe(client, product_link)
+            reply["type"] = ACK
+        elif kind == QUERY:
+            # 최신 가격 캐시에서 답하고, TTL이 지났을 때만 (같은 상품은 한 번만) 다시 가져온다
+            product_link = validate_link(*require(message, "link"))
+            latest = await self.latest.get_async(product_link, self.fetch_price, message.get("max_age"))
+            watch = self.registry.watches.get(latest["link"])
+            subscription = watch.subscribers.get(client) if watch is not None else None
+            name = subscription.product_name if subscription is not None else message.get("name")
+            reply.update(type=PRICE, name=name, **latest)
+        elif kind == BULK_ADD:
+            # 검증/중복 제거와 등록은 스레드 서버와 같고, 새 상품의 첫 크롤링은 평소처럼 다음 정각 슬롯에 (jitter로 분산)
+            (items,) = require(message, "items")
+            if not isinstance(items, list) or len(items) > MAX_BULK_ITEMS:
+                raise ProtocolError(f"bulk_add items must be a list of at most {MAX_BULK_ITEMS}")
+            entries, rejected, duplicates = prepare(items)
+            created = self.registry.subscribe_many(client, entries)
+            for watch in created:
+                watch.start()
+            added = len(created)
+            reply.update(type=BULK_RESULT, added=added, updated=len(entries) - added, duplicates=duplicates,
+                         rejected=len(rejected), first_fetch_seconds=0,
+                         errors=[{"index": index, "error": error} for index, error in rejected[:MAX_REPORTED_ERRORS]])
+        elif kind == STATS:
+            reply.update(type=STATS, metrics=get_metrics().snapshot())
+            if message.get("profile"):
+                # 샘플링은 실행기 스레드에서 (이벤트 루프 스레드의 스택도 찍힌다)
+                seconds = min(MAX_PROFILE_SECONDS, float(message["profile"]))
+                reply["profile"] = await asyncio.get_running_loop().run_in_executor(None, SamplingProfiler().run,
+                                                                                     seconds)
+        else:
+            raise ProtocolError(f"unknown message type: {kind}")
+        client.writer.write(encode_message(reply))
+
+    async def handle_client(self, reader, writer):
+        address = writer.get_extra_info('peername')
+        print(f"Accepted connection from {address}")
+        self.connections += 1
+        client = AsyncClient(writer)
+        message_reader = MessageReader(MAX_BULK_MESSAGE_BYTES)
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+
+                if client.framed is None:
+                    client.framed = is_framed(data)
+
+                if not client.framed:
+                    # 기존 방식: read 한 번에 "상품명,구매희망가격,상품링크" 하나
+                    product_name, desired_price, product_link = parse_legacy(data.decode())
+                    try:
+                        self.add_watch(client, product_name, desired_price, product_link)
+                    except ValueError as e:
+                        print(f"Invalid request from {address}: {e}")
+                    continue
+
+                for message in message_reader.feed(data):
+                    try:
+                        if isinstance(message, ProtocolError):
+                            raise message
+                        await self.handle_message(client, message)
+                    except (ProtocolError, ValueError, TypeError) as e:
+                        error = {"type": ERROR, "message": str(e)}
+                        if isinstance(message, dict) and "id" in message:
+                            error["id"] = message["id"]
+                        writer.write(encode_message(error))
+                await writer.drain()
+        except (ConnectionError, ProtocolError, UnicodeDecodeError) as e:
+            print(f"Client {address} dropped: {e}")
+        finally:
+            # 연결이 끊긴 클라이언트의 구독을 해제 (구독자가 없어진 상품은 스케줄에서 제외)
+            self.registry.unsubscribe(client)
+            self.connections -= 1
+            writer.close()
+
+    async def average_daily(self):
+        # 매일 23:50에 모든 감시의 오늘 가격을 한 번에 집계 (CPU 작업과 저장 큐 대기는 실행기 스레드에서)
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(seconds_until(DAILY_AVERAGE_HOUR, DAILY_AVERAGE_MINUTE))
+            try:
+                await loop.run_in_executor(None, aggregate_and_persist, list(self.registry.watches.values()),
+                                           self.persistence, None, self.history_days)
+            except Exception as e:
+                print(f"Exception occurred during daily aggregation: {e}")
+
+    async def start_server(self):
+        if not self.persistence.is_alive():
+            self.persistence.start()
+        if self.aggregate_task is None:
+            self.aggregate_task = asyncio.create_task(self.average_daily())
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.scheduler.start(self.dispatch_batch)
+        self.server = await asyncio.start_server(self.handle_client, self.server_host, self.server_port,
+                                                 reuse_address=True)
+        print(f"Server listening on {self.server_host}:{self.server_port}")
+        return self.server
+
+    async def serve_forever(self):
+        await self.start_server()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.scheduler.stop()
+            await self.fetcher.close()
+            self.persistence.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(AsyncPriceServer().serve_forever())
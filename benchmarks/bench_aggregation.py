@@ -0,0 +1,107 @@
+"""일별 집계: 상품별 루프 vs 상품 x 24 행렬 한 번에: python -m benchmarks.bench_aggregation --products 50000"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import aggregation
+from aggregation import aggregate, aggregate_day, day_matrix, period_start
+from history import day_number
+from main_generalization import ItemWatch
+from price_store import MONTHLY, WEEKLY, PriceStore, day_of
+
+HOUR = 3600
+
+
+def build_watches(products, start, missing_rate):
+    rng = random.Random(1)
+    watches = []
+    for product in range(products):
+        watch = ItemWatch(None, f"상품{product}", f"https://www.coupang.com/vp/products/{product}")
+        base = rng.randint(5000, 500000)
+        for hour in range(24):
+            # 일부 시간대는 수집 실패로 비워 둔다
+            if rng.random() >= missing_rate:
+                watch.history.record(start + hour * HOUR, base + rng.randint(-500, 500))
+        watches.append(watch)
+    return watches
+
+
+def per_watch_loop(watches, day, period):
+    # 기존 방식: 상품(스레드)마다 calculate_daily_average를 따로 실행
+    rows = []
+    for watch in watches:
+        prices = watch.history.day_prices(day)
+        if not prices:
+            continue
+        rows.append((watch.product_link, period, int(sum(prices) / len(prices)), min(prices), max(prices),
+                     len(prices), 24 - len(prices)))
+    return rows
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_rollup(watches, start, days):
+    # 일별 통계 days일치를 저장한 뒤 이번 주/달 묶음을 GROUP BY 한 번으로 다시 계산
+    with tempfile.TemporaryDirectory() as directory:
+        store = PriceStore(os.path.join(directory, "rollup.db"), synchronous="OFF")
+        links, matrix = day_matrix(watches, day_number(start))
+        stats = aggregate(None, links, matrix)
+        first = datetime.date.fromtimestamp(start)
+        for offset in range(days):
+            day = (first + datetime.timedelta(days=offset)).isoformat()
+            store.write(daily_averages=[(row[0], day) + row[2:] for row in stats.rows()])
+        last = (first + datetime.timedelta(days=days - 1)).isoformat()
+        for kind in (WEEKLY, MONTHLY):
+            elapsed, _ = timed(store.write, (), (), (), [(kind, period_start(kind, last), last)], repeat=1)
+            print(f"{kind + ' rollup':>18}: {elapsed * 1000:10.1f} ms ({len(watches)} products, up to {days} days)")
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--missing-rate", type=float, default=0.05)
+    parser.add_argument("--rollup-days", type=int, default=28)
+    args = parser.parse_args()
+
+    now = time.localtime()
+    start = time.mktime((now.tm_year, now.tm_mon, now.tm_mday, 0, 0, 0, 0, 0, -1))
+    day, period = day_number(start), day_of(start)
+    watches = build_watches(args.products, start, args.missing_rate)
+    print(f"{args.products} products x 24 slots ({args.missing_rate:.0%} missing)")
+
+    loop_time, expected = timed(per_watch_loop, watches, day, period)
+    print(f"{'per-watch loop':>18}: {loop_time * 1000:10.1f} ms")
+
+    matrix_time, (links, matrix) = timed(day_matrix, watches, day)
+    print(f"{'build matrix':>18}: {matrix_time * 1000:10.1f} ms")
+
+    numpy_module = aggregation.numpy
+    for label, module in (("numpy", numpy_module), ("python fallback", None)):
+        if label == "numpy" and module is None:
+            print(f"{label:>18}: not installed")
+            continue
+        aggregation.numpy = module
+        elapsed, stats = timed(aggregate, period, links, matrix)
+        total, _ = timed(aggregate_day, watches, day, period)
+        assert list(stats.rows()) == expected, f"{label} result differs from per-watch loop"
+        print(f"{label:>18}: {elapsed * 1000:10.1f} ms aggregate, {total * 1000:8.1f} ms with matrix "
+              f"({loop_time / total:.1f}x vs loop)")
+    aggregation.numpy = numpy_module
+
+    bench_rollup(watches, start, args.rollup_days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""가격 알림: 정렬 인덱스 vs 구독 전체 확인: python -m benchmarks.bench_alerts --subscriptions 1000000"""
+import argparse
+import random
+import time
+
+from alerts import ThresholdIndex, rearm_price
+from benchmarks._util import percentile, rss_bytes
+from registry import Subscription
+
+
+class LinearScan:
+    # 비교용: 가격이 들어올 때마다 모든 구독을 확인 (같은 히스테리시스 규칙)
+    def __init__(self):
+        self.subscriptions = []
+
+    def add(self, subscription):
+        self.subscriptions.append(subscription)
+
+    def update(self, price):
+        crossed = []
+        for subscription in self.subscriptions:
+            if subscription.alerted and price > rearm_price(subscription.desired_price):
+                subscription.alerted = False
+            if not subscription.alerted and price <= subscription.desired_price:
+                subscription.alerted = True
+                crossed.append(subscription)
+        return crossed
+
+
+def build(factory, products, subscriptions, seed):
+    rng = random.Random(seed)
+    bases = [rng.randint(10000, 500000) for _ in range(products)]
+    indexes = [factory() for _ in range(products)]
+    for number in range(subscriptions):
+        product = number % products
+        # 구매희망가격은 현재가의 70~100% 사이
+        desired_price = int(bases[product] * rng.uniform(0.7, 1.0))
+        indexes[product].add(Subscription(number, f"상품{product}", desired_price))
+    return bases, indexes
+
+
+def price_walk(bases, rounds, seed):
+    # 상품마다 시간당 가격 변동 (대부분 작은 변동, 가끔 큰 할인)
+    rng = random.Random(seed)
+    prices = list(bases)
+    for _ in range(rounds):
+        for product, base in enumerate(bases):
+            if rng.random() < 0.02:
+                prices[product] = int(base * rng.uniform(0.6, 0.9))
+            else:
+                prices[product] = max(1, int(prices[product] * rng.uniform(0.97, 1.03)))
+            yield product, prices[product]
+
+
+def run(label, factory, args):
+    before = rss_bytes()
+    started = time.perf_counter()
+    bases, indexes = build(factory, args.products, args.subscriptions, 1)
+    build_time = time.perf_counter() - started
+    memory = rss_bytes() - before
+
+    latencies = []
+    alerts = []
+    started = time.perf_counter()
+    for product, price in price_walk(bases, args.rounds, 2):
+        began = time.perf_counter()
+        crossed = indexes[product].update(price)
+        latencies.append(time.perf_counter() - began)
+        alerts.append(len(crossed))
+    total = time.perf_counter() - started
+    latencies.sort()
+    print(f"{label:>8}: build {build_time:5.1f}s, RSS +{memory / 2 ** 20:6.0f} MiB, "
+          f"{len(latencies) / total:10,.0f} updates/s, p50 {percentile(latencies, 0.5) * 1e6:8.1f}us "
+          f"p99 {percentile(latencies, 0.99) * 1e6:9.1f}us, alerts {sum(alerts):,}")
+    return alerts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscriptions", type=int, default=1000000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=24)
+    parser.add_argument("--skip-linear", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{args.subscriptions:,} subscriptions over {args.products:,} products, {args.rounds} price rounds")
+    indexed = run("indexed", ThresholdIndex, args)
+    if not args.skip_linear:
+        linear = run("linear", LinearScan, args)
+        assert indexed == linear, "indexed alerts differ from linear scan"
+        print("same alerts as linear scan")
+
+
+if __name__ == "__main__":
+    main()
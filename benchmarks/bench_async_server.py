@@ -0,0 +1,118 @@
+"""연결/아이템 수 대비 RSS 측정: python -m benchmarks.bench_async_server --connections 1000"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import threading
+import time
+
+from async_server import AsyncPriceServer
+from benchmarks._util import raise_fd_limit, rss_bytes
+from price_store import PriceStore
+
+STUB_HTML = '<html><body><span class="total-price"><strong>12,900원</strong></span></body></html>'
+
+
+def run_clients(port, connections, items_per_connection, ready, done):
+    sockets = [socket.create_connection(('localhost', port)) for _ in range(connections)]
+    # 한 번의 recv에 두 메시지가 합쳐지지 않도록 라운드마다 간격을 둔다
+    for item in range(items_per_connection):
+        for index, sock in enumerate(sockets):
+            sock.send(f"item{index}-{item},10000,http://localhost/vp/products/{index}-{item}".encode())
+        time.sleep(0.2)
+    ready.set()
+    done.wait()
+    for sock in sockets:
+        sock.close()
+
+
+def wait_until(predicate, timeout=120):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.05)
+
+
+class ThreadedBaseline:
+    # 기존 구조(연결당 스레드 + 아이템당 스레드)를 흉내 낸 비교용 서버
+    def __init__(self):
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('localhost', 0))
+        self.server_socket.listen(1024)
+        self.port = self.server_socket.getsockname()[1]
+        self.stop_event = threading.Event()
+        self.items = 0
+        self.lock = threading.Lock()
+
+    def handle_client(self, client_socket):
+        while True:
+            data = client_socket.recv(1024).decode()
+            if not data:
+                break
+            data.split(',')
+            threading.Thread(target=self.stop_event.wait, daemon=True).start()
+            with self.lock:
+                self.items += 1
+        client_socket.close()
+
+    def start(self):
+        def accept_loop():
+            while not self.stop_event.is_set():
+                client_socket, _ = self.server_socket.accept()
+                threading.Thread(target=self.handle_client, args=(client_socket,), daemon=True).start()
+
+        threading.Thread(target=accept_loop, daemon=True).start()
+
+
+def run_async(args):
+    async def fetch_page(url):
+        return STUB_HTML
+
+    loop = asyncio.new_event_loop()
+    server = AsyncPriceServer('localhost', 0, fetch_page=fetch_page, store=PriceStore(":memory:"))
+    loop.run_until_complete(server.start_server())
+    port = server.server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return port, lambda: len(server.registry), lambda: server.connections
+
+
+def run_threads(args):
+    server = ThreadedBaseline()
+    server.start()
+    return server.port, lambda: server.items, lambda: threading.active_count()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--items-per-connection", type=int, default=4)
+    parser.add_argument("--mode", choices=["async", "threads"], default="async")
+    args = parser.parse_args()
+
+    raise_fd_limit(args.connections * 2 + 256)
+    baseline_rss = rss_bytes()
+    port, item_count, connection_count = (run_async if args.mode == "async" else run_threads)(args)
+
+    ready = multiprocessing.Event()
+    done = multiprocessing.Event()
+    client = multiprocessing.Process(target=run_clients,
+                                     args=(port, args.connections, args.items_per_connection, ready, done))
+    client.start()
+    ready.wait()
+    expected = args.connections * args.items_per_connection
+    wait_until(lambda: item_count() >= expected)
+
+    used = max(1, rss_bytes() - baseline_rss)
+    gigabyte = 1024 ** 3
+    print(f"mode={args.mode} connections={args.connections} items={item_count()} "
+          f"(threads/tasks alive: {connection_count()})")
+    print(f"RSS growth: {used / 1024 / 1024:.1f} MiB")
+    print(f"connections per GB: {args.connections * gigabyte / used:,.0f}")
+    print(f"items per GB: {item_count() * gigabyte / used:,.0f}")
+
+    done.set()
+    client.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""상품 등록 속도 (products/s): 연결 하나에 상품 하나(기존) vs add 메시지 연속 전송 vs bulk_add (CSV 카탈로그)
+python -m benchmarks.bench_bulk --products 50000 --legacy 2000"""
+import argparse
+import contextlib
+import csv
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+from benchmarks._util import raise_fd_limit
+from bulk import load_items, send_items
+from main_generalization import PriceServer
+from protocol import ACK, ADD, MessageReader, encode_message
+
+
+class QuietServer(PriceServer):
+    # 등록 속도만 잰다 (스케줄된 크롤링은 실행하지 않음)
+    def dispatch_batch(self, slot, callbacks):
+        pass
+
+
+@contextlib.contextmanager
+def server_in(tmp, label):
+    # 서버의 출력(상품 등록마다 한 줄)은 버린다, 결과는 with 블록이 끝난 뒤 출력
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        server = QuietServer("127.0.0.1", 0, os.path.join(tmp, f"{label}.db"))
+        threading.Thread(target=server.start, daemon=True).start()
+        try:
+            yield server
+        finally:
+            server.server_socket.close()
+            server.writer.close()
+            server.watch_log.close()
+
+
+def write_catalog(path, products, seed):
+    # 쿠팡 상품 링크 카탈로그: 2%는 추적 파라미터만 다른 중복, 1%는 잘못된 줄
+    rng = random.Random(seed)
+    rows = [("name", "desired_price", "link")]
+    for product in range(products):
+        link = f"https://www.coupang.com/vp/products/{product}?itemId={product * 7}&vendorItemId={product * 11}"
+        rows.append((f"상품{product}", rng.randint(50, 5000) * 100, link))
+        if rng.random() < 0.02:
+            rows.append((f"상품{product}", rng.randint(50, 5000) * 100, link + "&q=검색어&src=1032034&traceid=abc"))
+        if rng.random() < 0.01:
+            rows.append((f"잘못된{product}", "가격", f"www.coupang.com/np/search?q={product}"))
+    with open(path, "w", encoding="utf-8", newline="") as catalog:
+        csv.writer(catalog).writerows(rows)
+    return len(rows) - 1
+
+
+def wait_for(condition, timeout=600):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def legacy_connections(server, products):
+    # 기존 방식: 상품마다 연결 하나 + 수신 스레드 하나 ("상품명,구매희망가격,상품링크")
+    sockets = []
+    started = time.perf_counter()
+    for product in range(products):
+        sock = socket.create_connection(("127.0.0.1", server.server_port))
+        sock.sendall(f"상품{product},10000,https://www.coupang.com/vp/products/{product}".encode())
+        sockets.append(sock)
+    wait_for(lambda: len(server.registry) >= products)
+    elapsed = time.perf_counter() - started
+    for sock in sockets:
+        sock.close()
+    return elapsed
+
+
+def pipelined_adds(server, products):
+    # 연결 하나에 add 메시지를 이어서 보내고 ack를 모두 받을 때까지
+    sock = socket.create_connection(("127.0.0.1", server.server_port))
+    data = b"".join(encode_message({"type": ADD, "name": f"상품{product}", "desired_price": 10000,
+                                    "link": f"https://www.coupang.com/vp/products/{product}"})
+                    for product in range(products))
+    started = time.perf_counter()
+    sock.sendall(data)
+    reader = MessageReader()
+    acks = 0
+    while acks < products:
+        acks += sum(1 for message in reader.feed(sock.recv(262144)) if message["type"] == ACK)
+    elapsed = time.perf_counter() - started
+    sock.close()
+    return elapsed
+
+
+def first_fetch_spread(server):
+    # 새로 등록한 상품의 첫 크롤링 시각 분포 (가장 바쁜 1초의 크롤링 수, 전체 구간)
+    now = server.clock()
+    per_second = {}
+    for due, _, _, _, key in server.scheduler._heap:
+        if key != "daily_aggregate":
+            per_second[int(due - now)] = per_second.get(int(due - now), 0) + 1
+    return max(per_second.values()), max(per_second) - min(per_second)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--legacy", type=int, default=2000, help="products for the connection-per-product case")
+    parser.add_argument("--chunk", type=int, default=5000, help="items per bulk_add message")
+    args = parser.parse_args()
+    raise_fd_limit(2 * args.legacy + 256)
+    tmp = tempfile.mkdtemp(prefix="bench-bulk-")
+
+    with server_in(tmp, "legacy") as server:
+        elapsed = legacy_connections(server, args.legacy)
+    print(f"{'connection per product':>26}: {args.legacy:7,} products in {elapsed:6.2f}s "
+          f"({args.legacy / elapsed:8,.0f} products/s)")
+
+    with server_in(tmp, "pipelined") as server:
+        elapsed = pipelined_adds(server, args.products)
+    print(f"{'pipelined add messages':>26}: {args.products:7,} products in {elapsed:6.2f}s "
+          f"({args.products / elapsed:8,.0f} products/s)")
+
+    catalog = os.path.join(tmp, "catalog.csv")
+    rows = write_catalog(catalog, args.products, 1)
+    with server_in(tmp, "bulk") as server:
+        started = time.perf_counter()
+        items = load_items(catalog)
+        loaded = time.perf_counter() - started
+        sock = socket.create_connection(("127.0.0.1", server.server_port))
+        totals = send_items(sock, items, args.chunk)
+        elapsed = time.perf_counter() - started
+        busiest, window = first_fetch_spread(server)
+        batch, per_second = server.onboard_batch, server.onboard_fetches_per_second
+        sock.close()
+    print(f"{'bulk_add from CSV':>26}: {rows:7,} rows in {elapsed:6.2f}s ({rows / elapsed:8,.0f} rows/s, "
+          f"{totals['added'] / elapsed:8,.0f} products/s, CSV load {loaded:.2f}s, chunks of {args.chunk:,})")
+    print(f"{'':>26}  {totals['added']:,} added, {totals['duplicates']:,} duplicates, "
+          f"{totals['rejected']:,} rejected (e.g. {totals['errors'][0]['error'] if totals['errors'] else '-'})")
+    print(f"{'':>26}  first fetches staggered over {window:,}s, busiest second {busiest} fetches "
+          f"({batch} per batch, {per_second}/s)")
+
+
+if __name__ == "__main__":
+    main()
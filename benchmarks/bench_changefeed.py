@@ -0,0 +1,94 @@
+"""가격 전송 대역폭: 크롤링마다 보내기 (main.py의 .total-price 태그 markup, price 메시지) vs change feed (바뀐 가격의 차이만)
+재생한 trace로 재고, 중간 seq부터 resume한 클라이언트가 놓친 변경만 받는지 확인
+python -m benchmarks.bench_changefeed --watches 10000 --hours 24"""
+import argparse
+import contextlib
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks.replay import Replay, SyntheticClients
+from changefeed import FEED_BYTES
+from protocol import CHANGE, PRICE, encode_message
+from registry import normalize_url
+
+
+def markup_overhead(fixture):
+    # main.py가 크롤링마다 보내던 price_element.encode()에서 가격 글자를 뺀 길이
+    price = 12900
+    markup = BeautifulSoup(fixture.page_for(price), "html.parser").select_one(".total-price").encode()
+    return len(markup) - len(f"{price:,}".encode())
+
+
+def per_crawl_bytes(replay):
+    # 기록된 크롤링마다 구독자(상품당 하나)에게 보냈을 바이트: (태그 markup, price 메시지), 크롤링 수
+    overhead = markup_overhead(replay.fixture)
+    markup = message = crawls = 0
+    for product_link, ts, price in replay.server.store.recent_samples(0):
+        index = int(product_link.rsplit("/", 1)[1])
+        markup += overhead + len(f"{price:,}".encode())
+        message += len(encode_message({"type": PRICE, "name": f"상품{index}", "link": product_link, "price": price,
+                                       "ts": int(ts)}))
+        crawls += 1
+    return markup, message, crawls
+
+
+def resume(replay, since, share):
+    # 늦게 연결한 클라이언트가 share 비율의 상품을 구독하고 since부터 놓친 변경을 받는다
+    products = [(f"상품{index}", 1, replay.fixture.link(index))
+                for index in range(0, replay.watches, max(1, round(1 / share)))]
+    late = SyntheticClients(replay.server.server_port, 1)
+    late.subscribe(products)
+    before = FEED_BYTES.snapshot()
+    started = time.perf_counter()
+    late.feed(since)
+    elapsed = time.perf_counter() - started
+    ack = late.feeds[-1]
+    links = {normalize_url(link) for _, _, link in products}
+    expected = sum(1 for _, link, _, _ in replay.server.store.changes_since(since, ack["seq"]) if link in links)
+    result = {"products": len(products), "replayed": ack["replayed"], "received": late.received.get(CHANGE, 0),
+              "expected": expected, "bytes": FEED_BYTES.snapshot() - before, "seconds": elapsed}
+    late.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--watches", type=int, default=10000)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--resume-share", type=float, default=0.1, help="share of products the resuming client watches")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        replay = Replay(args.watches, args.hours, transport="inproc", clients=args.clients, feed=True)
+        try:
+            replay.subscribe()
+            before = FEED_BYTES.snapshot()
+            first_half, _ = replay.replay(args.hours / 2)
+            since = replay.server.feed.seq
+            second_half, _ = replay.replay()
+            time.sleep(0.5)
+            feed_bytes = FEED_BYTES.snapshot() - before
+            changes = replay.clients.received.get(CHANGE, 0)
+            published = replay.server.feed.seq
+            markup, message, crawls = per_crawl_bytes(replay)
+            resumed = resume(replay, since, args.resume_share)
+        finally:
+            replay.close()
+
+    print(f"{args.watches:,} watches, {args.hours:g}h replayed in {first_half + second_half:.1f}s: "
+          f"{crawls:,} crawls, {published:,} price changes ({published / crawls:.1%} of crawls)")
+    for label, total, messages in ((".total-price markup per crawl", markup, crawls),
+                                   ("price message per crawl", message, crawls),
+                                   ("change feed", feed_bytes, changes)):
+        print(f"{label:>30}: {total / 1e6:8.2f} MB in {messages:9,} messages ({total / max(1, messages):5.1f} B/msg), "
+              f"{total / markup:6.1%} of markup, {total / message:6.1%} of price messages")
+    print(f"{'resume from mid-replay seq':>30}: {resumed['products']:,} products, {resumed['replayed']:,} missed changes "
+          f"replayed ({resumed['expected']:,} stored, {resumed['received']:,} received) in {resumed['seconds']:.2f}s, "
+          f"{resumed['bytes'] / 1e3:.1f} kB")
+
+
+if __name__ == "__main__":
+    main()
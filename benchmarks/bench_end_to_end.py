@@ -0,0 +1,79 @@
+"""끝까지 재생: fixture 서버 + 가상 시계 + 합성 클라이언트로 감시 수별 처리량/지연/메모리
+python -m benchmarks.bench_end_to_end --watches 1000,10000,100000 --hours 24
+python -m benchmarks.bench_end_to_end --transport inproc --save baseline.json   (HTTP 없이 서버 쪽 비용만)
+python -m benchmarks.bench_end_to_end --transport inproc --baseline baseline.json (이전 결과보다 느려졌으면 표시)"""
+import argparse
+import json
+
+from benchmarks import replay
+
+# 이전 결과보다 이만큼 나빠지면 회귀로 표시
+REGRESSION = 0.10
+# (지표, 클수록 좋은지)
+COMPARED = (("crawls_per_second", True), ("sample_p99", False), ("alert_p99", False), ("rss_per_watch", False),
+            ("subscribe_seconds", False))
+
+
+def report(result):
+    print(f"{result['watches']:>7,} watches: subscribe {result['subscribed']:,} in {result['subscribe_seconds']:6.2f}s "
+          f"({result['subscribed'] / result['subscribe_seconds']:8,.0f}/s, {result['rss_per_watch'] / 1024:5.1f} KiB/watch), "
+          f"{result['hours']:g}h replayed in {result['replay_seconds']:7.1f}s (x{result['speedup']:,.0f}), "
+          f"{result['crawls']:,} crawls ({result['crawls_per_second']:6.0f}/s), "
+          f"sample p50 {result['sample_p50'] * 1e3:6.2f} ms p99 {result['sample_p99'] * 1e3:7.2f} ms, "
+          f"{result['alerts']:,} alerts p50 {result['alert_p50'] * 1e3:6.2f} ms p99 {result['alert_p99'] * 1e3:7.2f} ms, "
+          f"{result['committed']:,} records committed (final flush {result['flush_seconds']:.2f}s), "
+          f"RSS {result['rss_mb']:.0f} MB")
+
+
+def compare(result, baseline):
+    previous = next((entry for entry in baseline
+                     if (entry["watches"], entry["hours"], entry["transport"]) ==
+                     (result["watches"], result["hours"], result["transport"])), None)
+    if previous is None:
+        return []
+    regressions = []
+    for key, higher_is_better in COMPARED:
+        before, now = previous[key], result[key]
+        if not before:
+            continue
+        change = (now - before) / before
+        if (-change if higher_is_better else change) > REGRESSION:
+            regressions.append(f"{key} {before:.4g} -> {now:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--watches", default="1000,10000,100000", help="comma separated watch counts")
+    parser.add_argument("--hours", type=float, default=24, help="simulated hours to replay")
+    parser.add_argument("--transport", choices=("http", "inproc"), default="http",
+                        help="http: local fixture HTTP server, inproc: same responses without HTTP")
+    parser.add_argument("--latency", type=float, default=0.0, help="fixture server latency per request (s)")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--in-flight", type=int, default=10, help="crawls handed to the thread pool at once")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --save to compare against")
+    args = parser.parse_args()
+
+    baseline = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    results = []
+    regressed = False
+    for watches in (int(count) for count in args.watches.split(",")):
+        result = replay.run(watches, args.hours, args.transport, args.latency, args.clients, args.in_flight)
+        results.append(result)
+        report(result)
+        for regression in compare(result, baseline):
+            regressed = True
+            print(f"{'':>16}REGRESSION {regression}")
+    if args.save:
+        with open(args.save, "w") as save_file:
+            json.dump(results, save_file, indent=1)
+    if regressed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
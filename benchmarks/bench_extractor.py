@@ -0,0 +1,89 @@
+"""가격 추출기 정확도 + 처리량: python -m benchmarks.bench_extractor --seconds 2"""
+import argparse
+import json
+import os
+import time
+
+from extractor import EXTRACTORS, StreamingExtractor, get_extractor
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_corpus():
+    with open(os.path.join(FIXTURE_DIR, "prices.json"), encoding="utf-8") as manifest:
+        expected = json.load(manifest)
+    corpus = []
+    for name, price in sorted(expected.items()):
+        with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as page:
+            corpus.append((name, page.read(), price))
+    return corpus
+
+
+def check(extractor, corpus):
+    failures = []
+    for name, html, expected in corpus:
+        got = extractor.extract(html)
+        if got != expected:
+            failures.append(f"{name}: expected {expected}, got {got}")
+    return failures
+
+
+def check_chunks(corpus, chunk_size=1024):
+    # 조각 단위 입력에서도 같은 결과가 나와야 한다
+    extractor = StreamingExtractor()
+    failures = []
+    for name, html, expected in corpus:
+        chunks = (html[i:i + chunk_size] for i in range(0, len(html), chunk_size))
+        got = extractor.extract_chunks(chunks)
+        if got != expected:
+            failures.append(f"{name} (chunks): expected {expected}, got {got}")
+    return failures
+
+
+def throughput(extractor, corpus, seconds):
+    pages = 0
+    total_bytes = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for _, html, _ in corpus:
+            extractor.extract(html)
+            pages += 1
+            total_bytes += len(html)
+    elapsed = time.perf_counter() - started
+    return pages / elapsed, total_bytes / elapsed / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    print(f"corpus: {len(corpus)} pages, {sum(len(html) for _, html, _ in corpus) / 1024:.0f} KiB")
+
+    extractors = []
+    for name in EXTRACTORS:
+        try:
+            extractors.append(get_extractor(name, fallback=False))
+        except ImportError as e:
+            print(f"{name:>16}: skipped ({e})")
+    extractors.append(get_extractor())
+
+    failed = False
+    for extractor in extractors:
+        failures = check(extractor, corpus)
+        if isinstance(extractor, StreamingExtractor):
+            failures += check_chunks(corpus)
+        pages_per_sec, mib_per_sec = throughput(extractor, corpus, args.seconds)
+        status = "ok" if not failures else f"{len(failures)} FAILED"
+        print(f"{extractor.name:>16}: {pages_per_sec:9.1f} pages/s  {mib_per_sec:7.1f} MiB/s  [{status}]")
+        for failure in failures:
+            print(f"    {failure}")
+        failed = failed or bool(failures)
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""requests.get 호출별 연결 vs 공유 Fetcher: python -m benchmarks.bench_fetcher --requests 2000"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks._util import percentile
+from benchmarks.stub_server import StubServer
+from fetcher import DEFAULT_HEADERS, Fetcher
+
+
+def run(label, get, url, total, concurrency):
+    latencies = []
+
+    def one(index):
+        started = time.perf_counter()
+        res = get(f"{url}/vp/products/{index % 100}")
+        res.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{label:>14}: {total / elapsed:8.1f} req/s  "
+          f"p50={percentile(latencies, 0.5) * 1000:6.2f}ms  p99={percentile(latencies, 0.99) * 1000:6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="스텁 서버 응답 지연(초)")
+    args = parser.parse_args()
+
+    server = StubServer(latency=args.latency).start()
+    headers = {key: value for key, value in DEFAULT_HEADERS.items() if key != "Accept-Encoding"}
+
+    # 기존 방식: 매 호출마다 헤더를 만들고 새 연결을 연다
+    run("requests.get", lambda url: requests.get(url, headers=dict(headers)),
+        server.base_url, args.requests, args.concurrency)
+
+    fetcher = Fetcher(max_per_host=args.concurrency)
+    run("Fetcher", fetcher.get, server.base_url, args.requests, args.concurrency)
+    fetcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
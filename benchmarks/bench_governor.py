@@ -0,0 +1,98 @@
+"""429/403을 돌려주는 스텁 서버에 대한 지속 성공률: 제한 없음 vs RateGovernor
+python -m benchmarks.bench_governor --limit 40 --seconds 20"""
+import argparse
+import threading
+import time
+
+import requests
+
+from benchmarks.stub_server import StubServer
+from fetcher import Fetcher
+from governor import CircuitOpenError, RateGovernor
+from response_cache import ResponseCache
+
+
+def hammer(server, governor, threads, seconds, links=200):
+    # threads개 스레드가 쉬지 않고 가격을 가져온다 (재시도 없음), 초마다 성공 수를 센다
+    cache = ResponseCache(Fetcher(retries=0, max_per_host=threads, governor=governor))
+    started = time.monotonic()
+    timeline = [0] * (int(seconds) + 1)
+    counts = {"ok": 0, "refused": 0, "skipped": 0}
+    lock = threading.Lock()
+
+    def run(offset):
+        index = offset
+        while time.monotonic() - started < seconds:
+            link = f"{server.base_url}/vp/products/{index % links}"
+            index += threads
+            try:
+                price = cache.fetch_price(link)
+                outcome = "ok" if price is not None else "refused"
+            except CircuitOpenError as e:
+                # 차단 중에는 보내지 않는다 (실제 크롤링은 다음 주기로 넘어감)
+                outcome = "skipped"
+                time.sleep(min(1.0, max(0.05, e.retry_in)))
+            except requests.HTTPError:
+                outcome = "refused"
+            with lock:
+                counts[outcome] += 1
+                if outcome == "ok":
+                    timeline[min(len(timeline) - 1, int(time.monotonic() - started))] += 1
+
+    workers = [threading.Thread(target=run, args=(offset,)) for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    cache.fetcher.close()
+    return counts, timeline
+
+
+def report(label, server, counts, timeline, governor=None):
+    # 앞쪽 절반은 속도를 찾는 구간, 뒤쪽 절반의 성공률을 지속 성공률로 본다
+    tail = timeline[len(timeline) // 2:-1]
+    sustained = sum(tail) / max(1, len(tail))
+    sent = server.requests
+    print(f"{label:>30}: sustained {sustained:6.1f} ok/s, sent {sent:6,} requests, refused {server.refused:6,} "
+          f"({server.refused / max(1, sent):5.1%}), skipped while open {counts['skipped']:,}")
+    if governor is not None:
+        for host, stats in governor.stats().items():
+            print(f"{'':>30}  {stats}")
+
+
+def run_case(label, limit, threads, seconds, governor=None, over_limit="429", retry_after=None, block=None):
+    server = StubServer(max_rate=limit, over_limit=over_limit, retry_after=retry_after).start()
+    if block is not None:
+        # 실행 중간에 block초 동안 모든 요청을 막는다 (일시 차단 -> 자동 복구 확인)
+        start_block, duration = block
+        timer = threading.Timer(start_block, lambda: setattr(server, "blocked_until", time.monotonic() + duration))
+        timer.start()
+    counts, timeline = hammer(server, governor, threads, seconds)
+    report(label, server, counts, timeline, governor)
+    if block is not None:
+        print(f"{'':>30}  ok/s per second: {timeline[:-1]}")
+    server.shutdown()
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=float, default=40, help="stub refuses above this many requests/s")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    print(f"stub limit {args.limit:g} req/s, {args.threads} threads, {args.seconds:g}s per case")
+    common = dict(limit=args.limit, threads=args.threads, seconds=args.seconds)
+    run_case("no governor (429)", **common)
+    run_case("governor (429)", governor=RateGovernor(), **common)
+    run_case("governor (429 + Retry-After 1)", governor=RateGovernor(), retry_after=1, **common)
+    run_case("no governor (bot check page)", over_limit="captcha", **common)
+    run_case("governor (bot check page)", governor=RateGovernor(), over_limit="captcha", **common)
+    # 일시 차단: 5초 동안 403 -> circuit open, 확인 요청으로 자동 복구
+    run_case("governor (403 block 5s, no limit)", governor=RateGovernor(open_seconds=2), over_limit="403",
+             block=(args.seconds / 3, 5), **dict(common, limit=None))
+
+
+if __name__ == "__main__":
+    main()
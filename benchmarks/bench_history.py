@@ -0,0 +1,110 @@
+"""상품별 메모리 가격 기록 비교 (리스트/튜플 + 스레드 객체 vs array + __slots__): python -m benchmarks.bench_history --products 100000 --days 7"""
+import argparse
+import gc
+import multiprocessing
+import random
+import threading
+import time
+import tracemalloc
+
+from benchmarks._util import rss_bytes
+from main_generalization import ItemWatch
+
+HOUR = 3600
+
+
+class LegacyItemThread(threading.Thread):
+    # 기존 표현: 상품마다 Thread 객체(__dict__) + hourly_prices 리스트 + (시각 문자열, 가격) 튜플 리스트
+    def __init__(self, product_name, product_link):
+        super(LegacyItemThread, self).__init__()
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        self.product_name = product_name
+        self.product_link = product_link
+        self.running = True
+        self.crawled_price = None
+        self.crawled_count = 0
+        self.average_price = 0
+        self.hourly_prices = []
+        self.price_data_list = []
+
+    def record(self, ts, price):
+        self.crawled_price = price
+        self.hourly_prices.append(price)
+        self.price_data_list.append((time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)), price))
+
+
+class CompactItemWatch(ItemWatch):
+    __slots__ = ()
+
+    def record(self, ts, price):
+        self.crawled_price = price
+        self.history.record(ts, price)
+
+
+def build(factory, products, days, start):
+    rng = random.Random(1)
+    items = []
+    for product in range(products):
+        item = factory(f"상품{product}", f"https://www.coupang.com/vp/products/{product}")
+        price = rng.randint(5000, 500000)
+        for hour in range(days * 24):
+            # 매 시 조금씩 바뀌는 가격 (작은 정수 캐시에 걸리지 않도록 큰 값)
+            item.record(start + hour * HOUR, price + rng.randint(-500, 500))
+        items.append(item)
+    return items
+
+
+def traced_bytes(factory, products, days, start):
+    # tracemalloc으로 정확한 바이트 수 (추적 비용이 커서 표본 상품 수만)
+    gc.collect()
+    tracemalloc.start()
+    items = build(factory, products, days, start)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return current
+
+
+def rss_growth(factory, products, days, start, results):
+    # 자식 프로세스에서 전체 상품 수를 만들고 늘어난 RSS를 돌려준다
+    before = rss_bytes()
+    began = time.perf_counter()
+    items = build(factory, products, days, start)
+    results.put((rss_bytes() - before, time.perf_counter() - began, len(items)))
+
+
+def measure(label, factory, args, start):
+    per_product = traced_bytes(factory, args.sample, args.days, start) / args.sample
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=rss_growth, args=(factory, args.products, args.days, start, results))
+    child.start()
+    growth, elapsed, _ = results.get()
+    child.join()
+    print(f"{label:>10}: {per_product:8.0f} B/product (traced) -> {per_product * args.products / 2 ** 20:8.1f} MiB, "
+          f"RSS +{growth / 2 ** 20:8.1f} MiB, build {elapsed:.1f}s")
+    return per_product, growth
+
+
+def compact_watch(product_name, product_link):
+    return CompactItemWatch(None, product_name, product_link)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--sample", type=int, default=2000)
+    args = parser.parse_args()
+
+    # 자정에서 시작해 날짜가 정확히 days일이 되도록
+    now = time.localtime()
+    start = time.mktime((now.tm_year, now.tm_mon, now.tm_mday, 0, 0, 0, 0, 0, -1)) - args.days * 24 * HOUR
+    print(f"{args.products} products x {args.days} days x 24 hourly prices")
+    legacy = measure("legacy", LegacyItemThread, args, start)
+    compact = measure("compact", compact_watch, args, start)
+    print(f"{'saving':>10}: {legacy[0] / compact[0]:8.1f}x traced, {legacy[1] / max(compact[1], 1):.1f}x RSS")
+
+
+if __name__ == "__main__":
+    main()
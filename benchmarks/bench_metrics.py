@@ -0,0 +1,90 @@
+"""지표 수집 부하: 크롤링 경로(요청 + 파싱)에서 metrics on/off 비교, 지표 한 번 기록하는 비용
+python -m benchmarks.bench_metrics --fetches 300 --rounds 10"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks.stub_server import StubServer
+from fetcher import Fetcher
+from metrics import MetricsRegistry, SamplingProfiler, get_metrics
+from response_cache import ResponseCache
+
+# 크롤링 한 번에 기록하는 지표 수 (응답 시간, 응답 코드, 파싱 시간, 캐시 결과, 크롤링 결과)
+CALLS_PER_FETCH = 5
+
+
+def per_call_seconds(registry, calls=200000):
+    histogram = registry.histogram("bench_seconds", "benchmark histogram")
+    counter = registry.counter("bench_total", "benchmark counter", label="status")
+    started = time.perf_counter()
+    for _ in range(calls):
+        histogram.observe(0.0123)
+        counter.inc(label=200)
+    return (time.perf_counter() - started) / (2 * calls)
+
+
+def fetch_round(server, fetches):
+    # 라운드마다 새 캐시: 모든 요청이 다운로드 + 파싱 (가장 긴 경로)
+    cache = ResponseCache(Fetcher(retries=0, governor=None))
+    started = time.perf_counter()
+    for index in range(fetches):
+        if cache.fetch_price(f"{server.base_url}/vp/products/{index}") is None:
+            raise RuntimeError("price not found")
+    elapsed = time.perf_counter() - started
+    cache.fetcher.close()
+    return elapsed / fetches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fetches", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    on = per_call_seconds(MetricsRegistry())
+    off = per_call_seconds(MetricsRegistry(enabled=False))
+    print(f"per metric call: enabled {on * 1e9:6.0f} ns, disabled {off * 1e9:6.0f} ns")
+
+    metrics = get_metrics()
+    server = StubServer().start()
+    fetch_round(server, 20)
+    # on/off를 번갈아 돌려서 시간에 따른 변동이 양쪽에 같이 들어가게 한다
+    timings = {True: [], False: []}
+    for round_index in range(2 * args.rounds):
+        metrics.enabled = round_index % 2 == 0
+        timings[metrics.enabled].append(fetch_round(server, args.fetches))
+    metrics.enabled = True
+    server.shutdown()
+    server.server_close()
+
+    fetch_on = statistics.median(timings[True])
+    fetch_off = statistics.median(timings[False])
+    accounted = CALLS_PER_FETCH * (on - off) / fetch_off
+    print(f"fetch + parse per page: metrics on {fetch_on * 1e3:7.3f} ms, off {fetch_off * 1e3:7.3f} ms "
+          f"(measured {(fetch_on - fetch_off) / fetch_off:+.2%}, round-to-round spread "
+          f"{statistics.pstdev(timings[False]) / fetch_off:.2%})")
+    print(f"instrumentation cost: {CALLS_PER_FETCH} calls x {(on - off) * 1e9:.0f} ns = "
+          f"{CALLS_PER_FETCH * (on - off) * 1e6:.2f} us per page = {accounted:.3%} of the fetch path "
+          f"(loopback stub, real pages take longer)")
+    snapshot = metrics.snapshot()
+    print(f"fetch_seconds {snapshot['fetch_seconds']}, parse_seconds {snapshot['parse_seconds']}")
+
+    # 샘플링 프로파일러: 바쁜 스레드 하나를 1초 동안 찍어 본다
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy)
+    worker.start()
+    report = SamplingProfiler().run(1.0, top=3)
+    stop.set()
+    worker.join()
+    print(f"profiler: {report['samples']} samples, top stack {report['stacks'][0]}")
+    assert accounted < 0.01, "metrics overhead above 1% of the fetch path"
+
+
+if __name__ == "__main__":
+    main()
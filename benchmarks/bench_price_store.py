@@ -0,0 +1,87 @@
+"""가격 저장소 쓰기 비용: python -m benchmarks.bench_price_store --products 10000 --days 365"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import openpyxl
+
+from price_store import COLUMN_HEADERS, PriceStore
+
+DAY = 24 * 3600
+
+
+def bench_store(path, products, days, report_every):
+    store = PriceStore(path)
+    links = [f"https://www.coupang.com/vp/products/{index}" for index in range(products)]
+    for index, link in enumerate(links):
+        store.register_product(link, f"상품{index}")
+
+    rng = random.Random(1)
+    start = int(time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1)))
+    total = 0.0
+    window = 0.0
+    for day in range(days):
+        day_start = start + day * DAY
+        day_name = time.strftime("%Y-%m-%d", time.localtime(day_start))
+        samples = []
+        averages = []
+        for link in links:
+            base = rng.randrange(1000, 100000)
+            prices = [base + rng.randrange(-500, 500) for _ in range(24)]
+            samples.extend((link, day_start + hour * 3600, price) for hour, price in enumerate(prices))
+            averages.append((link, day_name, sum(prices) // 24))
+
+        started = time.perf_counter()
+        store.write(samples, averages)
+        elapsed = time.perf_counter() - started
+        total += elapsed
+        window += elapsed
+        if (day + 1) % report_every == 0 or day + 1 == days:
+            print(f"  day {day + 1:4d}: {window / report_every * 1000:8.1f} ms/day "
+                  f"({len(samples) / (window / report_every):,.0f} rows/s), db={os.path.getsize(path) / 1024 / 1024:,.0f} MiB")
+            window = 0.0
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        store.samples(rng.choice(links), start + 7 * DAY, start + 14 * DAY)
+    lookup = (time.perf_counter() - started) / 1000
+    print(f"[sqlite] {products} products x {days} days: total write {total:.1f}s, "
+          f"1-week product lookup {lookup * 1e6:.0f}us")
+    store.close()
+
+
+def bench_openpyxl(path, products, days):
+    # 기존 방식: 상품마다 전체 워크북을 읽고 한 줄 추가 후 다시 저장
+    workbook = openpyxl.Workbook()
+    workbook.active.append(COLUMN_HEADERS)
+    workbook.save(path)
+    for day in range(days):
+        started = time.perf_counter()
+        for _ in range(products):
+            workbook = openpyxl.load_workbook(path)
+            workbook.active.append([f"{day}"] + list(range(25)))
+            workbook.save(path)
+            workbook.close()
+        print(f"[openpyxl] day {day + 1}: {(time.perf_counter() - started) * 1000:8.1f} ms for {products} products")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--report-every", type=int, default=30)
+    parser.add_argument("--openpyxl-products", type=int, default=100,
+                        help="비교용 openpyxl 방식 상품 수 (0이면 생략)")
+    parser.add_argument("--openpyxl-days", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bench_store(os.path.join(directory, "bench.db"), args.products, args.days, args.report_every)
+        if args.openpyxl_products:
+            bench_openpyxl(os.path.join(directory, "bench.xlsx"), args.openpyxl_products, args.openpyxl_days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""프레이밍 프로토콜 처리량(messages/s): python -m benchmarks.bench_protocol --messages 20000"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+from async_server import AsyncPriceServer
+from main_generalization import PriceServer
+from price_store import PriceStore
+from protocol import ADD, QUERY, MessageReader, encode_message
+
+
+def product_link(product):
+    # 쉼표가 들어간 링크도 그대로 전달된다
+    return f"https://www.coupang.com/vp/products/{product}?itemId={product},1"
+
+
+def seed_prices(server, products):
+    # 정기 크롤링이 이미 가격을 채워 둔 상태에서 query 처리량을 잰다 (외부 요청 없음)
+    for product in range(products):
+        server.latest.put(product_link(product), 10000 + product)
+
+
+def make_messages(count, products):
+    messages = []
+    for index in range(count):
+        product = index % products
+        link = product_link(product)
+        if index < products:
+            messages.append({"type": ADD, "id": index, "name": f"상품{product}", "desired_price": 10000,
+                             "link": link})
+        else:
+            messages.append({"type": QUERY, "id": index, "link": link})
+    return messages
+
+
+def bench_framing(messages):
+    payload = b"".join(encode_message(message) for message in messages)
+    rng = random.Random(1)
+    started = time.perf_counter()
+    reader = MessageReader()
+    decoded = 0
+    position = 0
+    while position < len(payload):
+        size = rng.randint(1, 4096)
+        decoded += len(reader.feed(payload[position:position + size]))
+        position += size
+    elapsed = time.perf_counter() - started
+    print(f"{'framing only':>16}: {decoded / elapsed:12,.0f} msg/s ({len(payload) / 1024:.0f} KiB)")
+
+
+def run_client(port, messages):
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    payload = b"".join(encode_message(message) for message in messages)
+    reader = MessageReader()
+    replies = 0
+    kinds = {}
+
+    started = time.perf_counter()
+    # 응답을 기다리지 않고 모든 요청을 한 번에 보낸다 (파이프라이닝)
+    sender = threading.Thread(target=sock.sendall, args=(payload,))
+    sender.start()
+    while replies < len(messages):
+        data = sock.recv(65536)
+        if not data:
+            break
+        for reply in reader.feed(data):
+            replies += 1
+            kinds[reply["type"]] = kinds.get(reply["type"], 0) + 1
+    elapsed = time.perf_counter() - started
+    sender.join()
+    sock.close()
+    return replies, elapsed, kinds
+
+
+def report(label, messages, replies, elapsed, kinds):
+    return f"{label:>16}: {replies / elapsed:12,.0f} msg/s ({replies}/{len(messages)} replies, {kinds})"
+
+
+def bench_threaded(messages, products, directory):
+    server = PriceServer("127.0.0.1", 0, os.path.join(directory, "threaded.db"))
+    seed_prices(server, products)
+    threading.Thread(target=server.start, daemon=True).start()
+    result = report("PriceServer", messages, *run_client(server.server_port, messages))
+    server.writer.close()
+    return result
+
+
+def bench_async(messages, products):
+    loop = asyncio.new_event_loop()
+    server = AsyncPriceServer("127.0.0.1", 0, store=PriceStore(":memory:"))
+    seed_prices(server, products)
+    loop.run_until_complete(server.start_server())
+    port = server.server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return report("AsyncPriceServer", messages, *run_client(port, messages))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--products", type=int, default=1000)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.products)
+    bench_framing(messages)
+    # 서버 로그는 버리고 결과만 출력
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        results = [bench_threaded(messages, args.products, directory), bench_async(messages, args.products)]
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""현재가 조회 지연: 매번 크롤링 vs 최신 가격 캐시: python -m benchmarks.bench_query --queries 10000"""
+import argparse
+import contextlib
+import io
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from benchmarks._util import percentile
+from benchmarks.stub_server import StubServer
+from latest_price import LatestPriceCache
+from main_generalization import PriceServer
+from protocol import QUERY, MessageReader, encode_message
+
+
+class QueryClient:
+    def __init__(self, port):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = MessageReader()
+        self.pending = []
+
+    def query(self, link, max_age=None):
+        message = {"type": QUERY, "link": link}
+        if max_age is not None:
+            message["max_age"] = max_age
+        self.sock.sendall(encode_message(message))
+        while not self.pending:
+            self.pending.extend(self.reader.feed(self.sock.recv(65536)))
+        return self.pending.pop(0)
+
+    def close(self):
+        self.sock.close()
+
+
+def timed_queries(client, link, count, max_age=None):
+    latencies = []
+    reply = None
+    for _ in range(count):
+        started = time.perf_counter()
+        reply = client.query(link, max_age)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies, reply
+
+
+def report(label, latencies):
+    print(f"{label:>24}: p50 {percentile(latencies, 0.5) * 1e6:12,.1f}us  "
+          f"p99 {percentile(latencies, 0.99) * 1e6:12,.1f}us  ({len(latencies)} queries)")
+
+
+def bench_in_process(link, count):
+    cache = LatestPriceCache(lambda url: 12900)
+    cache.put(link, 12900)
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        cache.get(link)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    report("cache.get (in-process)", latencies)
+
+
+def bench_single_flight(server, stub, link, clients):
+    # 만료된 상품을 여러 클라이언트가 동시에 조회해도 페이지는 한 번만 받는다
+    connections = [QueryClient(server.server_port) for _ in range(clients)]
+    before = stub.requests
+    barrier = threading.Barrier(clients)
+    replies = []
+
+    def run(client):
+        barrier.wait()
+        replies.append(client.query(link, max_age=0))
+
+    threads = [threading.Thread(target=run, args=(client,)) for client in connections]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for client in connections:
+        client.close()
+    return (f"{'single-flight':>24}: {clients} concurrent expired queries -> {stub.requests - before} page fetch(es) "
+            f"in {elapsed:.2f}s, prices {sorted(set(reply['price'] for reply in replies))}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--live-queries", type=int, default=5)
+    parser.add_argument("--fetch-latency", type=float, default=1.0, help="stub page latency (seconds)")
+    parser.add_argument("--clients", type=int, default=50)
+    args = parser.parse_args()
+
+    stub = StubServer(latency=args.fetch_latency).start()
+    link = f"{stub.base_url}/vp/products/1"
+    with tempfile.TemporaryDirectory() as directory:
+        # 서버 로그는 버리고 결과만 출력
+        with contextlib.redirect_stdout(io.StringIO()):
+            server = PriceServer("127.0.0.1", 0, os.path.join(directory, "query.db"))
+            threading.Thread(target=server.start, daemon=True).start()
+        client = QueryClient(server.server_port)
+
+        # 기존 방식: 조회할 때마다 페이지를 받아서 파싱
+        latencies, reply = timed_queries(client, link, args.live_queries, max_age=0)
+        report("live crawl per query", latencies)
+
+        # 최신 가격 캐시: TTL 안에서는 페이지를 받지 않는다
+        latencies, reply = timed_queries(client, link, args.queries)
+        report("hot cache over socket", latencies)
+        print(f"{'':>24}  last reply: price={reply['price']} age={reply['age']}s stale={reply['stale']} "
+              f"cached={reply['cached']}")
+        bench_in_process(link, args.queries)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = bench_single_flight(server, stub, link, args.clients)
+        print(result)
+        print(f"{'cache stats':>24}: {server.latest.stats()}")
+        client.close()
+        server.writer.close()
+
+
+if __name__ == "__main__":
+    main()
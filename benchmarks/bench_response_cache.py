@@ -0,0 +1,82 @@
+"""조건부 요청/가격 영역 해시 캐시 효과: python -m benchmarks.bench_response_cache --products 200 --rounds 24"""
+import argparse
+import random
+import time
+
+from benchmarks.stub_server import StubServer
+from extractor import get_extractor
+from fetcher import Fetcher
+from response_cache import ResponseCache
+
+
+class ChangingPriceServer(StubServer):
+    def __init__(self, products, **kwargs):
+        super().__init__(**kwargs)
+        self.prices = {f"/vp/products/{index}": 10000 + index for index in range(products)}
+
+    def price_for(self, path):
+        return self.prices[path]
+
+    def next_round(self, change_probability, rng):
+        changed = 0
+        for path in self.prices:
+            if rng.random() < change_probability:
+                self.prices[path] += rng.choice((-100, 100))
+                changed += 1
+        return changed
+
+
+def run(label, server, fetch_price, rounds, change_probability, seed):
+    rng = random.Random(seed)
+    wrong = 0
+    started_wall = time.perf_counter()
+    started_cpu = time.process_time()
+    for round_index in range(rounds):
+        if round_index:
+            server.next_round(change_probability, rng)
+        for path, expected in server.prices.items():
+            if fetch_price(server.base_url + path) != expected:
+                wrong += 1
+    wall = time.perf_counter() - started_wall
+    cpu = time.process_time() - started_cpu
+    print(f"{label:>22}: wall={wall:6.2f}s cpu={cpu:6.2f}s wrong={wrong}")
+    return cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=24)
+    parser.add_argument("--change-probability", type=float, default=0.1)
+    parser.add_argument("--extractor", default="streaming", help="streaming | lxml | bs4")
+    args = parser.parse_args()
+
+    extractor = get_extractor(args.extractor)
+    for conditional, noise in ((True, False), (False, True)):
+        label = "ETag/304" if conditional else "region hash"
+        server = ChangingPriceServer(args.products, conditional=conditional, noise=noise).start()
+        fetcher = Fetcher()
+
+        def fetch_uncached(url):
+            return extractor.extract(fetcher.get(url).text)
+
+        baseline_cpu = run(f"no cache ({label})", server, fetch_uncached,
+                           args.rounds, args.change_probability, seed=1)
+
+        server.prices = ChangingPriceServer(args.products).prices
+        cache = ResponseCache(fetcher=fetcher, extract=extractor.extract)
+        cached_cpu = run(f"cache ({label})", server, cache.fetch_price,
+                         args.rounds, args.change_probability, seed=1)
+
+        stats = cache.stats()
+        print(f"    hit rate={stats['hit_rate']:.1%} (304={stats['not_modified']}, "
+              f"region={stats['region_hits']}, miss={stats['misses']})")
+        print(f"    bytes saved={stats['bytes_saved'] / 1024 / 1024:.1f} MiB, "
+              f"parse CPU saved~{stats['parse_seconds_saved']:.2f}s, "
+              f"measured CPU delta={baseline_cpu - cached_cpu:.2f}s")
+        fetcher.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
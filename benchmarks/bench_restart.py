@@ -0,0 +1,137 @@
+"""재시작 시간: 저장된 감시 목록 복구 vs 클라이언트 재구독: python -m benchmarks.bench_restart --products 100000"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from benchmarks._util import rss_bytes
+from main_generalization import PriceServer
+from price_store import PriceStore
+from watch_log import WatchLog, watch_path_for
+
+HOUR = 3600
+
+
+class FakeClient:
+    # 재구독 비교용 (알림은 보내지 않는다)
+    def send_alert(self, *args):
+        pass
+
+
+class QuietServer(PriceServer):
+    # 시작 시간만 잰다 (스케줄된 크롤링은 실행하지 않음)
+    def dispatch_batch(self, slot, callbacks):
+        pass
+
+
+def links_for(products):
+    return [f"https://www.coupang.com/vp/products/{product}" for product in range(products)]
+
+
+def seed(db_path, products, hours, stale_rate):
+    # 상품 목록 + 오늘 hours시간치 가격 기록, stale_rate 비율의 상품은 마지막 기록이 오래됨
+    rng = random.Random(1)
+    now = time.time()
+    current = time.localtime(now)
+    today = time.mktime((current.tm_year, current.tm_mon, current.tm_mday, 0, 0, 0, 0, 0, -1))
+    first_hour = max(today, now - hours * HOUR)
+    store = PriceStore(db_path, synchronous="OFF")
+    links = links_for(products)
+    store.write(products=[(link, f"상품{index}") for index, link in enumerate(links)])
+    samples = []
+    for link in links:
+        last = now - (2 * HOUR if rng.random() < stale_rate else 60)
+        base = rng.randint(5000, 500000)
+        ts = first_hour
+        while ts <= last:
+            samples.append((link, ts, base + rng.randint(-500, 500)))
+            ts += HOUR
+        if len(samples) > 200000:
+            store.write(samples)
+            samples = []
+    store.write(samples)
+    store.close()
+
+    watch_log = WatchLog(watch_path_for(db_path))
+    watch_log.load()
+    for index, link in enumerate(links):
+        watch_log.add(link, f"상품{index}")
+    watch_log.close()
+    return links
+
+
+def start_server(db_path, watch_path=None):
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        started = time.perf_counter()
+        server = QuietServer("127.0.0.1", 0, db_path, watch_path=watch_path)
+        elapsed = time.perf_counter() - started
+    return server, elapsed, output.getvalue()
+
+
+def first_crawls(server, window):
+    # 첫 크롤링 시각 분포 (window초 안에 몰리는 수)
+    now = time.time()
+    dues = sorted(entry[0] - now for entry in server.scheduler._heap)
+    within = sum(1 for due in dues if due <= window)
+    return within, dues
+
+
+def close(server):
+    server.scheduler.stop()
+    server.writer.close()
+    server.watch_log.close()
+    server.server_socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--hours", type=int, default=12, help="hours of today's samples per product")
+    parser.add_argument("--stale-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "restart.db")
+        started = time.perf_counter()
+        links = seed(db_path, args.products, args.hours, args.stale_rate)
+        print(f"seeded {args.products:,} products in {time.perf_counter() - started:.1f}s "
+              f"(snapshot {os.path.getsize(watch_path_for(db_path)) / 1e6:.1f} MB)")
+
+        started = time.perf_counter()
+        saved = WatchLog(watch_path_for(db_path)).load()
+        print(f"{'watch log load':>28}: {time.perf_counter() - started:8.3f}s ({len(saved):,} products)")
+        store = PriceStore(db_path)
+        started = time.perf_counter()
+        rows = sum(1 for _ in store.recent_samples(time.time() - 24 * HOUR))
+        print(f"{'recent samples query':>28}: {time.perf_counter() - started:8.3f}s ({rows:,} rows)")
+        store.close()
+
+        # 복구: 감시 목록 + 오늘 가격을 불러오고 첫 크롤링을 분산
+        rss = rss_bytes()
+        server, elapsed, output = start_server(db_path)
+        print(f"{'warm restart':>28}: {elapsed:8.3f}s, +{(rss_bytes() - rss) / 1e6:.0f} MB  ({output.strip()})")
+        within, dues = first_crawls(server, 60)
+        fresh = sum(1 for link in links if server.latest.peek(link) is not None and server.latest.is_fresh(
+            server.latest.peek(link)))
+        print(f"{'':>28}  answerable from cache: {fresh:,}, first crawls within 60s: {within:,}, "
+              f"within stagger window: {sum(1 for due in dues if due <= server.restore_stagger_seconds):,}")
+        close(server)
+
+        # 기존 방식: 빈 서버에 클라이언트들이 상품을 다시 등록 (가격은 없어서 query마다 크롤링)
+        server, elapsed, _ = start_server(os.path.join(directory, "cold.db"))
+        client = FakeClient()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for index, link in enumerate(links):
+                server.subscribe(client, f"상품{index}", 10000, link)
+        resubscribe = time.perf_counter() - started
+        print(f"{'cold start + resubscribe':>28}: {elapsed + resubscribe:8.3f}s, answerable from cache: "
+              f"{len(server.latest.entries):,} (every query until the next hourly slot triggers a fetch)")
+        close(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""중앙 스케줄러 tick 비용 측정: python -m benchmarks.bench_scheduler --items 100000"""
+import argparse
+import time
+
+from benchmarks._util import percentile
+from scheduler import HourlyScheduler, next_hour_boundary
+
+
+class VirtualClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def bench_heap(items, jitter, step):
+    clock = VirtualClock(next_hour_boundary(time.time()) - 1)
+    scheduler = HourlyScheduler(jitter_seconds=jitter, clock=clock)
+    noop = lambda: None
+
+    started = time.perf_counter()
+    for index in range(items):
+        scheduler.every_hour(index, noop)
+    register_time = time.perf_counter() - started
+
+    # 한 시간 슬롯 전체를 step초 간격으로 진행하며 tick 비용을 잰다
+    tick_times = []
+    batch_sizes = []
+    fired = 0
+    for _ in range(int((jitter + 2) / step) + 1):
+        clock.now += step
+        started = time.perf_counter()
+        batches = scheduler.pop_due()
+        tick_times.append(time.perf_counter() - started)
+        size = sum(len(batch) for batch in batches.values())
+        batch_sizes.append(size)
+        fired += size
+
+    tick_times.sort()
+    print(f"[heap] items={items} jitter={jitter}s step={step}s register={register_time:.3f}s")
+    print(f"  fired={fired} max batch={max(batch_sizes)} ticks={len(tick_times)}")
+    print(f"  tick p50={percentile(tick_times, 0.5) * 1e6:.1f}us "
+          f"p99={percentile(tick_times, 0.99) * 1e6:.1f}us max={tick_times[-1] * 1e6:.1f}us")
+    per_item = sum(tick_times) / max(1, fired)
+    print(f"  cost per fired item={per_item * 1e6:.2f}us")
+
+    # 아무것도 실행되지 않는 tick (힙 top만 확인)
+    started = time.perf_counter()
+    for _ in range(1000):
+        scheduler.pop_due()
+    print(f"  idle tick={(time.perf_counter() - started) / 1000 * 1e6:.2f}us")
+
+
+def bench_schedule_library(items):
+    import schedule
+
+    scheduler = schedule.Scheduler()
+    noop = lambda: None
+    for _ in range(items):
+        for hour in range(24):
+            scheduler.every().day.at(f"{hour:02d}:00").do(noop)
+        scheduler.every().day.at("23:50").do(noop)
+
+    started = time.perf_counter()
+    for _ in range(10):
+        scheduler.run_pending()
+    print(f"[schedule] items={items} jobs={len(scheduler.jobs)} "
+          f"idle tick={(time.perf_counter() - started) / 10 * 1e6:.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--jitter", type=int, default=3000)
+    parser.add_argument("--step", type=float, default=1.0)
+    parser.add_argument("--compare-items", type=int, default=10000,
+                        help="schedule 라이브러리 비교용 아이템 수 (0이면 생략)")
+    args = parser.parse_args()
+
+    bench_heap(args.items, args.jitter, args.step)
+    if args.compare_items:
+        bench_schedule_library(args.compare_items)
+
+
+if __name__ == "__main__":
+    main()
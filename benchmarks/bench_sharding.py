@@ -0,0 +1,138 @@
+"""워커 프로세스 수에 따른 처리량 (1/2/4/8) + 워커 종료 시 재분배: python -m benchmarks.bench_sharding --pages 500"""
+import argparse
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_server import StubServer
+from extractor import get_extractor
+from sharding import HashRing, ShardPool
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "basic.html")
+_page = None
+
+
+def parse_fixture(product_link):
+    # CPU만 쓰는 작업: 64KB 상품 페이지를 BeautifulSoup으로 파싱 (기존 크롤링 경로)
+    global _page
+    if _page is None:
+        with open(FIXTURE, encoding="utf-8") as page:
+            _page = page.read()
+    return get_extractor("bs4", fallback=False).extract(_page)
+
+
+def serve_stub(port_queue, latency):
+    stub = StubServer(latency=latency)
+    port_queue.put(stub.server_address[1])
+    stub.serve_forever()
+
+
+class Counter:
+    def __init__(self, target):
+        self.target = target
+        self.count = 0
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.count += 1
+            if self.count >= self.target:
+                self.done.set()
+
+
+def links_for(count, base_urls):
+    return [f"{base_urls[index % len(base_urls)]}/vp/products/{index}" for index in range(count)]
+
+
+def bench_threads(links, fetch_price):
+    # 기존 구조: 한 프로세스의 ThreadPoolExecutor(max_workers=5)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        list(pool.map(fetch_price, links))
+    return len(links) / (time.perf_counter() - started)
+
+
+def bench_shards(workers, links, fetch_price, threads_per_worker):
+    warmup = Counter(workers * 4)
+    pool = ShardPool(workers, warmup, fetch_price=fetch_price, threads_per_worker=threads_per_worker)
+    # 워커 시작(spawn + import) 시간은 빼고 잰다
+    pool.submit([f"{link}?warmup" for link in links[:workers * 4]])
+    warmup.done.wait(60)
+
+    counter = Counter(len(links))
+    pool.on_price = counter
+    started = time.perf_counter()
+    pool.submit(links)
+    counter.done.wait(600)
+    elapsed = time.perf_counter() - started
+    pool.close()
+    return counter.count / elapsed
+
+
+def bench_kill(links, fetch_price, workers, threads_per_worker):
+    # 처리 중에 워커 하나를 강제 종료해도 모든 상품이 끝나는지
+    counter = Counter(len(links))
+    pool = ShardPool(workers, counter, fetch_price=fetch_price, threads_per_worker=threads_per_worker)
+    pool.submit(links)
+    while counter.count < len(links) // 4:
+        time.sleep(0.01)
+    victim = pool.workers[0].process
+    os.kill(victim.pid, signal.SIGKILL)
+    finished = counter.done.wait(600)
+    stats = pool.stats()
+    pool.close()
+    print(f"kill 1 of {workers} workers mid-run: {'all' if finished else 'NOT all'} {counter.count}/{len(links)} "
+          f"prices received, rebalanced {stats['rebalanced']} in-flight, deaths {stats['deaths']}")
+
+
+def ring_movement(products, workers):
+    # 워커 하나가 빠질 때 다른 워커로 옮겨 가는 상품 비율 (일관된 해싱이면 약 1/workers)
+    keys = [f"https://www.coupang.com/vp/products/{index}" for index in range(products)]
+    ring = HashRing(range(workers))
+    before = [ring.node_for(key) for key in keys]
+    ring.remove(0)
+    moved = sum(1 for key, owner in zip(keys, before) if ring.node_for(key) != owner)
+    shares = [before.count(node) / products for node in range(workers)]
+    print(f"ring with {workers} workers: shares {min(shares):.1%}~{max(shares):.1%}, "
+          f"removing one moves {moved / products:.1%} of products")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--mode", choices=["parse", "http"], default="parse",
+                        help="parse: CPU-only BeautifulSoup parsing, http: fetch from stub servers + parse")
+    parser.add_argument("--stub-servers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--threads-per-worker", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"cpu cores: {os.cpu_count()}, mode={args.mode}, pages={args.pages}")
+    if args.mode == "parse":
+        fetch_price = parse_fixture
+        links = links_for(args.pages, ["http://stub"])
+    else:
+        import multiprocessing
+        from sharding import _fetch_price
+        fetch_price = _fetch_price
+        # 스텁 서버도 별도 프로세스로 (같은 프로세스면 스텁이 병목)
+        context = multiprocessing.get_context("spawn")
+        ports = context.Queue()
+        for _ in range(args.stub_servers):
+            context.Process(target=serve_stub, args=(ports, args.latency), daemon=True).start()
+        links = links_for(args.pages, [f"http://127.0.0.1:{ports.get()}" for _ in range(args.stub_servers)])
+
+    print(f"{'threads (1 process)':>20}: {bench_threads(links, fetch_price):10,.0f} pages/s")
+    for workers in (int(value) for value in args.workers.split(",")):
+        rate = bench_shards(workers, links, fetch_price, args.threads_per_worker)
+        print(f"{f'{workers} worker processes':>20}: {rate:10,.0f} pages/s")
+    bench_kill(links, fetch_price, 4, args.threads_per_worker)
+    ring_movement(100000, 8)
+
+
+if __name__ == "__main__":
+    main()
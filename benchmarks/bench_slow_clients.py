@@ -0,0 +1,157 @@
+"""읽지 않는 클라이언트가 섞였을 때 크롤링 처리량과 정상 클라이언트의 수신 지연: 직접 sendall vs Outbox
+python -m benchmarks.bench_slow_clients --clients 200 --stalled 0.1 --seconds 10"""
+import argparse
+import random
+import selectors
+import socket
+import threading
+import time
+
+from benchmarks._util import percentile, raise_fd_limit
+from connection import ClientConnection, Outbox
+from protocol import PRICE, MessageReader, encode_message
+
+
+class BlockingConnection(ClientConnection):
+    # 이전 방식: 보내는 스레드가 잠금을 잡고 전부 보낼 때까지 sendall
+    def send(self, data):
+        with self._send_lock:
+            self.client_socket.sendall(data)
+
+    def close(self):
+        self.client_socket.close()
+
+
+def connect_clients(count, stalled_count):
+    # (서버 쪽 소켓, 클라이언트 쪽 소켓, 멈춘 클라이언트인지) 목록, 멈춘 클라이언트는 버퍼를 작게 해서 금방 찬다
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1024)
+    pairs = []
+    for index in range(count):
+        stalled = index < stalled_count
+        client = socket.socket()
+        if stalled:
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        client.connect(listener.getsockname())
+        server_side, _ = listener.accept()
+        server_side.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 16384)
+        server_side.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        pairs.append((server_side, client, stalled))
+    listener.close()
+    return pairs
+
+
+def read_healthy(clients, latencies, stop):
+    # 정상 클라이언트: 받는 대로 읽고 메시지의 보낸 시각으로 지연을 잰다
+    selector = selectors.DefaultSelector()
+    for client in clients:
+        client.setblocking(False)
+        selector.register(client, selectors.EVENT_READ, MessageReader())
+    while not stop.is_set():
+        for key, _ in selector.select(timeout=0.1):
+            try:
+                data = key.fileobj.recv(65536)
+            except (BlockingIOError, ConnectionError):
+                continue
+            if not data:
+                selector.unregister(key.fileobj)
+                continue
+            now = time.perf_counter()
+            for message in key.data.feed(data):
+                latencies.append(now - message["ts"])
+    selector.close()
+
+
+def run_case(label, connection_class, args, stalled_fraction, outbox=None):
+    stalled_count = int(args.clients * stalled_fraction)
+    pairs = connect_clients(args.clients, stalled_count)
+    connections = []
+    for server_side, client, _ in pairs:
+        if connection_class is BlockingConnection:
+            connections.append(BlockingConnection(server_side, client.getsockname(), framed=True, outbox=outbox))
+        else:
+            connections.append(ClientConnection(server_side, client.getsockname(), framed=True, outbox=outbox,
+                                                max_buffer_bytes=args.max_buffer))
+    rng = random.Random(1)
+    # 상품마다 구독한 연결들 (연결 하나가 여러 상품을 구독)
+    subscribers = [rng.sample(connections, args.fanout) for _ in range(args.products)]
+
+    latencies = []
+    stop = threading.Event()
+    reader = threading.Thread(target=read_healthy, args=([client for _, client, stalled in pairs if not stalled],
+                                                          latencies, stop), daemon=True)
+    reader.start()
+
+    crawls = [0] * args.threads
+    deadline = time.perf_counter() + args.seconds
+
+    def crawl_loop(worker):
+        # 크롤링 스레드: 가져오기(fetch_seconds) 후 구독자 모두에게 가격 전송
+        product = worker
+        while time.perf_counter() < deadline:
+            time.sleep(args.fetch_seconds)
+            message = {"type": PRICE, "name": f"상품{product}", "link": f"https://www.coupang.com/vp/products/{product}",
+                       "price": 12900 + product}
+            for connection in subscribers[product % args.products]:
+                message["ts"] = time.perf_counter()
+                try:
+                    connection.send(encode_message(message))
+                except OSError:
+                    pass
+            crawls[worker] += 1
+            product += args.threads
+
+    workers = [threading.Thread(target=crawl_loop, args=(worker,), daemon=True) for worker in range(args.threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=max(0.0, deadline - time.perf_counter()) + 0.5)
+    stuck = sum(worker.is_alive() for worker in workers)
+    elapsed = time.perf_counter() - started
+    time.sleep(0.5)
+    stop.set()
+    reader.join()
+
+    latencies.sort()
+    evicted = sum(connection.closed for connection in connections) if connection_class is not BlockingConnection else 0
+    print(f"{label:>34}: {sum(crawls) / elapsed:8.1f} crawls/s, crawl threads stuck {stuck}/{args.threads}, "
+          f"healthy clients got {len(latencies):8,} msgs, latency p50 {percentile(latencies, 0.5) * 1e3:7.2f} ms "
+          f"p99 {percentile(latencies, 0.99) * 1e3:8.2f} ms, evicted {evicted}/{stalled_count}")
+
+    # 막힌 sendall을 풀어 주기 위해 클라이언트 쪽을 먼저 닫는다
+    for server_side, client, _ in pairs:
+        client.close()
+    for worker in workers:
+        worker.join()
+    for connection in connections:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--stalled", type=float, default=0.1, help="fraction of clients that never read")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--fanout", type=int, default=5, help="subscribers per product")
+    parser.add_argument("--threads", type=int, default=5, help="crawl threads (PriceServer thread pool size)")
+    parser.add_argument("--fetch-seconds", type=float, default=0.002, help="simulated fetch + parse time")
+    parser.add_argument("--max-buffer", type=int, default=64 * 1024, help="per-client outbound buffer limit")
+    parser.add_argument("--stall-seconds", type=float, default=2.0)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    raise_fd_limit(4 * args.clients + 64)
+
+    print(f"{args.clients} clients, {args.products} products x {args.fanout} subscribers, {args.threads} crawl "
+          f"threads, fetch {args.fetch_seconds * 1e3:g} ms, {args.seconds:g}s per case")
+    for fraction in (0.0, args.stalled):
+        run_case(f"direct sendall, {fraction:.0%} stalled", BlockingConnection, args, fraction)
+        outbox = Outbox(stall_seconds=args.stall_seconds)
+        outbox.start()
+        run_case(f"outbox, {fraction:.0%} stalled", ClientConnection, args, fraction, outbox)
+        print(f"{'':>34}  {outbox.writes:,} socket writes")
+
+
+if __name__ == "__main__":
+    main()
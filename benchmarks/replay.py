@@ -0,0 +1,323 @@
+"""오프라인 재생: 녹화한 상품 페이지를 돌려주는 fixture 서버 + 가상 시계 + 합성 클라이언트로 PriceServer 전체를 돌린다
+(쿠팡에 요청하지 않고, 하루를 몇 초~몇 분 안에 재생) benchmarks.bench_end_to_end에서 사용"""
+import contextlib
+import json
+import os
+import selectors
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+from urllib.parse import urlsplit
+
+from benchmarks._util import percentile, rss_bytes
+from benchmarks.sim_polling import VirtualClock, synthetic_traces
+from benchmarks.stub_server import StubServer
+from fetcher import Fetcher
+from main_generalization import PriceServer
+from protocol import ACK, ADD, ALERT, ERROR, FEED, MessageReader, encode_message
+from response_cache import ResponseCache
+from scheduler import HOUR
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+FIXTURE_PAGE = "basic.html"
+
+# 재생을 시작하는 날 (월요일 0시, 주/월 묶음 집계 경계가 하루 안에 들어오도록)
+REPLAY_DATE = (2024, 4, 1)
+
+
+def recorded_page():
+    # 녹화한 상품 페이지를 가격 앞/뒤로 나눈다 (가격만 바꿔서 돌려준다)
+    with open(os.path.join(FIXTURES, FIXTURE_PAGE), encoding="utf-8") as page:
+        html = page.read()
+    with open(os.path.join(FIXTURES, "prices.json")) as prices:
+        recorded = f"{json.load(prices)[FIXTURE_PAGE]:,}"
+    head, tail = html.split(recorded)
+    return head, tail
+
+
+class FixtureServer(StubServer):
+    # /vp/products/<번호> 요청에 그 상품 trace의 (가상 시계 기준) 현재 가격을 넣은 녹화 페이지를 돌려준다 (ETag/304 지원)
+    def __init__(self, traces, clock, latency=0.0, **kwargs):
+        super().__init__(latency=latency, conditional=True, **kwargs)
+        self.traces = traces
+        self.clock = clock
+        self.head, self.tail = recorded_page()
+
+    def link(self, product):
+        return f"{self.base_url}/vp/products/{product}"
+
+    def price_for(self, path):
+        return self.traces[int(path.rsplit("/", 1)[1])].price_at(self.clock())
+
+    def page_for(self, price):
+        return f"{self.head}{price:,}{self.tail}"
+
+
+class FixtureResponse:
+    __slots__ = ("status_code", "headers", "text")
+
+    def __init__(self, status_code, headers, text=""):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    @property
+    def content(self):
+        return self.text.encode()
+
+    def raise_for_status(self):
+        pass
+
+
+class FixtureFetcher:
+    # HTTP 없이 FixtureServer와 같은 응답을 만든다 (--transport inproc: 서버 쪽 비용만, 하루를 빠르게 재생)
+    governor = None
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.requests = 0
+
+    def get(self, url, headers=None):
+        self.requests += 1
+        price = self.fixture.price_for(urlsplit(url).path)
+        etag = f'"{price}"'
+        if headers and headers.get("If-None-Match") == etag:
+            return FixtureResponse(304, {"ETag": etag})
+        return FixtureResponse(200, {"ETag": etag}, self.fixture.page_for(price))
+
+    def close(self):
+        pass
+
+
+class SyntheticClients:
+    # count개 TCP 연결로 구독(add)을 보내고, 스레드 하나가 모든 연결의 ack/alert를 읽는다
+    def __init__(self, port, count):
+        self.sockets = [socket.create_connection(("127.0.0.1", port)) for _ in range(count)]
+        self.acks = 0
+        self.errors = 0
+        self.alerts = []    # (받은 시각 perf_counter, 알림의 가상 시각 ts)
+        self.received = {}  # 메시지 종류별 개수
+        self.received_bytes = 0
+        self.feeds = []     # feed 요청의 ack {seq, replayed}
+        self._stop = threading.Event()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        selector = selectors.DefaultSelector()
+        for sock in self.sockets:
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ, MessageReader())
+        while not self._stop.is_set():
+            for key, _ in selector.select(timeout=0.1):
+                try:
+                    data = key.fileobj.recv(262144)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b""
+                if not data:
+                    selector.unregister(key.fileobj)
+                    continue
+                received = time.perf_counter()
+                self.received_bytes += len(data)
+                for message in key.data.feed(data):
+                    kind = message["type"]
+                    self.received[kind] = self.received.get(kind, 0) + 1
+                    if kind == ACK and "seq" in message:
+                        self.feeds.append(message)
+                    elif kind == ACK:
+                        self.acks += 1
+                    elif kind == ALERT:
+                        self.alerts.append((received, message["ts"]))
+                    elif kind == ERROR:
+                        self.errors += 1
+        selector.close()
+
+    def subscribe(self, subscriptions, timeout=600):
+        # (상품명, 구매희망가격, 링크)를 연결마다 나눠 한 번에 보내고 모두 ack될 때까지 기다린다
+        expected = self.acks + self.errors + len(subscriptions)
+        chunks = [[] for _ in self.sockets]
+        for index, (name, desired_price, link) in enumerate(subscriptions):
+            chunks[index % len(chunks)].append(encode_message({"type": ADD, "name": name,
+                                                               "desired_price": desired_price, "link": link}))
+        senders = [threading.Thread(target=self._send_all, args=(sock, b"".join(chunk)))
+                   for sock, chunk in zip(self.sockets, chunks)]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+        deadline = time.monotonic() + timeout
+        while self.acks + self.errors < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def feed(self, since=None, timeout=600):
+        # 모든 연결을 change feed로 전환하고 (since를 주면 놓친 변경을 다시 받고) ack까지 기다린다
+        expected = len(self.feeds) + len(self.sockets)
+        message = {"type": FEED} if since is None else {"type": FEED, "since": since}
+        for sock in self.sockets:
+            self._send_all(sock, encode_message(message))
+        deadline = time.monotonic() + timeout
+        while len(self.feeds) < expected and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def _send_all(self, sock, data):
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[sock.send(view):]
+            except BlockingIOError:
+                time.sleep(0.001)
+
+    def close(self):
+        for sock in self.sockets:
+            sock.close()
+        self._stop.set()
+        self._reader.join()
+
+
+class ReplayServer(PriceServer):
+    # 슬롯 작업마다 (스레드풀 대기 + 크롤링 + 기록 + 알림) 시간을 재고, 동시에 max_in_flight개까지만 넘긴다
+    def __init__(self, *args, max_in_flight=10, **kwargs):
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.latencies = []
+        super().__init__(*args, **kwargs)
+
+    def dispatch_batch(self, slot, callbacks):
+        for callback in callbacks:
+            self.in_flight.acquire()
+            self.thread_pool.submit(self._timed, callback, time.perf_counter())
+
+    def _timed(self, callback, dispatched):
+        try:
+            callback()
+        finally:
+            self.latencies.append(time.perf_counter() - dispatched)
+            self.in_flight.release()
+
+    def drain(self):
+        for _ in range(self.max_in_flight):
+            self.in_flight.acquire()
+        for _ in range(self.max_in_flight):
+            self.in_flight.release()
+
+
+class Replay:
+    # watches개 상품을 clients개 연결로 구독하고 hours시간을 가상 시계로 재생한다
+    def __init__(self, watches, hours=24, transport="http", latency=0.0, clients=50, alert_share=0.3,
+                 max_in_flight=10, seed=1, feed=False):
+        self.watches = watches
+        self.hours = hours
+        self.transport = transport
+        self.clients_count = clients
+        self.alert_share = alert_share
+        self.seed = seed
+        self.feed = feed    # True면 구독한 뒤 모든 연결을 change feed로
+        self.start = time.mktime(REPLAY_DATE + (0, 0, 0, 0, 0, -1))
+        # 구독은 0시 10분 전에, 첫 정각 슬롯이 재생 시작
+        self.clock = VirtualClock(self.start - 600)
+        self.traces = synthetic_traces(watches, self.clock.now, hours * HOUR + 600, seed)
+        self.fixture = FixtureServer(self.traces, self.clock, latency=latency)
+        if transport == "http":
+            self.fixture.start()
+            fetcher = Fetcher(max_per_host=max_in_flight, pool_size=max_in_flight, retries=0, governor=None)
+        else:
+            fetcher = FixtureFetcher(self.fixture)
+        self.tmp = tempfile.mkdtemp(prefix="replay-")
+        self.server = ReplayServer("127.0.0.1", 0, os.path.join(self.tmp, "price_data.db"),
+                                   clock=self.clock, response_cache=ResponseCache(fetcher), max_in_flight=max_in_flight)
+        threading.Thread(target=self.server.start, daemon=True).start()
+        self.clients = None
+        self.dispatched = []    # (가상 시각, 그 시각 작업을 넘긴 실제 시각) 초 단위, 알림 지연 계산용
+
+    def subscribe(self):
+        self.clients = SyntheticClients(self.server.server_port, self.clients_count)
+        subscriptions = []
+        for index, trace in enumerate(self.traces):
+            # alert_share 비율은 첫 가격 바로 아래 (가격이 내려가면 알림), 나머지는 닿지 않는 가격
+            desired = trace.prices[0] * 0.98 if index % 100 < self.alert_share * 100 else trace.prices[0] * 0.3
+            subscriptions.append((f"상품{index}", int(desired), self.fixture.link(index)))
+        started = time.perf_counter()
+        self.clients.subscribe(subscriptions)
+        if self.feed:
+            self.clients.feed()
+        return time.perf_counter() - started
+
+    def replay(self, hours=None):
+        # 가상 시계를 다음 작업 시각으로 옮기며 실행 (in-flight가 차면 크롤링이 끝날 때까지 기다린다)
+        # hours를 주면 시작부터 그 시간까지만 (나머지는 다시 호출해서 이어 재생)
+        scheduler = self.server.scheduler
+        end = self.start + (self.hours if hours is None else hours) * HOUR
+        started = time.perf_counter()
+        while True:
+            due = scheduler.next_due()
+            if due is None or due > end:
+                break
+            self.clock.now = max(self.clock.now, due)
+            if not self.dispatched or int(due) > self.dispatched[-1][0]:
+                self.dispatched.append((int(due), time.perf_counter()))
+            scheduler.run_pending(self.server.dispatch_batch)
+        self.server.drain()
+        replayed = time.perf_counter() - started
+        started = time.perf_counter()
+        self.server.writer.flush()
+        return replayed, time.perf_counter() - started
+
+    def alert_latencies(self):
+        # 알림의 가상 시각을 그 시각 작업을 넘긴 실제 시각으로 바꿔 받은 시각과 비교
+        times = [virtual for virtual, _ in self.dispatched]
+        latencies = []
+        for received, ts in self.clients.alerts:
+            index = bisect_right(times, ts) - 1
+            if index >= 0:
+                latencies.append(received - self.dispatched[index][1])
+        latencies.sort()
+        return latencies
+
+    def close(self):
+        if self.clients is not None:
+            self.clients.close()
+        self.server.server_socket.close()
+        self.server.writer.close()
+        self.server.watch_log.close()
+        self.server.store.close()
+        if self.transport == "http":
+            self.fixture.shutdown()
+        self.fixture.server_close()
+
+
+def run(watches, hours=24, transport="http", latency=0.0, clients=50, max_in_flight=10, seed=1, quiet=True):
+    # 한 번 재생하고 결과 dict (처리량, 지연, 메모리)
+    rss_before = rss_bytes()
+    output = open(os.devnull, "w") if quiet else None
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        replay = Replay(watches, hours, transport, latency, clients, max_in_flight=max_in_flight, seed=seed)
+        try:
+            subscribe_seconds = replay.subscribe()
+            rss_subscribed = rss_bytes()
+            replay_seconds, flush_seconds = replay.replay()
+            rss_replayed = rss_bytes()
+            latencies = sorted(replay.server.latencies)
+            alert_latencies = replay.alert_latencies()
+            result = {
+                "watches": watches, "hours": hours, "transport": transport,
+                "subscribed": replay.clients.acks, "subscribe_errors": replay.clients.errors,
+                "subscribe_seconds": subscribe_seconds, "replay_seconds": replay_seconds,
+                "flush_seconds": flush_seconds, "crawls": len(latencies),
+                "crawls_per_second": len(latencies) / replay_seconds,
+                "speedup": hours * HOUR / replay_seconds,
+                "sample_p50": percentile(latencies, 0.5), "sample_p99": percentile(latencies, 0.99),
+                "alerts": len(alert_latencies), "alert_p50": percentile(alert_latencies, 0.5),
+                "alert_p99": percentile(alert_latencies, 0.99),
+                "committed": replay.server.writer.committed,
+                "rss_per_watch": (rss_subscribed - rss_before) / watches,
+                "rss_mb": rss_replayed / 1e6,
+            }
+        finally:
+            replay.close()
+    if output is not None:
+        output.close()
+    return result
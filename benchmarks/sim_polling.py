@@ -0,0 +1,227 @@
+"""정각 크롤링 vs 적응형 크롤링: 가격 변경 감지 지연과 크롤링 수 (가상 시계 시뮬레이션)
+python -m benchmarks.sim_polling --products 2000 --days 7
+python -m benchmarks.sim_polling --db price_data.db   (저장된 가격 기록을 trace로)"""
+import argparse
+import random
+import sqlite3
+from bisect import bisect_right
+
+from alerts import ThresholdIndex
+from benchmarks._util import percentile
+from polling import AdaptivePolling
+from registry import Subscription
+from scheduler import HourlyScheduler, next_hour_boundary
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# 합성 trace: (비율, 평균 변경 간격) - 거의 안 바뀌는 상품이 대부분, 일부는 수십 분마다
+PROFILES = [(0.55, 3 * DAY), (0.25, 8 * HOUR), (0.15, 90 * 60), (0.05, 20 * 60)]
+
+
+class VirtualClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Trace:
+    # 상품 하나의 가격 변경 시점들 (times[i]부터 prices[i]), desired_price는 구독자의 구매희망가격
+    __slots__ = ("times", "prices", "desired_price")
+
+    def __init__(self, times, prices, desired_price):
+        self.times = times
+        self.prices = prices
+        self.desired_price = desired_price
+
+    def price_at(self, ts):
+        return self.prices[max(0, bisect_right(self.times, ts) - 1)]
+
+
+def synthetic_traces(products, start, duration, seed):
+    rng = random.Random(seed)
+    traces = []
+    for _ in range(products):
+        pick = rng.random()
+        for share, mean_gap in PROFILES:
+            pick -= share
+            if pick < 0:
+                break
+        price = rng.randint(100, 5000) * 100
+        times, prices = [start], [price]
+        ts = start + rng.expovariate(1 / mean_gap)
+        while ts < start + duration:
+            # 대부분 작은 변동, 가끔 큰 할인/복귀
+            change = rng.choice((-1, 1)) * (rng.uniform(0.005, 0.03) if rng.random() < 0.9 else rng.uniform(0.05, 0.2))
+            price = max(100, int(price * (1 + change)) // 10 * 10)
+            if price != prices[-1]:
+                times.append(ts)
+                prices.append(price)
+            ts += rng.expovariate(1 / mean_gap)
+        # 구독자 셋 중 하나는 현재가 바로 아래에 구매희망가격을 건다
+        desired_price = int(prices[0] * rng.uniform(0.9, 0.99)) if rng.random() < 0.35 else int(prices[0] * 0.5)
+        traces.append(Trace(times, prices, desired_price))
+    return traces
+
+
+def recorded_traces(db_path, rng):
+    # price_store의 samples 테이블 (시간대별 기록)에서 가격이 바뀐 시점만 남긴다
+    conn = sqlite3.connect(db_path)
+    traces = {}
+    for product_id, ts, price in conn.execute("SELECT product_id, ts, price FROM samples ORDER BY product_id, ts"):
+        trace = traces.get(product_id)
+        if trace is None:
+            trace = traces[product_id] = Trace([ts], [price], int(price * rng.uniform(0.9, 0.99)))
+        elif price != trace.prices[-1]:
+            trace.times.append(ts)
+            trace.prices.append(price)
+    conn.close()
+    traces = [trace for trace in traces.values() if len(trace.times) > 1]
+    start = min(trace.times[0] for trace in traces)
+    end = max(trace.times[-1] for trace in traces)
+    # 모두 같은 시각에 시작하도록 맞춘다
+    for trace in traces:
+        trace.times[0] = start
+    return traces, start, end - start
+
+
+class SimWatch:
+    # ItemWatch 대신 trace에서 가격을 읽는 감시 (알림 판단은 실제 ThresholdIndex)
+    __slots__ = ("trace", "clock", "polls", "subscribers", "poll", "polling")
+
+    def __init__(self, index, trace, clock, polling):
+        self.trace = trace
+        self.clock = clock
+        self.polls = []
+        self.subscribers = ThresholdIndex()
+        self.subscribers.add(Subscription(index, f"상품{index}", trace.desired_price))
+        self.polling = polling
+        self.poll = polling.new_state() if polling is not None else None
+
+    def crawl(self):
+        now = self.clock()
+        price = self.trace.price_at(now)
+        self.polls.append(now)
+        if self.poll is not None:
+            self.polling.observe(self.poll, now, price)
+        # 알림을 받은 구독은 재무장 전까지 구매희망가격 근처 가속에서 빠진다
+        self.subscribers.update(price)
+
+    def next_interval(self):
+        return self.polling.interval(self.poll, self.subscribers.highest_armed())
+
+
+def simulate(traces, start, duration, polling=None, jitter=300, seed=1):
+    clock = VirtualClock(start)
+    scheduler = HourlyScheduler(jitter_seconds=jitter, clock=clock, rng=random.Random(seed))
+    rng = random.Random(seed)
+    watches = [SimWatch(index, trace, clock, polling) for index, trace in enumerate(traces)]
+    for index, watch in enumerate(watches):
+        if polling is None:
+            scheduler.every_hour(index, watch.crawl)
+        else:
+            # 첫 크롤링은 한 시간 안에 분산 (정각 크롤링의 첫 슬롯과 같은 조건)
+            scheduler.every_interval(index, watch.crawl, watch.next_interval,
+                                     first_due=next_hour_boundary(start) + rng.uniform(0, jitter))
+    end = start + duration
+    per_minute = {}
+    while True:
+        due = scheduler.next_due()
+        if due is None or due >= end:
+            break
+        clock.now = due
+        for batch in scheduler.pop_due(due).values():
+            per_minute[int(due // 60)] = per_minute.get(int(due // 60), 0) + len(batch)
+            for callback in batch:
+                callback()
+    return watches, per_minute
+
+
+def detection(watches, since):
+    # 변경마다 처음 본 크롤링까지의 지연 (다음 변경 전에 한 번도 못 보면 놓침)
+    latencies = []
+    missed = 0
+    for watch in watches:
+        times, polls = watch.trace.times, watch.polls
+        for index in range(1, len(times)):
+            changed = times[index]
+            if changed < since:
+                continue
+            until = times[index + 1] if index + 1 < len(times) else float("inf")
+            seen = bisect_right(polls, changed)
+            if seen < len(polls) and polls[seen] < until:
+                latencies.append(polls[seen] - changed)
+            elif until != float("inf"):
+                missed += 1
+    latencies.sort()
+    return latencies, missed
+
+
+def alert_delays(watches, since):
+    # 가격이 구매희망가격 이하인 구간마다: 구간 시작 -> 그 구간 안의 첫 크롤링 (구간이 끝날 때까지 못 보면 놓침)
+    delays = []
+    missed = 0
+    for watch in watches:
+        trace, polls = watch.trace, watch.polls
+        for index, (changed, price) in enumerate(zip(trace.times, trace.prices)):
+            if changed < since or price > trace.desired_price or (index and trace.prices[index - 1] <= trace.desired_price):
+                continue
+            # 구매희망가격 위로 다시 올라가는 시각
+            until = next((ts for ts, later in zip(trace.times[index + 1:], trace.prices[index + 1:])
+                          if later > trace.desired_price), float("inf"))
+            seen = bisect_right(polls, changed)
+            if seen < len(polls) and polls[seen] < until:
+                delays.append(polls[seen] - changed)
+            elif until != float("inf"):
+                missed += 1
+    delays.sort()
+    return delays, missed
+
+
+def report(label, watches, per_minute, since, duration):
+    latencies, missed = detection(watches, since)
+    delays, missed_alerts = alert_delays(watches, since)
+    fetches = sum(count for minute, count in per_minute.items() if minute * 60 >= since)
+    minutes = (duration - (since - min(watch.trace.times[0] for watch in watches))) / 60
+    peak = max(count for minute, count in per_minute.items() if minute * 60 >= since)
+    print(f"{label:>28}: {fetches:9,} fetches ({fetches / minutes:7.1f}/min, peak {peak:5,}/min)  "
+          f"change latency p50 {percentile(latencies, 0.5) / 60:6.1f}m p90 {percentile(latencies, 0.9) / 60:6.1f}m "
+          f"missed {missed:6,}/{len(latencies) + missed:,}  alert p50 {percentile(delays, 0.5) / 60:6.1f}m "
+          f"p90 {percentile(delays, 0.9) / 60:6.1f}m missed {missed_alerts}/{len(delays) + missed_alerts}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--warmup-hours", type=float, default=24, help="excluded from the report")
+    parser.add_argument("--db", help="price_data.db with recorded samples (instead of synthetic traces)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.db:
+        traces, start, duration = recorded_traces(args.db, random.Random(args.seed))
+    else:
+        start = next_hour_boundary(1700000000)
+        duration = args.days * DAY
+        traces = synthetic_traces(args.products, start, duration, args.seed)
+    since = start + args.warmup_hours * HOUR
+    print(f"{len(traces):,} products, {sum(len(trace.times) - 1 for trace in traces):,} price changes "
+          f"over {duration / DAY:.1f} days (first {args.warmup_hours:g}h excluded)")
+
+    watches, per_minute = simulate(traces, start, duration)
+    report("hourly (jitter 300s)", watches, per_minute, since, duration)
+    hourly_budget = len(traces) / 60
+
+    # 예산 없음: 변경률만으로 / 예산: 정각 크롤링과 같은 (또는 절반) 분당 크롤링 수를 나눠 쓴다
+    for label, budget in (("adaptive, no budget", None), ("adaptive, hourly budget", hourly_budget),
+                          ("adaptive, half budget", hourly_budget / 2)):
+        polling = AdaptivePolling(budget, rng=random.Random(args.seed))
+        watches, per_minute = simulate(traces, start, duration, polling)
+        report(label, watches, per_minute, since, duration)
+
+
+if __name__ == "__main__":
+    main()
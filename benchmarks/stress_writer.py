@@ -0,0 +1,107 @@
+"""저장 큐 스트레스 테스트 (유실 없음 + 강제 종료 후 보존): python -m benchmarks.stress_writer --products 5000"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+
+from price_store import PriceStore
+from writer import PersistenceWriter
+
+HOUR = 3600
+
+
+def produce(writer, products, samples_per_product, barrier, start_ts):
+    def item(index):
+        link = f"https://www.coupang.com/vp/products/{index}"
+        writer.add_product(link, f"상품{index}")
+        # 23:50처럼 모든 상품이 같은 순간에 기록하도록 맞춘다
+        barrier.wait()
+        for hour in range(samples_per_product):
+            writer.add_sample(link, start_ts + hour * HOUR, 10000 + index + hour)
+        writer.add_daily_average(link, "2024-01-01", 10000 + index)
+
+    threads = [threading.Thread(target=item, args=(index,)) for index in range(products)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    counts = tuple(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                   for table in ("products", "samples", "daily_averages"))
+    conn.close()
+    return counts
+
+
+def stress(path, products, samples_per_product, max_pending):
+    store = PriceStore(path)
+    writer = PersistenceWriter(store, flush_interval=0.2, max_pending=max_pending)
+    writer.start()
+
+    started = time.perf_counter()
+    produce(writer, products, samples_per_product, threading.Barrier(products), 1704034800)
+    writer.close()
+    elapsed = time.perf_counter() - started
+
+    expected = (products, products * samples_per_product, products)
+    got = count_rows(path)
+    print(f"[concurrent] {products} producer threads, {sum(expected):,} records in {elapsed:.2f}s "
+          f"({writer.flushes} flushes, {writer.backpressure_waits} backpressure waits)")
+    print(f"    expected products/samples/daily={expected} got={got} -> {'OK' if got == expected else 'LOST ROWS'}")
+    store.close()
+    return got == expected
+
+
+def crash_child(path, products, samples_per_product, acked):
+    store = PriceStore(path)
+    writer = PersistenceWriter(store, flush_interval=0.2)
+    writer.start()
+    produce(writer, products, samples_per_product, threading.Barrier(products), 1704034800)
+    writer.flush()
+    acked.set()
+    # 부모가 SIGKILL 할 때까지 계속 쓰기 (종료 정리 없이 죽는다)
+    index = 0
+    while True:
+        writer.add_sample("https://www.coupang.com/vp/products/extra", 1800000000 + index, index)
+        index += 1
+
+
+def crash(path, products, samples_per_product):
+    acked = multiprocessing.Event()
+    child = multiprocessing.Process(target=crash_child, args=(path, products, samples_per_product, acked))
+    child.start()
+    acked.wait()
+    time.sleep(0.5)
+    os.kill(child.pid, signal.SIGKILL)
+    child.join()
+
+    products_count, samples_count, daily_count = count_rows(path)
+    acked_samples = products * samples_per_product
+    ok = products_count >= products and samples_count >= acked_samples and daily_count == products
+    print(f"[crash] SIGKILL after ack: products={products_count} samples={samples_count} "
+          f"(acked {acked_samples}) daily={daily_count} -> {'OK' if ok else 'LOST ROWS'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--samples", type=int, default=24)
+    parser.add_argument("--max-pending", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        ok = stress(os.path.join(directory, "stress.db"), args.products, args.samples, args.max_pending)
+        ok = crash(os.path.join(directory, "crash.db"), min(args.products, 500), args.samples) and ok
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import gzip
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def product_page(price, padding=200, token=""):
+    # 쿠팡 상품 페이지와 비슷한 크기/구조의 더미 페이지
+    filler = "".join(f'<div class="prod-description-item">설명 {i}</div>\n' for i in range(padding))
+    return (
+        f"<!DOCTYPE html><html><head><title>쿠팡!</title><meta name=\"request-id\" content=\"{token}\"></head><body>\n"
+        f"{filler}"
+        '<div class="prod-price"><div class="prod-sale-price">'
+        f'<span class="total-price"><strong>{price:,}</strong>원</span>'
+        "</div></div>\n"
+        f"{filler}"
+        "</body></html>"
+    )
+
+
+def bot_check_page():
+    # 차단 시 쿠팡이 돌려주는 것과 비슷한 봇 확인 페이지 (가격 태그 없음)
+    return "<!DOCTYPE html><html><head><title>Access Denied</title></head><body>로봇이 아닙니다.</body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        server.count_request()
+
+        refused = server.refusal()
+        if refused is not None:
+            self.send_refusal(refused)
+            return
+
+        price = server.price_for(self.path)
+        etag = f'"{price}"' if server.conditional else None
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = server.page_for(price).encode()
+        self.send_response(200)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, 1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_refusal(self, kind):
+        # 429 (Retry-After), 403, 또는 200 봇 확인 페이지
+        body = bot_check_page().encode()
+        self.send_response(200 if kind == "captcha" else int(kind))
+        if kind == "429" and self.server.retry_after is not None:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, price=12900, conditional=False, noise=False,
+                 handler=StubHandler, max_rate=None, over_limit="429", retry_after=None):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.price = price
+        # conditional: ETag/304 지원, noise: 요청마다 가격과 무관한 부분이 바뀜 (광고, 요청 ID 등)
+        self.conditional = conditional
+        self.noise = noise
+        # max_rate: 최근 1초 요청이 이보다 많으면 over_limit("429", "403", "captcha")로 거절
+        # blocked_until: 이 시각(time.monotonic)까지는 모든 요청을 over_limit으로 거절 (차단 흉내)
+        self.max_rate = max_rate
+        self.over_limit = over_limit
+        self.retry_after = retry_after
+        self.blocked_until = 0.0
+        self.recent = deque()
+        self.requests = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def price_for(self, path):
+        return self.price
+
+    def page_for(self, price):
+        return product_page(price, token=f"{random.random():.12f}" if self.noise else "")
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def refusal(self):
+        if self.max_rate is None and not self.blocked_until:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            recent = self.recent
+            while recent and recent[0] <= now - 1.0:
+                recent.popleft()
+            # 거절한 요청도 한도에 포함 (계속 두드리면 계속 막힌다)
+            recent.append(now)
+            if now < self.blocked_until or (self.max_rate is not None and len(recent) > self.max_rate):
+                self.refused += 1
+                return self.over_limit
+        return None
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
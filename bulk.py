@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+import re
+import socket
+import sys
+import time
+from urllib.parse import urlsplit
+
+from protocol import ALERT, BULK_ADD, BULK_RESULT, ERROR, MessageReader, encode_message
+from registry import normalize_url
+
+# bulk_add 메시지 하나에 넣을 수 있는 최대 상품 수 (클라이언트는 이보다 작게 나눠 보낸다)
+MAX_BULK_ITEMS = 50000
+# 응답에 돌려줄 거절 사유 최대 개수 (나머지는 개수만)
+MAX_REPORTED_ERRORS = 100
+
+COUPANG_PRODUCT_PATH = re.compile(r"^/vp/products/\d+$")
+
+
+def validate_link(link):
+    # http(s) 상품 링크만 (쿠팡이면 /vp/products/<번호>) -> 정규화된 링크, 아니면 ValueError
+    if not isinstance(link, str) or not link.strip():
+        raise ValueError("link is required")
+    parts = urlsplit(link.strip())
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        raise ValueError(f"not an http(s) URL: {link[:200]!r}")
+    key = normalize_url(link)
+    if parts.netloc.lower().endswith("coupang.com") and not COUPANG_PRODUCT_PATH.match(urlsplit(key).path):
+        raise ValueError(f"not a coupang product URL: {link[:200]!r}")
+    return key
+
+
+def validate_item(item):
+    # {"name", "desired_price", "link"} 또는 [name, desired_price, link] -> (상품명, 구매희망가격, 정규화된 링크)
+    if isinstance(item, dict):
+        name, desired_price, link = item.get("name"), item.get("desired_price"), item.get("link")
+    elif isinstance(item, (list, tuple)) and len(item) == 3:
+        name, desired_price, link = item
+    else:
+        raise ValueError("expected {name, desired_price, link} or [name, desired_price, link]")
+    key = validate_link(link)
+    try:
+        desired_price = int(desired_price)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid desired_price: {desired_price!r}")
+    if desired_price <= 0:
+        raise ValueError(f"invalid desired_price: {desired_price!r}")
+    name = str(name).strip() if name is not None else ""
+    return name or key, desired_price, key
+
+
+def prepare(items):
+    # 검증 + 정규화 + 중복 제거 (같은 상품이 여러 번 나오면 마지막 것), 거절은 (순번, 사유)
+    valid = {}
+    rejected = []
+    for index, item in enumerate(items):
+        try:
+            name, desired_price, key = validate_item(item)
+        except ValueError as e:
+            rejected.append((index, str(e)))
+            continue
+        valid.pop(key, None)
+        valid[key] = (name, desired_price, key)
+    duplicates = len(items) - len(rejected) - len(valid)
+    return list(valid.values()), rejected, duplicates
+
+
+def staggered(count, start, batch, per_second):
+    # 새 상품의 첫 크롤링 시각: start부터 batch개씩 묶어 per_second 속도로 (묶음 사이는 항상 batch / per_second초)
+    gap = batch / per_second
+    return [start + (index // batch) * gap for index in range(count)]
+
+
+def load_items(path):
+    # CSV (상품명,구매희망가격,상품링크, 첫 줄은 헤더여도 됨) 또는 JSON ([{...}, ...], [[...], ...], {"items": [...]})
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path, encoding="utf-8") as catalog:
+            items = json.load(catalog)
+        return items["items"] if isinstance(items, dict) else items
+    with open(path, encoding="utf-8-sig", newline="") as catalog:
+        rows = [row for row in csv.reader(catalog) if row]
+    if rows and rows[0][1:2] and not rows[0][1].strip().isdigit():
+        header = [column.strip().lower() for column in rows[0]]
+        if {"name", "desired_price", "link"} <= set(header):
+            return [dict(zip(header, row)) for row in rows[1:]]
+        rows = rows[1:]
+    return [row[:2] + [",".join(row[2:])] if len(row) > 3 else row for row in rows]
+
+
+def send_items(sock, items, chunk=5000, reader=None):
+    # bulk_add를 chunk개씩 보내고 결과를 모은다 (응답을 기다리는 동안 온 알림은 출력)
+    reader = reader or MessageReader(max_message_bytes=1 << 20)
+    totals = {"added": 0, "updated": 0, "duplicates": 0, "rejected": 0, "errors": []}
+    for start in range(0, len(items), chunk):
+        sock.sendall(encode_message({"type": BULK_ADD, "id": start, "items": items[start:start + chunk]}))
+        result = None
+        while result is None:
+            data = sock.recv(262144)
+            if not data:
+                raise ConnectionError("server closed the connection")
+            for message in reader.feed(data):
+                if message.get("type") == BULK_RESULT and message.get("id") == start:
+                    result = message
+                elif message.get("type") == ERROR:
+                    raise ValueError(message["message"])
+                elif message.get("type") == ALERT:
+                    print(f"Alert: {message['name']} {message['price']} (<= {message['desired_price']})")
+        for key in ("added", "updated", "duplicates", "rejected"):
+            totals[key] += result[key]
+        totals["errors"].extend({"index": start + error["index"], "error": error["error"]}
+                                for error in result["errors"])
+    return totals
+
+
+if __name__ == "__main__":
+    # python bulk.py catalog.csv [host] [port] : 카탈로그를 한 연결로 등록하고, 연결을 유지하면서 알림을 출력
+    path = sys.argv[1]
+    host = sys.argv[2] if len(sys.argv) > 2 else "localhost"
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 12345
+    items = load_items(path)
+    started = time.perf_counter()
+    client = socket.create_connection((host, port))
+    message_reader = MessageReader(max_message_bytes=1 << 20)
+    totals = send_items(client, items, reader=message_reader)
+    elapsed = time.perf_counter() - started
+    print(f"{len(items)} items in {elapsed:.2f}s ({len(items) / elapsed:,.0f} products/s): {totals['added']} added, "
+          f"{totals['updated']} updated, {totals['duplicates']} duplicates, {totals['rejected']} rejected")
+    for error in totals["errors"]:
+        print(f"  item {error['index'] + 1}: {error['error']}")
+    while True:
+        data = client.recv(65536)
+        if not data:
+            break
+        for message in message_reader.feed(data):
+            if message.get("type") == ALERT:
+                print(f"Alert: {message['name']} {message['price']} (<= {message['desired_price']})")
@@ -0,0 +1,104 @@
+import threading
+
+from metrics import get_metrics
+from protocol import CHANGE, encode_message
+
+FEED_CHANGES = get_metrics().counter("feed_changes_total", "price changes numbered and stored for the change feed")
+FEED_BYTES = get_metrics().counter("feed_bytes_total", "change feed bytes queued for clients")
+FEED_REPLAYED = get_metrics().counter("feed_replayed_total", "missed changes resent from the store on resume")
+
+
+class FeedState:
+    # feed 연결 하나의 상태: 상품별 [ref, 이 연결에 마지막으로 보낸 가격]
+    # 같은 가격은 다시 보내지 않고, 처음 보내는 상품만 링크/이름/가격 전체, 이후는 ref와 차이만
+    __slots__ = ("products", "backlog")
+
+    def __init__(self, resuming=False):
+        self.products = {}
+        # resume 중에 들어온 실시간 변경 (저장소에서 놓친 변경을 다 보낸 뒤 이어서 보낸다)
+        self.backlog = [] if resuming else None
+
+    def encode(self, seq, product_link, product_name, price, ts):
+        sent = self.products.get(product_link)
+        if sent is None:
+            self.products[product_link] = [len(self.products) + 1, price]
+            return encode_message({"type": CHANGE, "seq": seq, "ref": len(self.products), "link": product_link,
+                                   "name": product_name, "price": price, "ts": int(ts)})
+        if sent[1] == price:
+            return None
+        delta = price - sent[1]
+        sent[1] = price
+        return encode_message({"type": CHANGE, "seq": seq, "ref": sent[0], "delta": delta, "ts": int(ts)})
+
+
+class ChangeFeed:
+    # 가격이 바뀐 때만 서버 전체에서 하나씩 늘어나는 seq를 매겨 저장하고 (changes 테이블), feed 연결에 보낸다
+    # 번호 매기기와 보내기(연결 버퍼에 넣기)를 한 잠금 안에서 해서 연결마다 seq 순서대로 도착한다
+    def __init__(self, store, writer):
+        self.store = store
+        self.writer = writer
+        self.seq = store.last_change_seq()
+        self._lock = threading.Lock()
+
+    def publish(self, item_watch, price, ts):
+        # 마지막으로 보낸 가격과 같으면 아무것도 하지 않는다, 바뀌었으면 seq
+        with self._lock:
+            if price == item_watch.feed_price:
+                return None
+            item_watch.feed_price = price
+            self.seq += 1
+            FEED_CHANGES.inc()
+            self.writer.add_change(self.seq, item_watch.product_link, ts, price)
+            with item_watch.subscribers_lock:
+                subscriptions = [subscription for subscription in item_watch.subscribers
+                                 if subscription.client.feed is not None]
+            for subscription in subscriptions:
+                self._deliver(subscription.client, self.seq, item_watch.product_link, subscription.product_name,
+                              price, ts)
+            return self.seq
+
+    def _deliver(self, client, seq, product_link, product_name, price, ts):
+        state = client.feed
+        if state.backlog is not None:
+            state.backlog.append((seq, product_link, product_name, price, ts))
+            return
+        data = state.encode(seq, product_link, product_name, price, ts)
+        if data is None:
+            return
+        try:
+            client.send(data)
+        except OSError:
+            # 끊긴 연결은 수신 스레드가 구독 해제
+            return
+        FEED_BYTES.inc(len(data))
+
+    def attach(self, client, products, since=None):
+        # 이 연결을 feed로 전환, since를 주면 since 뒤로 구독 중인 상품(products: {link: 상품명})의 변경을 저장소에서 다시 보낸다
+        # (seq: 지금까지 매긴 마지막 번호, replayed: 다시 보낸 변경 수)
+        state = FeedState(resuming=since is not None)
+        with self._lock:
+            until = self.seq
+            client.feed = state
+        if since is None:
+            return until, 0
+        replayed = 0
+        try:
+            # until까지의 변경은 모두 저장 큐에 들어가 있으므로 그 뒤에 넣은 표시가 커밋될 때까지만 기다린다
+            self.writer.sync()
+            for seq, product_link, ts, price in self.store.changes_since(since, until):
+                product_name = products.get(product_link)
+                if product_name is None:
+                    continue
+                data = state.encode(seq, product_link, product_name, price, ts)
+                if data is not None:
+                    client.wait_drained(client.max_buffer_bytes // 2)
+                    client.send(data)
+                    FEED_BYTES.inc(len(data))
+                    replayed += 1
+        finally:
+            with self._lock:
+                backlog, state.backlog = state.backlog, None
+                for change in backlog:
+                    self._deliver(client, *change)
+        FEED_REPLAYED.inc(replayed)
+        return until, replayed
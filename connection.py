@@ -0,0 +1,253 @@
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+from metrics import get_metrics
+from protocol import ALERT, encode_message
+
+# 연결당 아직 못 보낸 바이트 한도, 넘으면 느린 클라이언트로 보고 끊는다
+MAX_BUFFER_BYTES = 1024 * 1024
+# 보낼 것이 있는데 이 시간 동안 한 바이트도 못 보내면 (수신 창이 닫힌 채 멈춘 클라이언트) 끊는다
+STALL_SECONDS = 30.0
+# send 한 번에 합쳐 보낼 최대 바이트
+MAX_WRITE_BYTES = 256 * 1024
+
+# 실제 send 시스템 호출 시간 (Outbox 스레드, non-blocking이라 소켓 버퍼로 복사하는 시간만)
+SEND_SECONDS = get_metrics().histogram("send_seconds", "non-blocking client socket write time")
+SEND_BYTES = get_metrics().counter("send_bytes_total", "bytes sent to clients")
+SEND_MESSAGES = get_metrics().counter("send_messages_total", "messages queued for clients")
+SEND_WRITES = get_metrics().counter("send_writes_total", "socket writes (several messages are coalesced into one)")
+EVICTIONS = get_metrics().counter("slow_consumer_evictions_total", "clients dropped for not reading", label="reason")
+
+
+class SlowConsumerError(ConnectionError):
+    # 끊긴(또는 느려서 끊은) 연결에 보내려고 할 때, OSError라서 기존처럼 구독 해제로 처리된다
+    pass
+
+
+class ClientConnection:
+    # 클라이언트 소켓 하나. framed가 True면 JSON Lines, False면 기존처럼 가격 문자열만 보낸다
+    # 보내는 쪽(크롤링/수신 스레드)은 연결별 버퍼에 넣기만 하고 바로 돌아가며, 실제 쓰기는 Outbox 스레드가 한다
+    def __init__(self, client_socket, address, framed=None, outbox=None, max_buffer_bytes=MAX_BUFFER_BYTES):
+        self.client_socket = client_socket
+        self.address = address
+        self.framed = framed
+        self.outbox = get_outbox() if outbox is None else outbox
+        self.max_buffer_bytes = max_buffer_bytes
+        self.pending = deque()
+        self.pending_bytes = 0
+        self.last_progress = time.monotonic()
+        self.closed = False
+        self.close_reason = None
+        self.feed = None    # change feed 상태 (changefeed.FeedState), feed 메시지를 보낸 연결만
+        self._send_lock = threading.Lock()
+
+    def send(self, data):
+        with self._send_lock:
+            if self.closed:
+                raise SlowConsumerError(f"connection to {self.address} closed ({self.close_reason})")
+            overflow = self.pending_bytes + len(data) > self.max_buffer_bytes
+            if not overflow:
+                wake = not self.pending
+                if wake:
+                    self.last_progress = time.monotonic()
+                self.pending.append(data)
+                self.pending_bytes += len(data)
+        if overflow:
+            self.evict("buffer_full")
+            raise SlowConsumerError(f"{self.address} is not reading ({self.max_buffer_bytes} bytes buffered)")
+        SEND_MESSAGES.inc()
+        if wake:
+            self.outbox.wake(self)
+
+    def send_message(self, message):
+        self.send(encode_message(message))
+
+    def send_alert(self, product_name, product_link, price, desired_price, ts=None):
+        # 구매희망가격 이하로 내려갔을 때만 호출된다 (기존 클라이언트에는 가격 문자열)
+        if self.framed:
+            self.send_message({"type": ALERT, "name": product_name, "link": product_link, "price": price,
+                               "desired_price": desired_price, "ts": int(time.time() if ts is None else ts)})
+        else:
+            self.send(str(price).encode())
+
+    def wait_drained(self, limit, poll=0.01):
+        # 한꺼번에 많이 보낼 때 (feed resume) 버퍼가 limit 아래로 빠질 때까지 보내는 쪽이 기다린다 (멈춘 클라이언트는 Outbox가 끊음)
+        while self.pending_bytes > limit and not self.closed:
+            time.sleep(poll)
+
+    def take(self):
+        # Outbox 스레드: 다음에 보낼 바이트 (JSON Lines는 여러 메시지를 합쳐서, 기존 클라이언트는 구분자가 없으므로 하나씩)
+        with self._send_lock:
+            if self.closed or not self.pending:
+                return None
+            if not self.framed:
+                return self.pending.popleft()
+            chunks = []
+            size = 0
+            while self.pending and size < MAX_WRITE_BYTES:
+                chunk = self.pending.popleft()
+                chunks.append(chunk)
+                size += len(chunk)
+            return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    def sent(self, data, count):
+        # 보내지 못한 나머지는 맨 앞으로 되돌린다 (순서 유지), 남은 것이 있으면 True
+        with self._send_lock:
+            if self.closed:
+                return False
+            self.pending_bytes -= count
+            if count < len(data):
+                self.pending.appendleft(data[count:])
+            if count:
+                self.last_progress = time.monotonic()
+            return bool(self.pending)
+
+    def stalled(self, now, stall_seconds):
+        return bool(self.pending) and now - self.last_progress > stall_seconds
+
+    def evict(self, reason):
+        # 버퍼를 버리고 소켓을 닫아 수신 스레드를 깨운다 (수신 스레드가 구독 해제 후 close)
+        with self._send_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.close_reason = reason
+            self.pending.clear()
+            self.pending_bytes = 0
+        EVICTIONS.inc(label=reason)
+        print(f"Evicting slow client {self.address}: {reason}")
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        with self._send_lock:
+            self.closed = True
+            self.close_reason = self.close_reason or "closed"
+            self.pending.clear()
+            self.pending_bytes = 0
+        # 소켓은 Outbox 스레드가 selector에서 뺀 뒤에 닫는다 (같은 fd 번호가 다른 연결에 재사용되기 전에)
+        self.outbox.release(self)
+
+
+class Outbox(threading.Thread):
+    # 모든 연결의 보내기를 맡는 스레드 하나: 쌓인 메시지를 합쳐 non-blocking으로 쓰고,
+    # 소켓 버퍼가 차면 쓸 수 있을 때까지 selector로 기다린다 (크롤링 스레드는 소켓 때문에 멈추지 않는다)
+    def __init__(self, stall_seconds=STALL_SECONDS):
+        super(Outbox, self).__init__(daemon=True)
+        self.stall_seconds = stall_seconds
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+        self.ready = deque()        # 새 메시지가 들어온 연결
+        self.releasing = deque()    # 닫을 연결
+        self.waiting = set()        # 소켓 버퍼가 차서 selector에 등록한 연결
+        self._signaled = False
+        self.writes = 0
+
+    def wake(self, connection):
+        self.ready.append(connection)
+        self._signal()
+
+    def release(self, connection):
+        self.releasing.append(connection)
+        self._signal()
+
+    def _signal(self):
+        # 이미 깨웠으면 다시 쓰지 않는다 (메시지마다 시스템 호출하지 않도록)
+        if not self._signaled:
+            self._signaled = True
+            try:
+                self._wake_w.send(b"\0")
+            except BlockingIOError:
+                pass
+
+    def flush(self, connection):
+        # 한 번에 보낼 수 있는 만큼 보내고, 소켓 버퍼가 차면 selector에 등록
+        while True:
+            data = connection.take()
+            if data is None:
+                self._unwatch(connection)
+                return
+            started = time.perf_counter()
+            try:
+                count = connection.client_socket.send(data, socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                count = 0
+            except OSError as e:
+                connection.evict(f"send failed: {e.strerror or e}")
+                self._unwatch(connection)
+                return
+            SEND_SECONDS.observe(time.perf_counter() - started)
+            SEND_WRITES.inc()
+            SEND_BYTES.inc(count)
+            self.writes += 1
+            more = connection.sent(data, count)
+            if count < len(data):
+                if more and connection not in self.waiting:
+                    self.selector.register(connection.client_socket, selectors.EVENT_WRITE, connection)
+                    self.waiting.add(connection)
+                return
+            if not more:
+                self._unwatch(connection)
+                return
+
+    def _unwatch(self, connection):
+        if connection in self.waiting:
+            self.waiting.discard(connection)
+            try:
+                self.selector.unregister(connection.client_socket)
+            except (KeyError, ValueError, OSError):
+                pass
+
+    def run(self):
+        next_check = time.monotonic() + 1.0
+        while True:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    # 비운 뒤에 내린다 (먼저 내리면 그 사이에 보낸 신호를 같이 읽어 버려 다음 wake를 놓친다)
+                    self._signaled = False
+                else:
+                    self.flush(key.data)
+            while self.ready:
+                connection = self.ready.popleft()
+                if connection not in self.waiting:
+                    self.flush(connection)
+            while self.releasing:
+                connection = self.releasing.popleft()
+                self._unwatch(connection)
+                try:
+                    connection.client_socket.close()
+                except OSError:
+                    pass
+            now = time.monotonic()
+            if now >= next_check:
+                next_check = now + 1.0
+                for connection in [c for c in self.waiting if c.stalled(now, self.stall_seconds)]:
+                    connection.evict("stalled")
+                    self._unwatch(connection)
+
+
+_shared_outbox = None
+_shared_lock = threading.Lock()
+
+
+def get_outbox():
+    # 프로세스 전체에서 하나의 Outbox 스레드를 공유
+    global _shared_outbox
+    with _shared_lock:
+        if _shared_outbox is None:
+            _shared_outbox = Outbox()
+            _shared_outbox.start()
+        return _shared_outbox
@@ -0,0 +1,181 @@
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # lxml은 선택 사항
+    lxml = None
+
+PRICE_CLASS = "total-price"
+PRICE_SELECTOR = "." + PRICE_CLASS
+
+# class 속성에 total-price가 단독 클래스로 들어있는 시작 태그 (total-price-wrap 등은 제외)
+PRICE_TAG = re.compile(
+    r"""<([a-zA-Z][\w-]*)(?=[^>]*?\sclass\s*=\s*(?:"[^"]*|'[^']*)(?<![\w-])total-price(?![\w-]))[^>]*>"""
+)
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def parse_price_text(text):
+    # "12,900원" -> 12900
+    return int(text.strip().replace(",", "").replace("원", ""))
+
+
+class _ElementFound(Exception):
+    pass
+
+
+class _ElementTextParser(HTMLParser):
+    # 가격 태그부터 짝이 맞는 닫는 태그까지만 읽고 멈춘다
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        self.depth -= 1
+        if self.depth <= 0:
+            raise _ElementFound
+
+    def handle_data(self, data):
+        if self.depth > 0:
+            text = data.strip()
+            if text:
+                self.parts.append(text)
+
+
+class StreamingExtractor:
+    # 가격 태그 위치를 정규식으로 찾고 그 요소만 파싱한다 (조각 단위 입력도 지원)
+    name = "streaming"
+
+    def find_tag(self, html, start=0):
+        # 문자열 검색으로 후보를 찾은 뒤 그 태그만 정규식으로 확인
+        index = html.find(PRICE_CLASS, start)
+        while index != -1:
+            tag_start = html.rfind("<", start, index)
+            if tag_start != -1:
+                match = PRICE_TAG.match(html, tag_start)
+                if match and match.end() > index:
+                    return match
+            index = html.find(PRICE_CLASS, index + 1)
+        return None
+
+    def element(self, html, start=0):
+        # (요소 텍스트, 시작 태그 match, 짝이 맞는 닫는 태그의 끝 위치)
+        match = self.find_tag(html, start)
+        if not match:
+            return None, None, None
+        parser = _ElementTextParser()
+        try:
+            parser.feed(html[match.start():])
+        except _ElementFound:
+            # getpos()는 닫는 태그가 시작하는 (줄, 열), 시작 태그 기준이라 html 안의 위치로 바꾼다
+            line, column = parser.getpos()
+            close = match.start()
+            for _ in range(line - 1):
+                close = html.index("\n", close) + 1
+            return "".join(parser.parts), match, html.find(">", close + column) + 1
+        # 닫는 태그가 아직 도착하지 않음
+        return None, match, None
+
+    def element_text(self, html, start=0):
+        text, match, _ = self.element(html, start)
+        return text, match
+
+    def extract(self, html):
+        text, _ = self.element_text(html)
+        return parse_price_text(text) if text else None
+
+    def extract_chunks(self, chunks):
+        # 응답 본문을 조각으로 받으면서 가격 요소가 완성되는 즉시 중단
+        buffer = ""
+        search_from = 0
+        for chunk in chunks:
+            buffer += chunk
+            text, match = self.element_text(buffer, search_from)
+            if text:
+                return parse_price_text(text)
+            if match is None:
+                # 태그가 조각 경계에 걸칠 수 있으므로 마지막 '<' 부터 다시 찾는다
+                search_from = max(search_from, buffer.rfind("<"))
+            else:
+                search_from = match.start()
+        return None
+
+
+class LxmlExtractor:
+    name = "lxml"
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("lxml is not installed")
+
+    def extract(self, html):
+        tree = lxml.html.fromstring(html)
+        elements = tree.xpath("//*[contains(concat(' ', normalize-space(@class), ' '), ' total-price ')]")
+        if not elements:
+            return None
+        text = "".join(part.strip() for part in elements[0].itertext())
+        return parse_price_text(text) if text else None
+
+
+class Bs4Extractor:
+    name = "bs4"
+
+    def extract(self, html):
+        soup = BeautifulSoup(html, "html.parser")
+        price_element = soup.select_one(PRICE_SELECTOR)
+        if not price_element:
+            return None
+        return parse_price_text(price_element.get_text(strip=True))
+
+
+class FallbackExtractor:
+    # 앞의 추출기가 가격을 못 찾으면 다음 추출기(마지막은 BS4)로 다시 시도
+    def __init__(self, *extractors):
+        self.extractors = extractors
+        self.name = "+".join(extractor.name for extractor in extractors)
+
+    def extract(self, html):
+        # 클래스 이름 자체가 없으면 어떤 추출기로도 찾을 수 없으므로 바로 종료 (봇 확인 페이지 등)
+        if PRICE_CLASS not in html:
+            return None
+        for extractor in self.extractors:
+            try:
+                price = extractor.extract(html)
+            except ValueError:
+                price = None
+            if price is not None:
+                return price
+        return None
+
+
+EXTRACTORS = {
+    "streaming": StreamingExtractor,
+    "lxml": LxmlExtractor,
+    "bs4": Bs4Extractor,
+}
+
+
+def get_extractor(name="streaming", fallback=True):
+    extractor = EXTRACTORS[name]()
+    if fallback and name != "bs4":
+        return FallbackExtractor(extractor, Bs4Extractor())
+    return extractor
+
+
+_default_extractor = get_extractor()
+
+
+def extract_price(html):
+    return _default_extractor.extract(html)
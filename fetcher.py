@@ -0,0 +1,170 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from governor import get_governor, retry_after_seconds
+from metrics import get_metrics
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp가 없으면 AsyncFetcher는 Fetcher를 실행기 스레드에서 사용
+    aiohttp = None
+
+#쿠팡 크롤링위해 꼭 필요(로봇 아님 인증)
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
+    "Accept-Language": "ko-KR,ko;q=0.8,en-US;q=0.5,en;q=0.3",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+# 재시도할 응답 코드
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 요청 한 번(재시도마다 따로)의 응답 시간, 응답 코드별 수, 연결 실패/타임아웃 수
+FETCH_SECONDS = get_metrics().histogram("fetch_seconds", "HTTP request time per attempt including the body")
+FETCH_RESPONSES = get_metrics().counter("fetch_responses_total", "HTTP responses by status code", label="status")
+FETCH_ERRORS = get_metrics().counter("fetch_errors_total", "HTTP connection errors and timeouts")
+
+
+def backoff_delay(attempt, base, maximum):
+    # 지수 백오프 + full jitter
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+class Fetcher:
+    # 모든 아이템이 공유하는 HTTP 클라이언트: keep-alive 커넥션 풀, 호스트별 동시 요청 제한, 타임아웃, 재시도
+    # governor: 호스트별 요청 속도 제한 (429/403에 따라 줄이고 차단), None이면 제한 없음
+    def __init__(self, max_per_host=4, pool_size=32, timeout=(3.05, 10), retries=3,
+                 backoff=0.5, max_backoff=8.0, headers=None, governor=None):
+        self.governor = governor
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS if headers is None else headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def host_semaphore(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def get(self, url, headers=None):
+        semaphore = self.host_semaphore(url)
+        for attempt in range(self.retries + 1):
+            try:
+                if self.governor is not None:
+                    # 호스트 속도 제한 (차단 중이면 CircuitOpenError로 바로 실패)
+                    self.governor.acquire(url)
+                with semaphore:
+                    started = time.perf_counter()
+                    res = self.session.get(url, headers=headers, timeout=self.timeout)
+                    # 커넥션을 풀에 돌려주기 위해 본문을 세마포어 안에서 모두 읽는다
+                    res.content
+                FETCH_SECONDS.observe(time.perf_counter() - started)
+                FETCH_RESPONSES.inc(label=res.status_code)
+                if self.governor is not None:
+                    self.governor.record_status(url, res.status_code,
+                                                retry_after_seconds(res.headers.get("Retry-After")))
+                if res.status_code in RETRY_STATUS and attempt < self.retries:
+                    time.sleep(backoff_delay(attempt, self.backoff, self.max_backoff))
+                    continue
+                res.raise_for_status()
+                return res
+            except (requests.ConnectionError, requests.Timeout):
+                FETCH_ERRORS.inc()
+                if attempt >= self.retries:
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff, self.max_backoff))
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncFetcher:
+    # 이벤트 루프용 Fetcher: aiohttp 커넥터의 호스트별 제한 + 같은 재시도 정책
+    def __init__(self, max_per_host=4, pool_size=100, timeout=10, retries=3, backoff=0.5, max_backoff=8.0,
+                 headers=None, governor=None):
+        self.governor = governor
+        self.max_per_host = max_per_host
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.headers = DEFAULT_HEADERS if headers is None else headers
+        self.session = None
+        self.fallback = None
+
+    async def get_text(self, url):
+        if aiohttp is None:
+            if self.fallback is None:
+                self.fallback = Fetcher(max_per_host=self.max_per_host, retries=self.retries,
+                                        backoff=self.backoff, max_backoff=self.max_backoff, headers=self.headers,
+                                        governor=self.governor)
+            res = await asyncio.get_running_loop().run_in_executor(None, self.fallback.get, url)
+            return res.text
+
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.max_per_host)
+            self.session = aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+        for attempt in range(self.retries + 1):
+            try:
+                if self.governor is not None:
+                    wait = self.governor.reserve(url)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                started = time.perf_counter()
+                async with self.session.get(url) as res:
+                    FETCH_RESPONSES.inc(label=res.status)
+                    if self.governor is not None:
+                        self.governor.record_status(url, res.status, retry_after_seconds(res.headers.get("Retry-After")))
+                    if res.status in RETRY_STATUS and attempt < self.retries:
+                        await asyncio.sleep(backoff_delay(attempt, self.backoff, self.max_backoff))
+                        continue
+                    res.raise_for_status()
+                    text = await res.text()
+                    FETCH_SECONDS.observe(time.perf_counter() - started)
+                    return text
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                FETCH_ERRORS.inc()
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.backoff, self.max_backoff))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+_shared_fetcher = None
+_shared_lock = threading.Lock()
+
+
+def get_fetcher():
+    # 프로세스 전체에서 하나의 Fetcher를 공유
+    global _shared_fetcher
+    with _shared_lock:
+        if _shared_fetcher is None:
+            _shared_fetcher = Fetcher(governor=get_governor())
+        return _shared_fetcher
@@ -0,0 +1,251 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 응답 종류 (Fetcher/ResponseCache가 알려 준다)
+OK = "ok"
+THROTTLED = "throttled"     # 429, 503
+BLOCKED = "blocked"         # 403, 가격 태그가 없는 페이지(봇 확인)가 계속될 때
+
+THROTTLE_STATUS = {429, 503}
+BLOCK_STATUS = {403}
+
+# 호스트별 초당 요청 수: 처음 INITIAL_RATE에서 성공하면 초당 INCREASE씩 늘리고, 막히면 DECREASE배 (AIMD)
+# 처음과 차단이 풀린 직후에는 마지막으로 막히지 않던 속도(threshold)까지 1초에 두 배씩 빠르게 올린다 (slow start)
+INITIAL_RATE = 5.0
+MIN_RATE = 0.2
+MAX_RATE = 50.0
+INCREASE = 1.0
+DECREASE = 0.5
+# 동시에 돌아온 429 여러 개로 연달아 줄이지 않도록, 줄인 뒤 이 시간 동안은 다시 줄이지 않는다
+DECREASE_HOLDOFF = 1.0
+
+# 성공 없이 연속 FAILURE_THRESHOLD번 막히면 (429는 속도를 줄인 횟수) OPEN_SECONDS 동안 그 호스트로 보내지 않고, 이후 요청 하나로 확인 (실패하면 두 배)
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30.0
+MAX_OPEN_SECONDS = 600.0
+
+# 가격 태그가 없는 응답 비율 (지수 가중, 최근 약 1/MISSING_WEIGHT개), MISSING_MIN_SAMPLES개 이상 보고 판단
+MISSING_WEIGHT = 0.05
+MISSING_THRESHOLD = 0.5
+MISSING_MIN_SAMPLES = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    # 차단된 호스트로는 보내지 않고 바로 실패 (크롤링은 다음 주기에)
+    def __init__(self, host, retry_in):
+        super().__init__(f"{host} is blocked, retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class HostLimit:
+    __slots__ = ("host", "lock", "rate", "threshold", "tokens", "updated", "hold_until", "last_decrease", "failures",
+                 "state",
+                 "open_until", "open_seconds", "probing", "missing_ratio", "parsed",
+                 "ok", "throttled", "blocked", "rejected", "trips")
+
+    def __init__(self, host, rate, threshold, now):
+        self.host = host
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.threshold = threshold  # 이 속도까지는 slow start
+        self.tokens = 1.0
+        self.updated = now
+        self.hold_until = 0.0       # Retry-After까지는 토큰이 있어도 기다린다
+        self.last_decrease = 0.0
+        self.failures = 0           # 연속으로 막힌 수
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.open_seconds = OPEN_SECONDS
+        self.probing = False
+        self.missing_ratio = 0.0
+        self.parsed = 0
+
+        self.ok = 0
+        self.throttled = 0
+        self.blocked = 0
+        self.rejected = 0
+        self.trips = 0
+
+
+class RateGovernor:
+    # 호스트별 토큰 버킷으로 요청 속도를 제한하고, 응답 코드/가격 태그 누락으로 속도를 조절한다
+    # 막히기 시작하면 속도를 반으로 줄이고 (곱셈 감소), 잘 되면 조금씩 늘린다 (덧셈 증가)
+    # 계속 막히면 호스트를 잠시 차단했다가 (circuit open) 요청 하나로 풀렸는지 확인한다 (half open)
+    def __init__(self, initial_rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE, increase=INCREASE,
+                 decrease=DECREASE, burst=1.0, failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS,
+                 max_open_seconds=MAX_OPEN_SECONDS, clock=time.monotonic, sleep=time.sleep):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url):
+        host = urlsplit(url).netloc
+        limit = self.hosts.get(host)
+        if limit is None:
+            with self._lock:
+                limit = self.hosts.get(host)
+                if limit is None:
+                    limit = self.hosts[host] = HostLimit(host, self.initial_rate, self.max_rate, self.clock())
+                    limit.open_seconds = self.open_seconds
+        return limit
+
+    def reserve(self, url):
+        # 토큰 하나를 예약하고 보내기 전까지 기다릴 초를 돌려준다 (차단 중이면 CircuitOpenError)
+        limit = self.host(url)
+        with limit.lock:
+            now = self.clock()
+            if limit.state == OPEN:
+                if now < limit.open_until:
+                    limit.rejected += 1
+                    raise CircuitOpenError(limit.host, limit.open_until - now)
+                limit.state = HALF_OPEN
+                limit.probing = False
+            if limit.state == HALF_OPEN:
+                # 확인 요청은 하나만, 결과가 올 때까지 나머지는 거절 (결과 없이 open_seconds가 지나면 다시 확인)
+                if limit.probing and now < limit.open_until:
+                    limit.rejected += 1
+                    raise CircuitOpenError(limit.host, limit.open_until - now)
+                limit.probing = True
+                limit.open_until = now + limit.open_seconds
+                return 0.0
+            limit.tokens = min(self.burst, limit.tokens + (now - limit.updated) * limit.rate)
+            limit.updated = now
+            limit.tokens -= 1
+            wait = -limit.tokens / limit.rate if limit.tokens < 0 else 0.0
+            return max(wait, limit.hold_until - now)
+
+    def acquire(self, url):
+        # 스레드용: 예약한 시각까지 잠든다 (그 사이 차단되면 보내지 않는다)
+        wait = self.reserve(url)
+        if wait > 0:
+            self.sleep(wait)
+            self.check(url)
+
+    def check(self, url):
+        # 예약한 시각까지 기다린 뒤 보내기 직전에: 그 사이 차단됐으면 CircuitOpenError
+        limit = self.host(url)
+        if limit.state == OPEN:
+            with limit.lock:
+                limit.rejected += 1
+            raise CircuitOpenError(limit.host, limit.open_until - self.clock())
+
+    def record_status(self, url, status_code, retry_after=None):
+        if status_code in THROTTLE_STATUS:
+            self.record(url, THROTTLED, retry_after)
+        elif status_code in BLOCK_STATUS:
+            self.record(url, BLOCKED, retry_after)
+        elif status_code < 400:
+            self.record(url, OK)
+
+    def record_parse(self, url, found):
+        # 200 응답인데 가격 태그가 없는 비율이 높으면 봇 확인 페이지로 보고 막힌 것으로 처리
+        limit = self.host(url)
+        with limit.lock:
+            limit.parsed += 1
+            limit.missing_ratio += MISSING_WEIGHT * ((not found) - limit.missing_ratio)
+            suspicious = (not found and limit.parsed >= MISSING_MIN_SAMPLES
+                          and limit.missing_ratio >= MISSING_THRESHOLD)
+        if suspicious:
+            self.record(url, BLOCKED)
+
+    def record(self, url, outcome, retry_after=None):
+        limit = self.host(url)
+        message = None
+        with limit.lock:
+            now = self.clock()
+            if outcome == OK:
+                limit.ok += 1
+                limit.failures = 0
+                # slow start: 성공 하나에 +1 (1초에 두 배), 이후 초당 rate개가 성공하면 1초에 increase만큼
+                if limit.rate < limit.threshold:
+                    limit.rate = min(limit.threshold, limit.rate + 1)
+                else:
+                    limit.rate = min(self.max_rate, limit.rate + self.increase / limit.rate)
+                if limit.state == HALF_OPEN:
+                    limit.state = CLOSED
+                    limit.open_seconds = self.open_seconds
+                    message = f"Host {limit.host} recovered, ramping back up to {limit.threshold:.1f} req/s"
+            else:
+                if outcome == THROTTLED:
+                    limit.throttled += 1
+                else:
+                    limit.blocked += 1
+                # 429는 한 번 줄일 때마다 한 번만 센다 (줄이기 전에 보낸 요청들의 429가 한꺼번에 와도 한 번),
+                # 403/봇 확인은 하나하나 센다
+                fresh = now - limit.last_decrease >= DECREASE_HOLDOFF
+                if fresh or outcome == BLOCKED:
+                    limit.failures += 1
+                if fresh:
+                    limit.rate = max(self.min_rate, limit.rate * self.decrease)
+                    limit.threshold = limit.rate
+                    limit.last_decrease = now
+                if retry_after:
+                    limit.hold_until = max(limit.hold_until, now + retry_after)
+                if limit.state == HALF_OPEN:
+                    # 확인 요청도 막혔으면 더 오래 쉰다
+                    limit.open_seconds = min(self.max_open_seconds, limit.open_seconds * 2)
+                    message = self._open(limit, now, "probe failed")
+                elif limit.state == CLOSED and limit.failures >= self.failure_threshold:
+                    message = self._open(limit, now, f"{limit.failures} consecutive {outcome} responses")
+        if message:
+            print(message)
+
+    def _open(self, limit, now, reason):
+        # 풀린 뒤에는 처음 속도부터 마지막 속도까지 slow start
+        limit.threshold = max(limit.threshold, limit.rate)
+        limit.rate = min(self.initial_rate, limit.threshold)
+        limit.state = OPEN
+        limit.open_until = max(now + limit.open_seconds, limit.hold_until)
+        limit.probing = False
+        limit.trips += 1
+        return f"Host {limit.host} circuit open for {limit.open_until - now:.0f}s ({reason})"
+
+    def stats(self):
+        return {host: {"state": limit.state, "rate": round(limit.rate, 2), "ok": limit.ok,
+                       "throttled": limit.throttled, "blocked": limit.blocked, "rejected": limit.rejected,
+                       "trips": limit.trips, "missing_ratio": round(limit.missing_ratio, 3)}
+                for host, limit in list(self.hosts.items())}
+
+
+def retry_after_seconds(value):
+    # Retry-After 헤더 (초 단위만, 날짜 형식은 무시)
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+_shared_governor = None
+_shared_lock = threading.Lock()
+
+
+def get_governor():
+    # 프로세스 전체에서 하나의 RateGovernor를 공유 (Fetcher 기본값)
+    global _shared_governor
+    with _shared_lock:
+        if _shared_governor is None:
+            _shared_governor = RateGovernor()
+        return _shared_governor
+
+
+def set_governor(governor):
+    # 프로세스 공유 governor를 바꾼다 (shard 워커는 부모 governor로 보내는 sharding.GovernorClient)
+    global _shared_governor
+    with _shared_lock:
+        _shared_governor = governor
@@ -0,0 +1,83 @@
+import time
+from array import array
+from bisect import bisect_left
+
+HOURS = 24
+MISSING = -1    # 가격이 수집되지 않은 시간대
+
+
+def day_number(ts):
+    # 로컬 날짜를 정수 하나로 (예: 2024-01-31 -> 20240131)
+    return _day_number(time.localtime(ts))
+
+
+def _day_number(current):
+    return current.tm_year * 10000 + current.tm_mon * 100 + current.tm_mday
+
+
+class PriceHistory:
+    # 상품 하나의 시간대별 가격 기록: 날짜 배열 + 하루 24칸짜리 가격 배열을 이어 붙인 평평한 array('i')
+    __slots__ = ("days", "prices")
+
+    def __init__(self):
+        self.days = array("i")
+        self.prices = array("i")
+
+    def __len__(self):
+        return len(self.days)
+
+    def _day_index(self, day, create=False):
+        days = self.days
+        # 대부분 마지막 날짜에 기록하므로 먼저 확인
+        if days and days[-1] == day:
+            return len(days) - 1
+        index = bisect_left(days, day)
+        if index < len(days) and days[index] == day:
+            return index
+        if not create:
+            return None
+        days.insert(index, day)
+        offset = index * HOURS
+        self.prices[offset:offset] = array("i", [MISSING]) * HOURS
+        return index
+
+    def record(self, ts, price):
+        current = time.localtime(ts)
+        index = self._day_index(_day_number(current), create=True)
+        self.prices[index * HOURS + current.tm_hour] = price
+
+    def record_many(self, samples, slots=None):
+        # 재시작 때 한꺼번에 채우기: samples (ts, price), slots: 15분 구간 -> (날짜, 시) 메모 (상품끼리 공유)
+        # 모든 시간대의 UTC 오프셋은 15분 단위라 같은 구간이면 로컬 날짜/시가 같다 (localtime을 구간마다 한 번만)
+        slots = {} if slots is None else slots
+        prices = self.prices
+        day = offset = None
+        for ts, price in samples:
+            bucket = int(ts) // 900
+            slot = slots.get(bucket)
+            if slot is None:
+                current = time.localtime(bucket * 900)
+                slot = slots[bucket] = (_day_number(current), current.tm_hour)
+            # 시각 순이라 날짜가 바뀔 때만 위치를 다시 찾는다
+            if slot[0] != day:
+                day = slot[0]
+                offset = self._day_index(day, create=True) * HOURS
+            prices[offset + slot[1]] = price
+
+    def day_slots(self, day):
+        # 24칸 배열 (없는 시간대는 MISSING), 기록이 없는 날은 None
+        index = self._day_index(day)
+        if index is None:
+            return None
+        return self.prices[index * HOURS:(index + 1) * HOURS]
+
+    def day_prices(self, day):
+        slots = self.day_slots(day)
+        return [] if slots is None else [price for price in slots if price != MISSING]
+
+    def trim(self, keep_days):
+        # 오래된 날짜부터 지워서 keep_days일만 메모리에 남긴다
+        extra = len(self.days) - keep_days
+        if extra > 0:
+            del self.days[:extra]
+            del self.prices[:extra * HOURS]
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from registry import normalize_url
+from response_cache import get_response_cache
+
+# 정각마다 크롤링한 가격이 들어오므로 한 시간 안의 가격은 새로 가져오지 않는다
+DEFAULT_TTL = 3600.0
+
+# 가져오기에 실패한 상품은 이 시간 동안 다시 시도하지 않고 마지막 가격(또는 None)으로 답한다
+RETRY_AFTER = 60.0
+
+# 요청 링크 -> 정규화 키 메모 (query마다 URL을 다시 파싱하지 않도록), 넘치면 비운다
+MAX_KEY_MEMO = 100000
+
+# 정기 크롤링하지 않는 상품(query로만 가져온)의 가격과 실패 기록은 최근 것 이만큼만 (오래된 것부터 버린다)
+MAX_UNWATCHED = 10000
+
+
+class LatestPrice:
+    __slots__ = ("price", "fetched_at")
+
+    def __init__(self, price, fetched_at):
+        self.price = price
+        self.fetched_at = fetched_at
+
+
+class _Flight:
+    # 같은 상품을 동시에 갱신하려는 요청들이 기다리는 한 번의 가져오기
+    __slots__ = ("done", "price", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.price = None
+        self.error = None
+
+
+class LatestPriceCache:
+    # 상품별 마지막 가격과 수집 시각. query는 여기서 바로 답하고, TTL이 지난 경우에만 다시 가져온다
+    # 같은 상품을 여러 요청이 동시에 갱신하면 가져오기는 한 번만 하고 나머지는 그 결과를 기다린다 (single-flight)
+    def __init__(self, fetch_price=None, ttl=DEFAULT_TTL, retry_after=RETRY_AFTER, clock=time.time,
+                 max_unwatched=MAX_UNWATCHED):
+        self.fetch_price = fetch_price
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.clock = clock
+        self.max_unwatched = max_unwatched
+        self.entries = {}               # 정기 크롤링 결과 (put/restore)
+        self.unwatched = OrderedDict()  # query로만 가져온 상품 (LRU)
+        self.failed_at = OrderedDict()
+        self._keys = {}
+        self._flights = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.refreshes = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    def key(self, product_link):
+        key = self._keys.get(product_link)
+        if key is None:
+            if len(self._keys) >= MAX_KEY_MEMO:
+                self._keys.clear()
+            key = self._keys[product_link] = normalize_url(product_link)
+        return key
+
+    def put(self, product_link, price, fetched_at=None):
+        # 정기 크롤링 결과도 여기에 넣어 두면 query가 페이지를 다시 받지 않는다
+        if price is None:
+            return
+        fetched_at = self.clock() if fetched_at is None else fetched_at
+        key = self.key(product_link)
+        with self._lock:
+            self.entries[key] = LatestPrice(price, fetched_at)
+            self.unwatched.pop(key, None)
+            self.failed_at.pop(key, None)
+
+    def _remember(self, key, price):
+        # query로 가져온 가격: 정기 크롤링 중인 상품이면 entries를 갱신, 아니면 크기 제한 LRU에
+        if price is None:
+            return
+        entry = LatestPrice(price, self.clock())
+        with self._lock:
+            if key in self.entries:
+                self.entries[key] = entry
+            else:
+                self.unwatched[key] = entry
+                self.unwatched.move_to_end(key)
+                if len(self.unwatched) > self.max_unwatched:
+                    self.unwatched.popitem(last=False)
+            self.failed_at.pop(key, None)
+
+    def _entry(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.unwatched.get(key)
+        return entry
+
+    def _failed(self, key):
+        with self._lock:
+            self.failed_at[key] = self.clock()
+            self.failed_at.move_to_end(key)
+            if len(self.failed_at) > self.max_unwatched:
+                self.failed_at.popitem(last=False)
+
+    def restore(self, prices):
+        # 재시작 때 저장된 마지막 가격을 한꺼번에: (정규화된 키, price, fetched_at)
+        for key, price, fetched_at in prices:
+            self.entries[key] = LatestPrice(price, fetched_at)
+
+    def peek(self, product_link):
+        return self._entry(self.key(product_link))
+
+    def forget(self, product_link):
+        # 감시를 멈춘 상품: 이후 query로 가져오는 가격은 unwatched LRU에 들어간다
+        key = self.key(product_link)
+        with self._lock:
+            self.entries.pop(key, None)
+            self.failed_at.pop(key, None)
+
+    def backing_off(self, key):
+        failed_at = self.failed_at.get(key)
+        return failed_at is not None and self.clock() - failed_at < self.retry_after
+
+    def is_fresh(self, entry, max_age=None):
+        ttl = self.ttl if max_age is None else min(self.ttl, max_age)
+        return entry is not None and self.clock() - entry.fetched_at <= ttl
+
+    def describe(self, key, entry, refreshed, max_age=None):
+        # 응답에 붙일 가격과 신선도 정보 (ts: 수집 시각, age: 지난 초, stale: TTL 초과 여부, cached: 캐시에서 바로 응답)
+        if entry is None:
+            return {"link": key, "price": None, "ts": None, "age": None, "stale": True, "cached": False}
+        return {"link": key, "price": entry.price, "ts": int(entry.fetched_at),
+                "age": round(self.clock() - entry.fetched_at, 3), "stale": not self.is_fresh(entry, max_age),
+                "cached": not refreshed}
+
+    def _refresh(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.refreshes += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                flight.price = self.fetch_price(key)
+                self._remember(key, flight.price)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+        return flight
+
+    def get(self, product_link, max_age=None):
+        # 가격 정보 dict 반환, 갱신에 실패하면 남아 있는 마지막 가격을 stale로 돌려준다
+        key = self.key(product_link)
+        entry = self._entry(key)
+        if self.is_fresh(entry, max_age):
+            self.hits += 1
+            return self.describe(key, entry, False, max_age)
+        if self.backing_off(key):
+            return self._after_refresh(key, entry, max_age)
+
+        flight = self._refresh(key)
+        if flight.error is not None:
+            print(f"Exception occurred during price refresh: {flight.error}")
+        return self._after_refresh(key, entry, max_age)
+
+    async def get_async(self, product_link, fetch_price, max_age=None):
+        # 이벤트 루프용: fetch_price는 코루틴 함수, 동시에 들어온 같은 상품 요청은 같은 Task를 기다린다
+        key = self.key(product_link)
+        entry = self._entry(key)
+        if self.is_fresh(entry, max_age):
+            self.hits += 1
+            return self.describe(key, entry, False, max_age)
+        if self.backing_off(key):
+            return self._after_refresh(key, entry, max_age)
+
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = self._tasks[key] = asyncio.ensure_future(fetch_price(key))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.refreshes += 1
+        else:
+            self.coalesced += 1
+        try:
+            self._remember(key, await asyncio.shield(task))
+        except Exception as e:
+            if leader:
+                print(f"Exception occurred during price refresh: {e}")
+        return self._after_refresh(key, entry, max_age)
+
+    def _after_refresh(self, key, previous, max_age):
+        entry = self._entry(key)
+        if entry is previous:
+            # 새 가격을 못 가져왔으면 마지막 가격 (없으면 price None), retry_after 동안은 다시 가져오지 않는다
+            if not self.backing_off(key):
+                self._failed(key)
+            self.stale_served += 1
+            return self.describe(key, entry, False, max_age)
+        return self.describe(key, entry, True, max_age)
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "unwatched": len(self.unwatched),
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+        }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_latest_prices():
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LatestPriceCache(get_response_cache().fetch_price)
+        return _shared_cache
@@ -1,45 +1,55 @@
 import threading
 import socket
 import time
-import requests
-from bs4 import BeautifulSoup
+
+from connection import ClientConnection
+from extractor import extract_price
+from fetcher import get_fetcher
+from latest_price import get_latest_prices
+from scheduler import HOUR, next_hour_boundary
 
 
 class ItemThread(threading.Thread):
-    def __init__(self, client_socket, product_name, desired_price, product_link):
+    def __init__(self, client, product_name, desired_price, product_link, catch_up="latest", grace_seconds=60):
         super(ItemThread, self).__init__()
-        self.client_socket = client_socket
+        # ClientConnection: 보내기는 버퍼에 넣고 바로 돌아온다 (느린 클라이언트 때문에 크롤링이 멈추지 않음)
+        self.client = client
         self.product_name = product_name
         self.desired_price = desired_price
         self.product_link = product_link
         self.running = True
+        self.stop_event = threading.Event()
         self.crawled_price = None
+        self.sent_price = None      # 이 클라이언트에 마지막으로 보낸 가격
         self.crawled_count = 0
         self.average_price = 0
 
-    def crawlingTest(self):
-        try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
-                "Accept-Language": "ko-KR,ko;q=0.8,en-US;q=0.5,en;q=0.3"
-            }
-
-            res = requests.get(self.product_link, headers=headers)
-            res.raise_for_status()
+        # 놓친 정각 처리 방식: "latest"는 가장 최근 슬롯 하나만 즉시 수집, "skip"은 grace_seconds가 지나면 버림
+        self.catch_up = catch_up
+        self.grace_seconds = grace_seconds
 
-            soup = BeautifulSoup(res.text, "html.parser")
+        # 수집 지표 (기록된 가격 1개당 요청 수)
+        self.fetch_count = 0
+        self.recorded_count = 0
+        self.missed_slots = 0
 
-            # 가격 정보를 추출
-            price_element = soup.select_one(".total-price")
+    def crawlingTest(self):
+        self.fetch_count += 1
+        try:
+            # 공유 Fetcher (keep-alive 커넥션 풀, 호스트별 동시 요청 제한, 재시도)
+            res = get_fetcher().get(self.product_link)
 
-            if price_element:
-                # 문자열을 정수로 변환
-                self.crawled_price = int(price_element.get_text(strip=True).replace(",", "").replace("원", ""))
+            # 가격 정보를 추출 (.total-price 태그를 찾아 정수로)
+            price = extract_price(res.text)
 
-                # (파이썬)클라이언트 전송 테스트용
-                self.client_socket.send(price_element.encode())
+            if price is not None:
+                self.crawled_price = price
+                get_latest_prices().put(self.product_link, self.crawled_price)
 
-                #self.crawled_price = price_element.get_text(strip=True)
+                # (파이썬)클라이언트 전송 테스트용: 가격이 바뀌었을 때만 가격 문자열을 보낸다 (태그 markup 전체는 보내지 않음)
+                if self.crawled_price != self.sent_price:
+                    self.client.send(str(self.crawled_price).encode())
+                    self.sent_price = self.crawled_price
                 return True
             else:
                 return False
@@ -47,44 +57,88 @@ class ItemThread(threading.Thread):
             print(f"Exception occurred during crawling: {e}")
             return False
 
+    def fetchesPerSample(self):
+        if self.recorded_count == 0:
+            return float(self.fetch_count)
+        return self.fetch_count / self.recorded_count
+
+    def nextSlot(self, slot):
+        # 정각까지 잠들었다가 깨어난 뒤, 늦어진 만큼 놓친 슬롯을 정리하고 이번에 기록할 슬롯을 돌려준다
+        late_slots = int((time.time() - slot) // HOUR)
+        if late_slots > 0:
+            self.missed_slots += late_slots
+            slot += late_slots * HOUR
+        if self.catch_up == "skip" and time.time() - slot > self.grace_seconds:
+            self.missed_slots += 1
+            return None
+        return slot
+
+    def sendDailyAverage(self, day_time, day_prices):
+        # 수집된 가격만으로 평균 (빠진 시간대가 있어도 24로 나누지 않는다)
+        if not day_prices:
+            return
+        self.average_price = int(sum(day_prices) / len(day_prices))
+        missing = 24 - len(day_prices)
+        if missing:
+            print(f"Daily average from {len(day_prices)}/24 samples ({missing} missing)")
+
+        # 그래프를 작성하기 위한 날짜,가격 정보 송신
+        data = f'{day_time.tm_mon}/{day_time.tm_mday}' + '/' + str(self.average_price)
+        self.client.send(data.encode())
+        self.average_price = 0
+
     def crawlingOnTime(self):
-        sum_price = 0
-        while self.running:
+        day_prices = []     # 오늘 수집된 가격
+        day_time = None
+        slot = next_hour_boundary(time.time())
+        # 연결이 끊기거나 느린 클라이언트로 끊기면 더 보낼 곳이 없으므로 멈춘다
+        while self.running and not self.client.closed:
+            # 다음 정각까지 대기 (killThread 시 즉시 깨어남)
+            if self.stop_event.wait(max(0.0, slot - time.time())):
+                break
+
+            record_slot = self.nextSlot(slot)
+            slot = next_hour_boundary(max(time.time(), slot))
+            if record_slot is None:
+                continue
+
+            current_time = time.localtime(record_slot)
+            # 23시 슬롯을 놓쳐 날짜가 바뀌었으면 전날 평균을 먼저 보낸다
+            if day_time is not None and current_time.tm_yday != day_time.tm_yday:
+                self.sendDailyAverage(day_time, day_prices)
+                day_prices = []
+            day_time = current_time
+
+            # 슬롯당 한 번만 크롤링
             if self.crawlingTest():
-                # 현재 시간 받아옴
-                current_time = time.localtime()
                 current_time_str = time.strftime("%Y-%m-%d %H:%M:%S", current_time)
 
-                # 정각일 때만 가격을 기록
-                if current_time.tm_min != 0 or current_time.tm_sec != 0:
-                    continue
-                time.sleep(1) # 중복 방지
-
                 # 정각에 맞춰 주기적으로 크롤링하여 가격 정보를 클라이언트에 전송
                 if self.crawled_price:
+                    self.recorded_count += 1
                     # 가격을 정수로 변환하여 클라이언트에게 송신
-                    print(f"Price at {current_time_str}: {self.crawled_price}원")
-                    sum_price += self.crawled_price
-
+                    print(f"Price at {current_time_str}: {self.crawled_price}원 "
+                          f"(fetches/sample {self.fetchesPerSample():.2f}, missed slots {self.missed_slots})")
+                    day_prices.append(self.crawled_price)
                 self.crawled_count += 1
-                if self.crawled_count % 24 == 0:
-                    self.average_price = int(sum_price/24)
 
-                    # 그래프를 작성하기 위한 날짜,가격 정보 송신
-                    #data = current_time_str + '/' + str(self.average_price)
-                    data = f'{current_time.tm_mon}/{current_time.tm_mday}' + '/' + str(self.average_price)
-                    self.client_socket.send(data.encode())
-                    self.crawled_count = 0
-                    self.average_price = 0
-                    sum_price = 0
+            # 하루의 마지막 슬롯(23시)이 지나면 일평균 송신
+            if current_time.tm_hour == 23:
+                self.sendDailyAverage(day_time, day_prices)
+                day_prices = []
+                day_time = None
+                self.crawled_count = 0
 
     def showCurrentPrice(self):
-        self.crawlingTest()
-        print(f"Current price: {self.crawled_price}")
-        self.client_socket.send(str(self.crawled_price).encode())
+        # 매번 페이지를 받지 않고 최신 가격 캐시에서 답한다 (TTL이 지났을 때만 다시 가져옴)
+        latest = get_latest_prices().get(self.product_link)
+        self.crawled_price = latest["price"]
+        print(f"Current price: {self.crawled_price} (age {latest['age']}s)")
+        self.client.send(str(self.crawled_price).encode())
 
     def killThread(self):
         self.running = False
+        self.stop_event.set()
         self.crawled_price = None
         self.crawled_count = 0
 
@@ -94,19 +148,23 @@ class ItemThread(threading.Thread):
 
 
 def handle_client(client_socket, address):
-    while True:
-        data = client_socket.recv(1024).decode()
-        if not data:
-            break
-
-        # 데이터 수신 후 '/'를 기준으로 분류하여 상품명, 구매희망가격, 상품링크를 추출
-        product_name, desired_price, product_link = data.split(',')
-
-        # 서브스레드 생성하여 ItemThread 클래스 실행
-        item_thread = ItemThread(client_socket, product_name, desired_price, product_link)
-        item_thread.start()
-
-    client_socket.close()
+    client = ClientConnection(client_socket, address, framed=False)
+    try:
+        while True:
+            data = client_socket.recv(1024).decode()
+            if not data:
+                break
+
+            # 데이터 수신 후 '/'를 기준으로 분류하여 상품명, 구매희망가격, 상품링크를 추출
+            product_name, desired_price, product_link = data.split(',')
+
+            # 서브스레드 생성하여 ItemThread 클래스 실행
+            item_thread = ItemThread(client, product_name, desired_price, product_link)
+            item_thread.start()
+    except OSError as e:
+        print(f"Connection from {address} closed: {e}")
+    finally:
+        client.close()
 
 
 def main():
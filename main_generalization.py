@@ -1,184 +1,492 @@
+import random
 import threading
 import socket
+import sys
 import time
-import requests
-import schedule as schedule
-from bs4 import BeautifulSoup
-import openpyxl
 from concurrent.futures import ThreadPoolExecutor
-
-# 엑셀 파일에 대한 정보를 전역 변수로 선언(일반화)
-EXCEL_FILE = "price_data.xlsx"
-SHEET_NAME = "PriceData"
-
-# 열의 종류를 미리 설정
-COLUMN_HEADERS = ["날짜", "00:00", "01:00", "02:00", "03:00", "04:00", "05:00", "06:00",
-                  "07:00", "08:00", "09:00", "10:00", "11:00", "12:00", "13:00", "14:00",
-                  "15:00", "16:00", "17:00", "18:00", "19:00", "20:00", "21:00", "22:00",
-                  "23:00", "일평균가"]
-
-
-class ItemThread(threading.Thread):
-    def __init__(self, client_socket, product_name, desired_price, product_link, daily_average_time):
-        super(ItemThread, self).__init__()
-        self.client_socket = client_socket
+from itertools import groupby
+from operator import itemgetter
+
+from aggregation import aggregate_and_persist
+from alerts import ThresholdIndex
+from bulk import MAX_BULK_ITEMS, MAX_REPORTED_ERRORS, prepare, staggered, validate_link
+from changefeed import ChangeFeed
+from connection import ClientConnection
+from governor import CircuitOpenError
+from history import PriceHistory
+from latest_price import LatestPriceCache
+from metrics import SamplingProfiler, get_metrics, serve_metrics
+from polling import AdaptivePolling
+from price_store import DB_FILE, PriceStore
+from protocol import (ACK, ADD, BULK_ADD, BULK_RESULT, ERROR, FEED, MAX_BULK_MESSAGE_BYTES, PRICE, QUERY, REMOVE,
+                      STATS, MessageReader, ProtocolError, is_framed, parse_legacy, require)
+from registry import SubscriptionRegistry, normalize_url
+from response_cache import get_response_cache
+from scheduler import DAY, HOUR, HourlyScheduler
+from sharding import ShardPool
+from watch_log import WatchLog, watch_path_for
+from writer import PersistenceWriter
+
+# 크롤링 결과별 수 (ok, missing: 가격 태그 없음, blocked: 차단 중이라 건너뜀, error,
+# shard_fallback: 살아 있는 워커 프로세스가 없어 이 프로세스에서 직접 크롤링)
+CRAWL_RESULTS = get_metrics().counter("crawls_total", "crawls by result", label="result")
+MAX_PROFILE_SECONDS = 60
+
+class ItemWatch:
+    # 상품(정규화된 URL) 하나당 하나만 만들어지고, 구독한 클라이언트 모두에게 가격을 보낸다
+    # 상품이 수십만 개여도 가볍도록 __slots__ 레코드로 두고 스케줄러/저장 큐는 server에서 공유
+    __slots__ = ("server", "subscribers", "subscribers_lock", "product_name", "product_link", "running",
+                 "crawled_price", "feed_price", "history", "poll")
+
+    def __init__(self, server, product_name, product_link):
+        self.server = server
+        self.subscribers = ThresholdIndex()     # 같은 상품의 구독 (Subscription: 소켓, 구매희망가격)을 가격 순으로
+        self.subscribers_lock = threading.Lock()
         self.product_name = product_name
-        self.desired_price = desired_price
         self.product_link = product_link
-        self.daily_average_time = daily_average_time
         self.running = True
         self.crawled_price = None
-        self.crawled_count = 0
-        self.average_price = 0
-        self.hourly_prices = []     #일평균가를 계산하기 위한 시간대별 가격 리스트
-        self.price_data_list = []   # 날짜, 시간대별 가격, 일평균 가격을 저장하는 리스트
+        self.feed_price = None      # change feed로 마지막에 내보낸 가격 (ChangeFeed가 바뀌었는지 비교)
+        self.history = PriceHistory()   # 일별 집계를 위한 시간대별 가격 (하루 24칸 array)
+        # 적응형 크롤링일 때 상품별 가격 변경률 추정 (아니면 None, 정각마다 크롤링)
+        self.poll = server.polling.new_state() if server is not None and server.polling is not None else None
+
+    def crawl(self):
+        # 정각 슬롯 작업: 워커 프로세스가 있으면 담당 워커로 넘기고 (결과는 record_price로), 없으면 직접 크롤링
+        if self.server.shards is not None:
+            try:
+                self.server.shards.submit(self.product_link)
+                if self.server.shard_fallback:
+                    self.server.shard_fallback = False
+                    print("Shard workers are back, crawling in workers again")
+                return
+            except RuntimeError as e:
+                # 워커가 모두 죽었으면 다시 뜰 때까지 (ShardPool이 backoff 뒤에 띄운다) 직접 크롤링 (처음 한 번만 출력)
+                CRAWL_RESULTS.inc(label="shard_fallback")
+                if not self.server.shard_fallback:
+                    self.server.shard_fallback = True
+                    print(f"Crawling in-process: {e}")
+        self.crawlingTest()
 
     def crawlingTest(self):
         try:
-            #쿠팡 크롤링위해 꼭 필요(로봇 아님 인증)
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
-                "Accept-Language": "ko-KR,ko;q=0.8,en-US;q=0.5,en;q=0.3"
-            }
-
-            res = requests.get(self.product_link, headers=headers)
-            res.raise_for_status()
-
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            # 가격 정보를 추출
-            price_element = soup.select_one(".total-price")
-
-            if price_element:
-                # 문자열을 정수로 변환
-                self.crawled_price = int(price_element.get_text(strip=True).replace(",", "").replace("원", ""))
-                # (파이썬)클라이언트 전송 테스트용
-                self.client_socket.send(str(self.crawled_price).encode())
-
-                # 날짜와 시간대별 가격을 price_data_list에 추가
-                current_time = time.strftime("%H:%M")
-                self.price_data_list.append((current_time, self.crawled_price))
-                return self.crawled_price
-            else:
-                self.crawled_price = None  # 예외 발생 시 가격 정보를 None으로 설정
-                return self.crawled_price
+            # 공유 Fetcher로 가격 정보를 추출 (조건부 요청 + 가격 영역 해시로 바뀌지 않은 페이지는 파싱 생략)
+            price = self.server.response_cache.fetch_price(self.product_link)
+        except CircuitOpenError:
+            # 쿠팡이 막고 있는 동안은 보내지 않고 다음 주기에 (governor가 차단/복구를 한 번씩 출력)
+            CRAWL_RESULTS.inc(label="blocked")
+            self.crawled_price = None
+            return self.crawled_price
         except Exception as e:
             print(f"Exception occurred during crawling: {e}")
+            CRAWL_RESULTS.inc(label="error")
             self.crawled_price = None  # 예외 발생 시 가격 정보를 None으로 설정
             return self.crawled_price
+        CRAWL_RESULTS.inc(label="ok" if price is not None else "missing")
+        return self.record_price(price)
 
-    def calculate_daily_average(self):
+    def record_price(self, price, ts=None):
         try:
-            total_price = sum(self.hourly_prices)
-            num_of_data_points = len(self.hourly_prices)
-
-            if num_of_data_points == 0:
-                print("No data points found for the day.")
-                return
-
-            # Daily average calculation
-            daily_average =int(total_price / num_of_data_points)
-            print(f"Daily Average Price: {daily_average}")
-
-            # 일평균 가격을 price_data_list에 추가
-            # current_date = time.strftime("%m/%d")
-            self.price_data_list.append(("일평균", daily_average))
-
-            # 엑셀 파일에 데이터 저장
-            self.save_to_excel(self.price_data_list)
-
-            # Clear the list for the next day
-            self.hourly_prices.clear()
-            self.price_data_list.clear()
+            if price is not None:
+                self.crawled_price = price
+                now = self.server.clock() if ts is None else ts
+                # 구매희망가격 이하로 내려간 구독자에게만 알림
+                self.notify_subscribers(self.crawled_price, now)
+                # 가격이 바뀌었을 때만 seq를 매겨 feed 연결에 차이만 보낸다
+                self.server.feed.publish(self, self.crawled_price, now)
+
+                # 수집 시각과 가격을 바로 저장 큐에 넣는다 (쓰기는 PersistenceWriter가 모아서 커밋)
+                self.server.writer.add_sample(self.product_link, now, self.crawled_price)
+                if self.running:
+                    # stop() 뒤에 끝난 크롤링이 최신 가격 캐시에 감시 중인 상품으로 다시 넣지 않도록
+                    self.server.latest.put(self.product_link, self.crawled_price, now)
+                self.history.record(now, self.crawled_price)
+                if self.poll is not None:
+                    self.server.polling.observe(self.poll, now, self.crawled_price)
+                return self.crawled_price
+            else:
+                self.crawled_price = None  # 가격을 찾지 못하면 None으로 설정
+                return self.crawled_price
         except Exception as e:
-            print(f"Exception occurred during daily average calculation: {e}")
-
-    def save_to_excel(self, price_data):
-        current_date = time.strftime("%m/%d")
-
-        workbook = openpyxl.load_workbook(EXCEL_FILE)
-        sheet = workbook[SHEET_NAME]
-
-        # 첫 번째 행에 열의 종류를 추가
-        if not sheet['A1'].value:
-            sheet.append(COLUMN_HEADERS)
-
-        # price_data_list를 엑셀 파일에 추가
-        row_data = [current_date] + [price for _, price in price_data]
-        sheet.append(row_data)
-
-        workbook.save(EXCEL_FILE)
-        workbook.close()
-
-    def showCurrentPrice(self):
-        self.crawlingTest()
-        print(f"Current price: {self.crawled_price}")
-        self.client_socket.send(str(self.crawled_price).encode())
-
-    def run(self):
-        # 00:00부터 23:00까지 매 시 정각마다 크롤링을 수행하고 가격을 hourly_prices에 저장
-        for hour in range(24):
-            time_str = f"{hour:02d}:00"
-            schedule.every().day.at(time_str).do(self.crawlingTest).tag(time_str)  # Add tag for each job
+            print(f"Exception occurred while recording price: {e}")
+            return self.crawled_price
 
-        # 매일 23:50에 calculate_daily_average() 함수를 실행하여 일평균 가격을 계산
-        schedule.every().day.at("23:50").do(self.calculate_daily_average)
+    def add_subscriber(self, subscription):
+        with self.subscribers_lock:
+            self.subscribers.add(subscription)
+
+    def remove_subscriber(self, client):
+        with self.subscribers_lock:
+            self.subscribers.remove(client)
+            return len(self.subscribers)
+
+    def notify_subscribers(self, price, ts=None):
+        with self.subscribers_lock:
+            crossed = self.subscribers.update(price)
+        for subscription in crossed:
+            try:
+                subscription.client.send_alert(subscription.product_name, self.product_link, price,
+                                               subscription.desired_price, ts)
+            except OSError as e:
+                # 연결이 끊긴 클라이언트는 구독 해제
+                print(f"Dropping subscriber of {self.product_name}: {e}")
+                self.server.registry.unsubscribe(subscription.client, self.product_link)
+
+    def next_interval(self):
+        # 적응형 크롤링: 변경률과 구매희망가격까지의 거리로 다음 크롤링까지의 초를 정한다
+        with self.subscribers_lock:
+            threshold = self.subscribers.highest_armed()
+        return self.server.polling.interval(self.poll, threshold)
+
+    def stop(self):
+        self.running = False
+        self.server.scheduler.remove((id(self), "hourly"))
+        self.server.watch_log.remove(self.product_link)
+        # 최신 가격/응답 캐시에서도 빼서 감시 중인 상품으로 남지 않게 (크기 제한 LRU로 돌아간다)
+        self.server.latest.forget(self.product_link)
+        self.server.response_cache.forget(self.product_link)
+        if self.poll is not None:
+            self.server.polling.forget(self.poll)
+
+    def start(self, first_due=None):
+        if not self.running:
+            return
+        # 매 시 정각 슬롯마다 크롤링을 수행하고 가격을 history에 저장 (PriceServer의 중앙 스케줄러에 등록)
+        # 적응형 크롤링이면 정각 대신 next_interval()초마다
+        # first_due: 재시작 후 마지막 가격이 오래된 상품은 첫 크롤링 시각을 따로 분산
+        if self.poll is not None:
+            self.server.scheduler.every_interval((id(self), "hourly"), self.crawl, self.next_interval, first_due)
+        else:
+            self.server.scheduler.every_hour((id(self), "hourly"), self.crawl, first_due)
 
 class PriceServer:
-    def __init__(self):
-        try:
-            workbook = openpyxl.load_workbook(EXCEL_FILE)
-            workbook.close()
-        except FileNotFoundError:
-            workbook = openpyxl.Workbook()
-            workbook.save(EXCEL_FILE)
-            workbook.close()
+    def __init__(self, host='localhost', port=12345, db_path=DB_FILE, workers=0, watch_path=None, adaptive=False,
+                 fetch_budget_per_minute=None, metrics_port=None, clock=None, response_cache=None):
+        # clock을 주면 (재생 벤치마크의 가상 시계) 스케줄러 스레드를 띄우지 않고 호출하는 쪽이 scheduler.run_pending으로 진행
+        # response_cache: 크롤링에 쓸 ResponseCache (기본은 프로세스 공유 Fetcher + governor)
+        self.clock = clock or time.time
+        self.response_cache = response_cache or get_response_cache()
+        # 가격 저장소 (SQLite, 엑셀은 필요할 때 export), 쓰기는 PersistenceWriter 스레드 하나만 한다
+        self.store = PriceStore(db_path)
+        self.writer = PersistenceWriter(self.store, flush_interval=1.0)
+        self.writer.start()
+        # 가격 변경에 seq를 매겨 저장하고 feed 연결에 보낸다 (재연결한 클라이언트는 놓친 변경을 저장소에서)
+        self.feed = ChangeFeed(self.store, self.writer)
 
         # 서버 설정
-        self.server_host = 'localhost'
-        self.server_port = 12345
+        self.server_host = host
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((self.server_host, self.server_port))
-        self.server_socket.listen(5)
+        self.server_socket.bind((self.server_host, port))
+        self.server_socket.listen(128)
+        self.server_port = self.server_socket.getsockname()[1]
         print(f"Server listening on {self.server_host}:{self.server_port}")
 
         # 아이템별 일평균 계산 시간 설정
         self.item_daily_average_time = "23:50"  # 매일 23:50에 일평균 계산
+        self.history_days = 7                    # 메모리에 남길 시간대별 가격 기록 일수
 
         # 스레드풀 생성 (최대 10개의 스레드)
         self.thread_pool = ThreadPoolExecutor(max_workers=5)
 
-    def handle_client(self, client_socket, address):
-        while True:
-            data = client_socket.recv(1024).decode()
-            if not data:
-                break
-
-            product_name, desired_price, product_link = data.split(',')
-            item_thread = ItemThread(client_socket, product_name, desired_price, product_link,
-                                     self.item_daily_average_time)
-            item_thread.start()
+        # 모든 아이템이 공유하는 중앙 스케줄러 (정각 요청 폭주를 막기 위해 슬롯 안에서 jitter만큼 분산)
+        self.fetch_jitter_seconds = 300
+        self.scheduler = HourlyScheduler(jitter_seconds=self.fetch_jitter_seconds, clock=self.clock)
+        if clock is None:
+            self.scheduler.start(self.dispatch_batch)
+
+        # adaptive=True면 상품마다 가격 변경률에 맞춰 크롤링 간격을 조절 (전체 분당 크롤링 수는 예산 안에서)
+        self.polling = AdaptivePolling(fetch_budget_per_minute) if adaptive else None
+
+        # 같은 상품을 여러 클라이언트가 요청해도 크롤링은 상품당 한 번만
+        self.registry = SubscriptionRegistry(self.create_watch)
+
+        # workers > 0이면 크롤링/파싱을 워커 프로세스들에 product_link 해시로 나눠 맡긴다 (이 프로세스는 소켓만)
+        self.shards = ShardPool(workers, self.on_shard_price, on_error=self.on_shard_error,
+                                on_orphaned=self.crawl_in_process) if workers else None
+        self.shard_fallback = False     # 워커가 없어 직접 크롤링 중인지
+
+        # query 응답용 최신 가격 캐시 (정기 크롤링 간격 + jitter 안의 가격은 그대로 사용)
+        self.latest = LatestPriceCache(self.fetch_query_price, ttl=HOUR + self.fetch_jitter_seconds,
+                                       clock=self.clock)
+
+        # 매일 item_daily_average_time(23:50)에 모든 상품의 일평균/최저/최고를 한 번에 집계
+        self.scheduler.every_day_at("daily_aggregate", self.item_daily_average_time, self.aggregate_daily)
+
+        # 감시 중인 상품 목록 (스냅샷 + 저널), 재시작하면 다시 불러와 크롤링을 이어 간다
+        self.watch_log = WatchLog(watch_path or watch_path_for(db_path))
+        self.restore_stagger_seconds = 600  # 마지막 가격이 오래된 상품의 첫 크롤링을 이 시간 안에 분산
+        self.restore_grace_seconds = DAY    # 이 시간 안에 아무도 다시 구독하지 않은 상품은 감시 중단
+        # 대량 등록한 새 상품의 첫 크롤링: onboard_batch개씩 묶어 초당 onboard_fetches_per_second개 (한 시간을 넘겨도 속도 유지)
+        self.onboard_batch = 50
+        self.onboard_fetches_per_second = 20
+        self.onboard_next = 0.0     # 앞선 대량 등록의 첫 크롤링이 끝나는 시각 (다음 등록은 그 뒤로 이어서)
+        self._onboard_lock = threading.Lock()
+        self.restore_watches()
+
+        # 연결된 클라이언트 (stats 명령/metrics용)
+        self.connections = set()
+        self.register_metrics()
+        # metrics_port를 주면 GET /metrics (Prometheus), /profile?seconds=N 를 로컬에서만 제공
+        self.metrics_server = serve_metrics(get_metrics(), self.server_host, metrics_port) if metrics_port is not None else None
+
+    def register_metrics(self):
+        # 읽을 때 계산하는 값들 (스케줄러 지연, 감시 상품/연결 수, 저장 큐 길이, 차단된 호스트 수)
+        metrics = get_metrics()
+        metrics.gauge("scheduler_lag_seconds", "how late the last scheduler slot ran",
+                      lambda: self.scheduler.last_tick_lag)
+        metrics.gauge("scheduled_jobs", "jobs in the scheduler heap", lambda: len(self.scheduler))
+        metrics.gauge("watches", "products being watched", lambda: len(self.registry))
+        metrics.gauge("connections", "connected clients", lambda: len(self.connections))
+        metrics.gauge("send_buffered_bytes", "bytes queued for clients but not yet written",
+                      lambda: sum(client.pending_bytes for client in list(self.connections)))
+        metrics.gauge("persistence_pending", "records waiting in the persistence queue", self.writer.pending)
+        governor = getattr(self.response_cache.fetcher, "governor", None)
+        if governor is not None:
+            metrics.gauge("hosts_blocked", "hosts with an open circuit",
+                          lambda: sum(stats["state"] != "closed" for stats in governor.stats().values()))
+
+    def create_watch(self, product_name, product_link):
+        self.writer.add_product(product_link, product_name)
+        self.watch_log.add(product_link, product_name)
+        return ItemWatch(self, product_name, product_link)
+
+    def restore_watches(self):
+        # 저장된 감시 목록과 오늘 수집한 가격을 한 번에 불러온다 (페이지를 다시 받지 않음)
+        started = time.perf_counter()
+        saved = self.watch_log.load()
+        if not saved:
+            return 0
+        now = self.clock()
+        current = time.localtime(now)
+        today = time.mktime((current.tm_year, current.tm_mon, current.tm_mday, 0, 0, 0, 0, 0, -1))
+
+        watches = {link: ItemWatch(self, name, link) for link, name in saved.items()}
+        # 재시작 전에 마지막으로 내보낸 가격 (같은 가격을 다시 변경으로 보내지 않도록)
+        for product_link, price in self.store.last_changed_prices().items():
+            item_watch = watches.get(product_link)
+            if item_watch is not None:
+                item_watch.feed_price = price
+        last_seen = {}
+        slots = {}
+        # 기록은 상품별 시각 순으로 온다
+        for product_link, rows in groupby(self.store.recent_samples(today), itemgetter(0)):
+            item_watch = watches.get(product_link)
+            if item_watch is None:
+                continue
+            rows = [(ts, price) for _, ts, price in rows]
+            item_watch.history.record_many(rows, slots)
+            if item_watch.poll is not None:
+                # 오늘 기록으로 변경률 추정을 이어 간다
+                for ts, price in rows:
+                    self.polling.observe(item_watch.poll, ts, price)
+            item_watch.crawled_price = rows[-1][1]
+            last_seen[product_link] = rows[-1]
+        self.latest.restore((product_link, price, ts) for product_link, (ts, price) in last_seen.items())
+
+        # 최신 가격 캐시 TTL 안의 가격이 있으면 평소 슬롯부터, 없으면 restore_stagger_seconds 안에 나눠서 크롤링
+        fresh_after = now - self.latest.ttl
+        for product_link, item_watch in watches.items():
+            seen = last_seen.get(product_link)
+            if seen is not None and seen[0] >= fresh_after:
+                item_watch.start()
+            else:
+                item_watch.start(now + random.uniform(0, self.restore_stagger_seconds))
+        self.registry.restore(watches.values())
+
+        timer = threading.Timer(self.restore_grace_seconds, self.drop_unsubscribed)
+        timer.daemon = True
+        timer.start()
+        print(f"Restored {len(watches)} products ({len(last_seen)} with today's prices) "
+              f"in {time.perf_counter() - started:.2f}s")
+        return len(watches)
+
+    def drop_unsubscribed(self):
+        stopped = self.registry.drop_unsubscribed()
+        if stopped:
+            print(f"Stopped watching {len(stopped)} restored products without subscribers")
+
+    def watch_key(self, product_link):
+        # add/legacy/query가 같은 규칙으로 링크를 검증하고 정규화한다 (bulk.validate_link)
+        # 검증 규칙이 생기기 전에 저장되어 복구된 감시는 그대로 통과
+        try:
+            return validate_link(product_link)
+        except ValueError:
+            key = normalize_url(product_link) if isinstance(product_link, str) else None
+            if key in self.registry.watches:
+                return key
+            raise
+
+    def subscribe(self, client, product_name, desired_price, product_link):
+        item_watch, created = self.registry.subscribe(client, product_name, desired_price,
+                                                      self.watch_key(product_link))
+        if created:
+            # 새 상품일 때만 스케줄러에 등록 (크롤링은 슬롯마다 스레드풀에서 실행)
+            item_watch.start()
+            print(f"Watching {product_name} ({len(self.registry)} products)")
+        return item_watch
+
+    def subscribe_many(self, client, items):
+        # 대량 구독: 검증/정규화/중복 제거 후 한 번에 등록, 새 상품의 첫 크롤링은 묶음 단위로 나눠서
+        entries, rejected, duplicates = prepare(items)
+        with self.watch_log.batch():
+            created = self.registry.subscribe_many(client, entries)
+        now = self.clock()
+        with self._onboard_lock:
+            first_dues = staggered(len(created), max(now, self.onboard_next), self.onboard_batch,
+                                   self.onboard_fetches_per_second)
+            if created:
+                self.onboard_next = first_dues[-1] + self.onboard_batch / self.onboard_fetches_per_second
+        for item_watch, first_due in zip(created, first_dues):
+            item_watch.start(first_due)
+        if created:
+            print(f"Watching {len(created)} more products ({len(self.registry)} products), "
+                  f"first fetches within {first_dues[-1] - now:.0f}s")
+        return {"added": len(created), "updated": len(entries) - len(created), "duplicates": duplicates,
+                "rejected": len(rejected),
+                "errors": [{"index": index, "error": error} for index, error in rejected[:MAX_REPORTED_ERRORS]],
+                "first_fetch_seconds": round(first_dues[-1] - now, 1) if created else 0}
+
+    def fetch_query_price(self, product_link):
+        # query 갱신: 감시 중인 상품만 응답 캐시(ETag/가격 영역 해시)에 남긴다 (임의 링크로 메모리가 늘지 않도록)
+        return self.response_cache.fetch_price(product_link, remember=product_link in self.registry.watches)
+
+    def aggregate_daily(self):
+        try:
+            aggregate_and_persist(list(self.registry.watches.values()), self.writer, self.clock(),
+                                  keep_days=self.history_days)
+        except Exception as e:
+            print(f"Exception occurred during daily aggregation: {e}")
+
+    def on_shard_price(self, product_link, price, ts):
+        # 워커가 보낸 가격 (받는 스레드를 막지 않도록 알림/저장은 스레드풀에서)
+        CRAWL_RESULTS.inc(label="ok" if price is not None else "missing")
+        item_watch = self.registry.watches.get(product_link)
+        if item_watch is not None:
+            self.thread_pool.submit(item_watch.record_price, price, ts)
+
+    def on_shard_error(self, product_link, message, blocked):
+        # 워커의 크롤링 실패: 차단 중이라 건너뛴 것은 세기만 한다 (governor가 차단/복구를 한 번씩 출력)
+        if blocked:
+            CRAWL_RESULTS.inc(label="blocked")
+            return
+        print(f"Exception occurred during crawling {product_link}: {message}")
+        CRAWL_RESULTS.inc(label="error")
+
+    def crawl_in_process(self, product_links):
+        # 마지막 워커가 죽어 맡길 곳이 없는 처리 중이던 상품은 이 프로세스에서 직접
+        for product_link in product_links:
+            item_watch = self.registry.watches.get(product_link)
+            if item_watch is not None:
+                CRAWL_RESULTS.inc(label="shard_fallback")
+                self.thread_pool.submit(item_watch.crawlingTest)
+
+    def dispatch_batch(self, slot, callbacks):
+        # 같은 슬롯에 실행할 작업들을 한 번에 스레드풀로 넘긴다
+        for callback in callbacks:
+            self.thread_pool.submit(callback)
+
+    def handle_message(self, client, message):
+        # 새 프로토콜 메시지 하나 처리 (응답에는 요청의 id를 붙인다)
+        kind = message["type"]
+        reply = {"id": message["id"]} if "id" in message else {}
+        if kind == ADD:
+            product_name, desired_price, product_link = require(message, "name", "desired_price", "link")
+            self.subscribe(client, product_name, int(desired_price), product_link)
+            client.send_message(dict(reply, type=ACK))
+        elif kind == REMOVE:
+            (product_link,) = require(message, "link")
+            self.registry.unsubscribe(client, product_link)
+            client.send_message(dict(reply, type=ACK))
+        elif kind == QUERY:
+            # 감시 중이 아닌 상품도 조회할 수 있다 (max_age로 더 최근 가격을 요구할 수 있음)
+            product_link = self.watch_key(*require(message, "link"))
+            latest = self.latest.get(product_link, message.get("max_age"))
+            item_watch = self.registry.watches.get(latest["link"])
+            name = item_watch.product_name if item_watch is not None else message.get("name")
+            client.send_message(dict(reply, type=PRICE, name=name, **latest))
+        elif kind == BULK_ADD:
+            (items,) = require(message, "items")
+            if not isinstance(items, list):
+                raise ProtocolError("bulk_add items must be a list")
+            if len(items) > MAX_BULK_ITEMS:
+                raise ProtocolError(f"bulk_add accepts at most {MAX_BULK_ITEMS} items per message")
+            client.send_message(dict(reply, type=BULK_RESULT, **self.subscribe_many(client, items)))
+        elif kind == FEED:
+            # 구독 중인 상품의 가격이 바뀔 때만 차이를 받는 연결로 전환 (재연결하면 since로 놓친 변경부터)
+            since = message.get("since")
+            seq, replayed = self.feed.attach(client, self.registry.client_products(client),
+                                             None if since is None else int(since))
+            client.send_message(dict(reply, type=ACK, seq=seq, replayed=replayed))
+        elif kind == STATS:
+            # 지표 스냅샷, profile초를 주면 그동안 스택 샘플링도 (이 연결의 수신 스레드에서만 기다린다)
+            reply = dict(reply, type=STATS, metrics=get_metrics().snapshot())
+            if message.get("profile"):
+                reply["profile"] = SamplingProfiler().run(min(MAX_PROFILE_SECONDS, float(message["profile"])))
+            client.send_message(reply)
+        else:
+            raise ProtocolError(f"unknown message type: {kind}")
+
+    def handle_framed(self, client, messages):
+        for message in messages:
+            try:
+                if isinstance(message, ProtocolError):
+                    raise message
+                self.handle_message(client, message)
+            except (ProtocolError, ValueError, TypeError) as e:
+                error = {"type": ERROR, "message": str(e)}
+                if isinstance(message, dict) and "id" in message:
+                    error["id"] = message["id"]
+                client.send_message(error)
 
-        client_socket.close()
+    def handle_client(self, client_socket, address):
+        client = ClientConnection(client_socket, address)
+        reader = MessageReader(MAX_BULK_MESSAGE_BYTES)
+        self.connections.add(client)
+        try:
+            while True:
+                data = client_socket.recv(65536)
+                if not data:
+                    break
+
+                if client.framed is None:
+                    client.framed = is_framed(data)
+
+                if client.framed:
+                    self.handle_framed(client, reader.feed(data))
+                else:
+                    # 기존 방식: recv 한 번에 "상품명,구매희망가격,상품링크" 하나
+                    try:
+                        product_name, desired_price, product_link = parse_legacy(data.decode())
+                        self.subscribe(client, product_name, desired_price, product_link)
+                    except (ProtocolError, UnicodeDecodeError, ValueError) as e:
+                        print(f"Invalid request from {address}: {e}")
+        except (OSError, ProtocolError) as e:
+            print(f"Connection from {address} closed: {e}")
+        finally:
+            self.connections.discard(client)
+            self.registry.unsubscribe(client)
+            client.close()
 
     def start(self):
         while True:
             client_socket, address = self.server_socket.accept()
             print(f"Accepted connection from {address}")
-
-            data = client_socket.recv(1024).decode()
-            if not data:
-                client_socket.close()
-                continue
-
-            product_name, desired_price, product_link = data.split(',')
-            item_thread = ItemThread(client_socket, product_name, desired_price, product_link,
-                                     self.item_daily_average_time)
-            # 스레드풀에 스레드 추가 및 실행
-            self.thread_pool.submit(item_thread.start)
+            # 연결마다 수신 스레드 하나 (한 연결에서 여러 상품을 이어서 등록할 수 있다)
+            threading.Thread(target=self.handle_client, args=(client_socket, address), daemon=True).start()
 
 
 if __name__ == "__main__":
-    price_server = PriceServer()
-    price_server.start()
+    # python main_generalization.py [워커 프로세스 수] [분당 크롤링 예산: 주면 적응형 크롤링, 0이면 정각] [metrics 포트]
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    price_server = PriceServer(workers=int(sys.argv[1]) if len(sys.argv) > 1 else 0, adaptive=budget > 0,
+                               fetch_budget_per_minute=budget or None,
+                               metrics_port=int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    try:
+        price_server.start()
+    finally:
+        if price_server.shards is not None:
+            price_server.shards.close()
+        # 종료 전에 큐에 남은 기록을 모두 커밋
+        price_server.writer.close()
+        price_server.watch_log.close()
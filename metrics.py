@@ -0,0 +1,247 @@
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter as StackCounter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# 지연 시간 히스토그램 구간 (초, 상한), 마지막 +Inf는 자동
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIX = "coupwatcher_"
+
+
+class Counter:
+    # 누적 수 (label을 주면 label 값별로 따로 센다, 예: 응답 코드별)
+    def __init__(self, registry, name, help_text, label=None):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, label=None):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self.values[label] = self.values.get(label, 0) + amount
+
+    def value(self, label=None):
+        return self.values.get(label, 0)
+
+    def snapshot(self):
+        if self.label is None:
+            return self.values.get(None, 0)
+        return {str(label): value for label, value in self.values.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label, value in sorted(self.values.items(), key=lambda item: str(item[0])):
+            suffix = "" if label is None else f'{{{self.label}="{label}"}}'
+            lines.append(f"{self.name}{suffix} {value}")
+        if not self.values and self.label is None:
+            lines.append(f"{self.name} 0")
+        return lines
+
+
+class Histogram:
+    # 지연 시간 분포: 구간별 수 + 합계 (Prometheus histogram과 같은 형식)
+    def __init__(self, registry, name, help_text, buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        if not self.registry.enabled:
+            return
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def time(self):
+        return _Timer(self)
+
+    def quantile(self, fraction):
+        # 구간 상한으로 근사한 분위수
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return 0.0
+
+    def snapshot(self):
+        return {"count": self.count, "sum": round(self.sum, 6), "p50": self.quantile(0.5),
+                "p99": self.quantile(0.99)}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Gauge:
+    # 읽을 때 함수를 불러 현재 값을 얻는다 (활성 감시 수, 스케줄러 지연 등)
+    def __init__(self, registry, name, help_text, read):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def value(self):
+        try:
+            return self.read()
+        except Exception:
+            return float("nan")
+
+    def snapshot(self):
+        return self.value()
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value()}"]
+
+
+class MetricsRegistry:
+    # 이름 -> 지표, 같은 이름으로 다시 만들면 기존 것을 돌려준다 (gauge는 새 함수로 교체)
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, factory):
+        name = PREFIX + name
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = factory(name)
+            return metric
+
+    def counter(self, name, help_text, label=None):
+        return self._get(name, lambda full_name: Counter(self, full_name, help_text, label))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._get(name, lambda full_name: Histogram(self, full_name, help_text, buckets))
+
+    def gauge(self, name, help_text, read):
+        gauge = self._get(name, lambda full_name: Gauge(self, full_name, help_text, read))
+        gauge.read = read
+        return gauge
+
+    def snapshot(self):
+        # stats 명령 응답용 {이름: 값} (접두어 제외)
+        return {name[len(PREFIX):]: metric.snapshot() for name, metric in sorted(self.metrics.items())}
+
+    def render(self):
+        # Prometheus 텍스트 형식
+        lines = []
+        for _, metric in sorted(self.metrics.items()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    # 일정 간격으로 모든 스레드의 스택을 찍어서 어디서 시간을 쓰는지 센다 (코드 변경 없이 운영 중에 켤 수 있다)
+    def __init__(self, interval=0.005, depth=4):
+        self.interval = interval
+        self.depth = depth
+
+    def run(self, seconds, top=20):
+        samples = StackCounter()
+        me = threading.get_ident()
+        deadline = time.perf_counter() + seconds
+        taken = 0
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = traceback.extract_stack(frame, limit=self.depth)
+                samples[" <- ".join(f"{entry.name} ({entry.filename.rsplit('/', 1)[-1]}:{entry.lineno})"
+                                    for entry in reversed(stack))] += 1
+            taken += 1
+            time.sleep(self.interval)
+        return {"samples": taken, "stacks": [{"count": count, "stack": stack}
+                                              for stack, count in samples.most_common(top)]}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            body = self.server.registry.render()
+        elif url.path == "/profile":
+            # /profile?seconds=5 : 그동안 스레드 스택을 모아 많이 찍힌 순으로
+            try:
+                seconds = float(parse_qs(url.query).get("seconds", ["5"])[0])
+            except ValueError:
+                seconds = None
+            if seconds is None or not seconds >= 0:     # 숫자가 아니거나 음수, nan
+                self.send_error(400, "seconds must be a non-negative number")
+                return
+            seconds = min(60.0, seconds)
+            report = SamplingProfiler().run(seconds)
+            body = f"{report['samples']} samples\n" + "".join(
+                f"{entry['count']:6} {entry['stack']}\n" for entry in report["stacks"])
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve_metrics(registry, host="127.0.0.1", port=9108):
+    # GET /metrics (Prometheus), GET /profile?seconds=N 를 별도 스레드에서 (기본은 로컬에서만 접근)
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_shared_metrics = None
+_shared_lock = threading.Lock()
+
+
+def get_metrics():
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = MetricsRegistry()
+        return _shared_metrics
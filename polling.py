@@ -0,0 +1,113 @@
+import random
+import threading
+
+HOUR = 3600
+
+# 크롤링 간격 범위 (자주 바뀌는 상품도 5분보다 자주는 안 가져오고, 안 바뀌는 상품도 6시간 안에는 한 번)
+MIN_INTERVAL = 300
+MAX_INTERVAL = 6 * HOUR
+
+# 한 번 가져올 때 기대하는 가격 변경 수 (변경률 * 간격), 작을수록 자주 가져온다
+TARGET_CHANGES = 0.5
+
+# 기록이 없는 새 상품은 한 시간에 0.5번 바뀌는 것으로 시작 (= 처음엔 기존처럼 한 시간 간격)
+PRIOR_SECONDS = 6 * HOUR
+PRIOR_CHANGES = TARGET_CHANGES * PRIOR_SECONDS / HOUR
+
+# 변경률은 지수 가중 (하루 전 관측의 비중은 절반)
+HALF_LIFE = 24 * HOUR
+
+# 가격이 가장 높은 구매희망가격의 이 비율 안으로 다가오면 간격을 비례해서 줄인다 (최대 NEAR_FLOOR배까지)
+NEAR_RATIO = 0.05
+NEAR_FLOOR = 0.1
+
+# 간격에 곱하는 무작위 범위 (같은 간격의 상품들이 같은 순간에 몰리지 않도록 매번 위상을 흩뜨린다)
+JITTER_RATIO = 0.1
+
+
+class PollState:
+    # 상품 하나의 변경률 추정 (지수 가중 변경 수 / 관측 시간)과 마지막으로 정한 간격
+    __slots__ = ("last_price", "last_ts", "changes", "elapsed", "interval")
+
+    def __init__(self, interval):
+        self.last_price = None
+        self.last_ts = None
+        self.changes = 0.0
+        self.elapsed = 0.0
+        self.interval = interval
+
+
+class AdaptivePolling:
+    # 상품마다 관측한 가격 변경률로 다음 크롤링 간격을 정한다
+    #   자주 바뀌는 상품, 가격이 구매희망가격 가까이 온 상품은 짧게 / 거의 안 바뀌는 상품은 길게
+    # budget_per_minute를 주면 모든 상품의 분당 크롤링 수(sum 60/간격)가 예산과 같아지도록 모든 간격을 같은 비율로
+    # 늘리거나 줄인다 (남는 예산은 자주 바뀌는 상품에 쓰고, 넘치면 모두 조금씩 늦춘다)
+    def __init__(self, budget_per_minute=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 target_changes=TARGET_CHANGES, half_life=HALF_LIFE, near_ratio=NEAR_RATIO, rng=None):
+        self.budget_per_minute = budget_per_minute
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_changes = target_changes
+        self.half_life = half_life
+        self.near_ratio = near_ratio
+        self.rng = rng or random.Random()
+        self.demand = 0.0   # 모든 상품의 초당 크롤링 수 합 (sum 1/간격)
+        self._lock = threading.Lock()
+
+    def new_state(self):
+        state = PollState(self._clamp(HOUR))
+        with self._lock:
+            self.demand += 1.0 / state.interval
+        return state
+
+    def forget(self, state):
+        # 감시를 멈춘 상품은 예산 계산에서 뺀다
+        with self._lock:
+            self.demand -= 1.0 / state.interval
+
+    def observe(self, state, ts, price):
+        # 크롤링 결과 하나 반영 (지난 관측과 가격이 다르면 변경 1회)
+        if price is None:
+            return
+        if state.last_ts is not None and ts > state.last_ts:
+            decay = 0.5 ** ((ts - state.last_ts) / self.half_life)
+            state.changes = state.changes * decay + (price != state.last_price)
+            state.elapsed = state.elapsed * decay + (ts - state.last_ts)
+        if state.last_ts is None or ts >= state.last_ts:
+            state.last_price = price
+            state.last_ts = ts
+
+    def change_rate(self, state):
+        # 초당 가격 변경 수 추정 (관측이 적을 때는 prior 쪽으로)
+        return (state.changes + PRIOR_CHANGES) / (state.elapsed + PRIOR_SECONDS)
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def interval(self, state, threshold=None):
+        # 다음 크롤링까지의 초, threshold: 아직 알림을 받지 않은 구독 중 가장 높은 구매희망가격
+        interval = self.target_changes / self.change_rate(state)
+        price = state.last_price
+        if threshold is not None and price:
+            gap = (price - threshold) / price
+            if 0 <= gap < self.near_ratio:
+                interval *= max(NEAR_FLOOR, gap / self.near_ratio)
+        interval = self._clamp(interval)
+        with self._lock:
+            self.demand += 1.0 / interval - 1.0 / state.interval
+            state.interval = interval
+            scale = self.scale()
+        if scale < 1.0:
+            interval = max(self.min_interval, interval * scale)
+        else:
+            interval *= scale
+        return interval * self.rng.uniform(1 - JITTER_RATIO, 1 + JITTER_RATIO)
+
+    def scale(self):
+        if self.budget_per_minute is None:
+            return 1.0
+        return self.demand * 60 / self.budget_per_minute
+
+    def stats(self):
+        return {"fetches_per_minute": round(self.demand * 60, 2), "budget_per_minute": self.budget_per_minute,
+                "scale": round(self.scale(), 3)}
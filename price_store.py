@@ -0,0 +1,256 @@
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import openpyxl
+
+DB_FILE = "price_data.db"
+EXCEL_FILE = "price_data.xlsx"
+
+# 엑셀 내보내기 시트의 열 (날짜, 시간대별 가격, 일평균가)
+COLUMN_HEADERS = ["날짜"] + [f"{hour:02d}:00" for hour in range(24)] + ["일평균가"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    product_link TEXT NOT NULL UNIQUE,
+    product_name TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    product_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    PRIMARY KEY (product_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_averages (
+    product_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    average INTEGER NOT NULL,
+    minimum INTEGER,
+    maximum INTEGER,
+    samples INTEGER,
+    missing INTEGER,
+    PRIMARY KEY (product_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    product_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    average INTEGER NOT NULL,
+    minimum INTEGER,
+    maximum INTEGER,
+    samples INTEGER,
+    missing INTEGER,
+    days INTEGER NOT NULL,
+    PRIMARY KEY (product_id, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    price INTEGER NOT NULL
+);
+"""
+
+# 예전 DB(daily_averages에 average만 있던)에 추가할 열
+DAILY_STATS_COLUMNS = ("minimum", "maximum", "samples", "missing")
+
+# 주/월 묶음 기준 (SQLite strftime): 2024-W05 (월요일 시작 주), 2024-01
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+ROLLUP_PERIODS = {WEEKLY: "%Y-W%W", MONTHLY: "%Y-%m"}
+
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def day_of(ts):
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+class PriceStore:
+    # 시간대별 가격과 일평균을 SQLite(WAL)에 추가만 하는 저장소, (상품, 시각) 기본키로 조회
+    def __init__(self, path=DB_FILE, synchronous="FULL"):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: 커밋이 끝난 데이터는 프로세스/전원 장애 후에도 남는다
+        self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        self.conn.execute("PRAGMA cache_size=-65536")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(daily_averages)")}
+        for column in DAILY_STATS_COLUMNS:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE daily_averages ADD COLUMN {column} INTEGER")
+        self._lock = threading.Lock()
+        self._product_ids = {}
+
+    def _product_id(self, product_link, product_name=None):
+        product_id = self._product_ids.get(product_link)
+        if product_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO products (product_link, product_name) VALUES (?, ?)",
+                              (product_link, product_name))
+            product_id = self.conn.execute("SELECT id FROM products WHERE product_link = ?",
+                                           (product_link,)).fetchone()[0]
+            self._product_ids[product_link] = product_id
+        return product_id
+
+    def register_product(self, product_link, product_name):
+        self.write(products=[(product_link, product_name)])
+
+    def write(self, samples=(), daily_averages=(), products=(), rollups=(), changes=()):
+        # samples: (product_link, ts, price), daily_averages: (product_link, "YYYY-MM-DD", average[, 최저, 최고,
+        # 수집 수, 누락 수]), products: (product_link, product_name), rollups: (WEEKLY/MONTHLY, 시작일, 종료일),
+        # changes: (seq, product_link, ts, price) change feed로 보낸 가격 변경
+        # 한 번의 트랜잭션으로 모아서 커밋 (rollups는 같은 트랜잭션의 일별 기록까지 반영)
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for link, name in products:
+                    self.conn.execute("UPDATE products SET product_name = ? WHERE id = ?",
+                                      (name, self._product_id(link, name)))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO samples (product_id, ts, price) VALUES (?, ?, ?)",
+                    [(self._product_id(link), int(ts), price) for link, ts, price in samples])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO daily_averages (product_id, day, average, minimum, maximum, samples, "
+                    "missing) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(self._product_id(link), day, average, *stats, *(None,) * (4 - len(stats)))
+                     for link, day, average, *stats in daily_averages])
+                for kind, start_day, end_day in rollups:
+                    self._rollup(kind, start_day, end_day)
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO changes (seq, product_id, ts, price) VALUES (?, ?, ?, ?)",
+                    [(seq, self._product_id(link), int(ts), price) for seq, link, ts, price in changes])
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                # 롤백된 상품 id는 캐시에서도 지운다
+                self._product_ids.clear()
+                raise
+
+    def _rollup(self, kind, start_day, end_day):
+        # 일별 통계를 주/월 단위로 묶어 한 번의 GROUP BY로 다시 계산 (평균은 수집 수 가중 평균)
+        # start_day~end_day는 묶음 경계에 맞춰 넘겨야 기간 일부만 집계되지 않는다
+        # product_id IN (...)으로 상품마다 기본키 범위 검색 (쌓인 기록 기간과 무관한 비용)
+        period = ROLLUP_PERIODS[kind]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rollups (product_id, period, average, minimum, maximum, samples, missing, days) "
+            "SELECT product_id, strftime(?, day), "
+            "CAST(SUM(average * COALESCE(samples, 1)) / SUM(COALESCE(samples, 1)) AS INTEGER), "
+            "MIN(minimum), MAX(maximum), SUM(samples), SUM(missing), COUNT(*) "
+            "FROM daily_averages WHERE product_id IN (SELECT id FROM products) AND day >= ? AND day <= ? "
+            "GROUP BY product_id, strftime(?, day)",
+            (period, start_day, end_day, period))
+
+    def samples(self, product_link, start=0, end=None):
+        end = 2 ** 62 if end is None else end
+        with self._lock:
+            return self.conn.execute(
+                "SELECT ts, price FROM samples WHERE product_id = "
+                "(SELECT id FROM products WHERE product_link = ?) AND ts >= ? AND ts < ? ORDER BY ts",
+                (product_link, int(start), int(end))).fetchall()
+
+    def recent_samples(self, start):
+        # 모든 상품의 start 이후 기록 (product_link, ts, price), 상품별 시각 순 (재시작 시 한 번에 읽기)
+        # product_id IN (...)으로 상품마다 기본키 범위만 읽고, 전부 메모리에 올리지 않도록 조금씩 꺼낸다
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT p.product_link, s.ts, s.price FROM samples s JOIN products p ON p.id = s.product_id "
+                "WHERE s.product_id IN (SELECT id FROM products) AND s.ts >= ? ORDER BY s.product_id, s.ts",
+                (int(start),))
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                yield from rows
+
+    def daily_averages(self, product_link, start_day="", end_day="9999-99-99"):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT day, average FROM daily_averages WHERE product_id = "
+                "(SELECT id FROM products WHERE product_link = ?) AND day >= ? AND day <= ? ORDER BY day",
+                (product_link, start_day, end_day)).fetchall()
+
+    def daily_stats(self, product_link, start_day="", end_day="9999-99-99"):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT day, average, minimum, maximum, samples, missing FROM daily_averages WHERE product_id = "
+                "(SELECT id FROM products WHERE product_link = ?) AND day >= ? AND day <= ? ORDER BY day",
+                (product_link, start_day, end_day)).fetchall()
+
+    def rollups(self, product_link, kind=MONTHLY):
+        # 주 단위는 "YYYY-Www", 월 단위는 "YYYY-MM" 기간만
+        pattern = "____-W__" if kind == WEEKLY else "____-__"
+        with self._lock:
+            return self.conn.execute(
+                "SELECT period, average, minimum, maximum, samples, missing, days FROM rollups WHERE product_id = "
+                "(SELECT id FROM products WHERE product_link = ?) AND period LIKE ? ORDER BY period",
+                (product_link, pattern)).fetchall()
+
+    def last_change_seq(self):
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def last_changed_prices(self):
+        # 상품별 마지막으로 보낸 가격 {product_link: price} (재시작 후 같은 가격을 다시 변경으로 보내지 않도록)
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT p.product_link, c.price FROM changes c JOIN products p ON p.id = c.product_id "
+                "WHERE c.seq IN (SELECT MAX(seq) FROM changes GROUP BY product_id)"))
+
+    def changes_since(self, since, until, page=10000):
+        # since < seq <= until 인 변경 (seq, product_link, ts, price)을 순서대로, seq 기본키 범위만 읽는다
+        # 받는 쪽이 느려도 쓰기를 막지 않도록 page개씩 잠금을 잡았다 놓는다
+        since = int(since)
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT c.seq, p.product_link, c.ts, c.price FROM changes c JOIN products p ON p.id = c.product_id "
+                    "WHERE c.seq > ? AND c.seq <= ? ORDER BY c.seq LIMIT ?", (since, int(until), page)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            since = rows[-1][0]
+
+    def products(self):
+        with self._lock:
+            return self.conn.execute("SELECT id, product_link, product_name FROM products ORDER BY id").fetchall()
+
+    def export_excel(self, path=EXCEL_FILE, start_day="", end_day="9999-99-99"):
+        # 기존 엑셀 양식(상품별 시트, 날짜/00:00~23:00/일평균가)으로 필요할 때만 내보낸다
+        workbook = openpyxl.Workbook(write_only=True)
+        used_titles = set()
+        for product_id, product_link, product_name in self.products():
+            title = INVALID_SHEET_CHARS.sub("_", product_name or str(product_id))[:31] or str(product_id)
+            if title in used_titles:
+                title = f"{title[:31 - len(str(product_id)) - 1]}_{product_id}"
+            used_titles.add(title)
+
+            sheet = workbook.create_sheet(title)
+            sheet.append(COLUMN_HEADERS)
+
+            days = {}
+            for ts, price in self.samples(product_link):
+                day = day_of(ts)
+                if start_day <= day <= end_day:
+                    days.setdefault(day, [None] * 24)[time.localtime(ts).tm_hour] = price
+            averages = dict(self.daily_averages(product_link, start_day, end_day))
+            for day in sorted(set(days) | set(averages)):
+                hourly = days.get(day, [None] * 24)
+                sheet.append([f"{day[5:7]}/{day[8:10]}"] + hourly + [averages.get(day)])
+
+        workbook.save(path)
+        workbook.close()
+        return path
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    # python price_store.py [엑셀 파일 경로] : 저장된 가격을 엑셀로 내보내기
+    store = PriceStore()
+    print(f"Exported to {store.export_excel(*sys.argv[1:2])}")
+    store.close()
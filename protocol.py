@@ -0,0 +1,104 @@
+import json
+
+# 줄바꿈으로 구분한 JSON 메시지 (JSON Lines), 한 줄 = 메시지 하나
+#   클라이언트 -> 서버: add {name, desired_price, link}, remove {link}, query {link[, max_age]}, stats [{profile}],
+#                      bulk_add {items: [{name, desired_price, link} 또는 [name, desired_price, link], ...]},
+#                      feed [{since}] (이 연결을 change feed로, since를 주면 그 seq 뒤로 놓친 변경부터)
+#   서버 -> 클라이언트: price {name, link, price, ts[, age, stale, cached]}, alert {name, link, price, desired_price, ts}, ack, error,
+#                      stats {metrics[, profile]} (profile초 동안 스레드 스택 샘플링 결과),
+#                      bulk_result {added, updated, duplicates, rejected, errors: [{index, error}], first_fetch_seconds},
+#                      change {seq, ref, delta, ts} (feed 연결에만, 구독한 상품의 가격이 바뀌었을 때만)
+#                        ref는 연결 안에서 상품을 가리키는 번호, 처음 보내는 상품은 {seq, ref, link, name, price, ts}
+#                        delta는 이 연결에 마지막으로 보낸 가격과의 차이, feed의 ack에는 {seq, replayed}
+#   가격이 구매희망가격 이하로 내려가면 alert만 보낸다 (query 응답은 price)
+# 메시지에 "id"를 넣으면 ack/error/응답에 같은 id가 붙어서 여러 요청을 한 연결에서 이어 보낼 수 있다
+ADD = "add"
+REMOVE = "remove"
+QUERY = "query"
+PRICE = "price"
+ALERT = "alert"
+ACK = "ack"
+ERROR = "error"
+STATS = "stats"
+BULK_ADD = "bulk_add"
+BULK_RESULT = "bulk_result"
+FEED = "feed"
+CHANGE = "change"
+
+MAX_MESSAGE_BYTES = 64 * 1024
+# bulk_add를 받는 서버 쪽 한도 (상품 수만 개를 메시지 하나로)
+MAX_BULK_MESSAGE_BYTES = 8 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_message(message):
+    return (json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+def decode_message(line):
+    try:
+        message = json.loads(line)
+    except ValueError as e:
+        raise ProtocolError(f"invalid message: {e}")
+    if not isinstance(message, dict) or "type" not in message:
+        raise ProtocolError("message must be an object with a type")
+    return message
+
+
+def is_framed(first_chunk):
+    # 첫 바이트가 '{'이면 새 프로토콜, 아니면 기존 "상품명,구매희망가격,상품링크" 방식
+    return first_chunk.lstrip().startswith(b"{")
+
+
+def parse_legacy(data):
+    # 상품 링크에 ','가 들어갈 수 있으므로 앞의 두 개만 나눈다
+    parts = data.strip().split(",", 2)
+    if len(parts) != 3:
+        raise ProtocolError(f"expected product_name,desired_price,product_link: {data!r}")
+    product_name, desired_price, product_link = (part.strip() for part in parts)
+    try:
+        desired_price = int(desired_price)
+    except ValueError:
+        raise ProtocolError(f"invalid desired_price: {desired_price!r}")
+    return product_name, desired_price, product_link
+
+
+def require(message, *fields):
+    missing = [field for field in fields if field not in message]
+    if missing:
+        raise ProtocolError(f"{message['type']} requires {', '.join(missing)}")
+    return [message[field] for field in fields]
+
+
+class MessageReader:
+    # TCP 조각을 모아 완성된 줄만 메시지로 돌려준다 (한 조각에 여러 메시지/메시지가 여러 조각이어도 처리)
+    # 최대 길이를 넘는 메시지는 ProtocolError를 던진다
+    def __init__(self, max_message_bytes=MAX_MESSAGE_BYTES):
+        self.max_message_bytes = max_message_bytes
+        self.buffer = bytearray()
+        self.scanned = 0    # 줄바꿈이 없다고 확인한 앞부분 (큰 메시지가 여러 조각으로 와도 처음부터 다시 찾지 않는다)
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        start = 0
+        while True:
+            end = self.buffer.find(b"\n", max(start, self.scanned))
+            if end == -1:
+                break
+            line = bytes(self.buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                # 잘못된 줄은 ProtocolError 객체로 돌려주고 다음 메시지는 계속 처리
+                try:
+                    messages.append(decode_message(line))
+                except ProtocolError as e:
+                    messages.append(e)
+        del self.buffer[:start]
+        self.scanned = len(self.buffer)
+        if len(self.buffer) > self.max_message_bytes:
+            raise ProtocolError("message too long")
+        return messages
@@ -0,0 +1,116 @@
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 쿠팡 상품 URL에서 상품을 구분하는 쿼리 파라미터 (나머지는 검색어/추적용)
+COUPANG_PRODUCT_PARAMS = ("itemId", "vendorItemId")
+
+
+def normalize_url(product_link):
+    # 같은 상품을 가리키는 URL을 하나의 키로 정규화
+    parts = urlsplit(product_link.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = parts.netloc.lower()
+    path = parts.path.rstrip("/") or "/"
+
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if host.endswith("coupang.com"):
+        query = [(key, value) for key, value in query if key in COUPANG_PRODUCT_PARAMS]
+    query.sort()
+
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+class Subscription:
+    __slots__ = ("client", "product_name", "desired_price", "alerted")
+
+    def __init__(self, client, product_name, desired_price):
+        self.client = client
+        self.product_name = product_name
+        self.desired_price = desired_price
+        self.alerted = False    # 알림을 보낸 뒤 가격이 다시 오르기 전까지 True (alerts.ThresholdIndex)
+
+
+class SubscriptionRegistry:
+    # 정규화된 상품 URL 하나당 감시(watch) 하나만 두고, 구독한 클라이언트들에게 결과를 나눠준다
+    def __init__(self, create_watch):
+        self.create_watch = create_watch
+        self.watches = {}
+        self.client_keys = {}       # 클라이언트별 구독 중인 상품 키 (연결 종료 시 전체 해제용)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.watches)
+
+    def subscribe(self, client, product_name, desired_price, product_link):
+        key = normalize_url(product_link)
+        subscription = Subscription(client, product_name, desired_price)
+        with self._lock:
+            watch = self.watches.get(key)
+            created = watch is None
+            if created:
+                watch = self.create_watch(product_name, key)
+                self.watches[key] = watch
+            watch.add_subscriber(subscription)
+            self.client_keys.setdefault(client, set()).add(key)
+        return watch, created
+
+    def subscribe_many(self, client, entries):
+        # 대량 구독: entries는 이미 정규화된 (상품명, 구매희망가격, 키), 잠금 한 번에 등록하고 새로 만든 감시 목록을 돌려준다
+        created = []
+        with self._lock:
+            keys = self.client_keys.setdefault(client, set())
+            for product_name, desired_price, key in entries:
+                watch = self.watches.get(key)
+                if watch is None:
+                    watch = self.watches[key] = self.create_watch(product_name, key)
+                    created.append(watch)
+                watch.add_subscriber(Subscription(client, product_name, desired_price))
+                keys.add(key)
+        return created
+
+    def client_products(self, client):
+        # 클라이언트가 구독 중인 상품 {정규화된 키: 그 클라이언트가 붙인 상품명}
+        with self._lock:
+            products = {}
+            for key in self.client_keys.get(client, ()):
+                watch = self.watches.get(key)
+                subscription = watch.subscribers.get(client) if watch is not None else None
+                if subscription is not None:
+                    products[key] = subscription.product_name
+            return products
+
+    def restore(self, watches):
+        # 재시작 때 저장된 감시를 한꺼번에 등록 (구독자는 클라이언트가 다시 연결해서 채운다)
+        with self._lock:
+            for watch in watches:
+                self.watches.setdefault(watch.product_link, watch)
+
+    def drop_unsubscribed(self):
+        # 복구된 뒤에도 아무도 다시 구독하지 않은 감시를 정리
+        with self._lock:
+            stopped = [watch for watch in self.watches.values() if not len(watch.subscribers)]
+            for watch in stopped:
+                del self.watches[watch.product_link]
+                watch.stop()
+        return stopped
+
+    def unsubscribe(self, client, product_link=None):
+        # product_link가 없으면 해당 클라이언트의 모든 구독을 해제
+        with self._lock:
+            if product_link is None:
+                keys = self.client_keys.pop(client, ())
+            else:
+                keys = [normalize_url(product_link)]
+                self.client_keys.get(client, set()).discard(keys[0])
+            stopped = []
+            for key in keys:
+                watch = self.watches.get(key)
+                if watch is None:
+                    continue
+                if watch.remove_subscriber(client) == 0:
+                    # 구독자가 없는 감시는 스케줄/감시 목록에서 제외
+                    # 잠금 안에서 해야 그사이 같은 상품을 새로 구독한 감시가 저장된 목록에서 지워지지 않는다
+                    del self.watches[key]
+                    watch.stop()
+                    stopped.append(watch)
+        return stopped
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+
+from extractor import StreamingExtractor, extract_price
+from fetcher import get_fetcher
+from metrics import get_metrics
+
+PARSE_SECONDS = get_metrics().histogram("parse_seconds", "price extraction time for pages that were parsed")
+# not_modified: 304, region_hit: 가격 영역 해시가 같아 파싱 생략, miss: 파싱
+CACHE_RESULTS = get_metrics().counter("response_cache_total", "fetched pages by cache result", label="result")
+
+
+class CacheEntry:
+    __slots__ = ("etag", "last_modified", "region_hash", "price", "body_bytes", "parse_seconds")
+
+    def __init__(self, etag, last_modified, region_hash, price, body_bytes, parse_seconds):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.region_hash = region_hash
+        self.price = price
+        self.body_bytes = body_bytes
+        self.parse_seconds = parse_seconds
+
+
+class ResponseCache:
+    # product_link별로 ETag/Last-Modified와 가격 영역 해시를 기억해서
+    # 바뀌지 않은 페이지는 다운로드(304) 또는 파싱(해시 일치)을 건너뛴다
+    def __init__(self, fetcher=None, extract=extract_price):
+        self.fetcher = fetcher or get_fetcher()
+        self.extract = extract
+        self.locator = StreamingExtractor()
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.not_modified = 0
+        self.region_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.parse_seconds_saved = 0.0
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is not None and entry.price is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def region_hash(self, html):
+        # 가격 태그부터 짝이 맞는 닫는 태그까지 (가격이 바뀌면 이 구간이 바뀐다, 사이 markup 길이와 무관)
+        _, match, end = self.locator.element(html)
+        if end is None:
+            return None
+        region = html[match.start():end]
+        return hashlib.blake2b(region.encode(), digest_size=16).digest()
+
+    def fetch_price(self, product_link, remember=True):
+        # remember=False: 감시하지 않는 상품 (query로 한 번 조회)은 캐시 항목을 새로 만들지 않는다
+        entry = self.entries.get(product_link)
+        res = self.fetcher.get(product_link, headers=self.conditional_headers(entry))
+
+        if res.status_code == 304 and entry is not None:
+            with self._lock:
+                self.requests += 1
+                self.not_modified += 1
+                self.bytes_saved += entry.body_bytes
+                self.parse_seconds_saved += entry.parse_seconds
+            CACHE_RESULTS.inc(label="not_modified")
+            return entry.price
+
+        html = res.text
+        etag = res.headers.get("ETag")
+        last_modified = res.headers.get("Last-Modified")
+        region_hash = self.region_hash(html)
+
+        if entry is not None and region_hash is not None and region_hash == entry.region_hash:
+            # 가격 영역이 같으면 파싱하지 않고 마지막 가격을 재사용
+            entry.etag, entry.last_modified = etag, last_modified
+            with self._lock:
+                self.requests += 1
+                self.region_hits += 1
+                self.parse_seconds_saved += entry.parse_seconds
+            CACHE_RESULTS.inc(label="region_hit")
+            return entry.price
+
+        started = time.perf_counter()
+        price = self.extract(html)
+        parse_seconds = time.perf_counter() - started
+        PARSE_SECONDS.observe(parse_seconds)
+        CACHE_RESULTS.inc(label="miss")
+        governor = getattr(self.fetcher, "governor", None)
+        if governor is not None:
+            # 가격 태그가 없는 200 응답이 계속되면 봇 확인 페이지로 보고 속도를 줄인다
+            governor.record_parse(product_link, price is not None)
+
+        if remember or entry is not None:
+            self.entries[product_link] = CacheEntry(etag, last_modified, region_hash if price is not None else None,
+                                                    price, len(res.content), parse_seconds)
+        with self._lock:
+            self.requests += 1
+            self.misses += 1
+        return price
+
+    def forget(self, product_link):
+        # 감시를 멈춘 상품의 항목을 지운다 (이후 query는 remember=False라 다시 만들지 않는다)
+        self.entries.pop(product_link, None)
+
+    def hit_rate(self):
+        if self.requests == 0:
+            return 0.0
+        return (self.not_modified + self.region_hits) / self.requests
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "region_hits": self.region_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "bytes_saved": self.bytes_saved,
+            "parse_seconds_saved": self.parse_seconds_saved,
+        }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def next_hour_boundary(now):
+    current = time.localtime(now)
+    return now - current.tm_min * 60 - current.tm_sec - (now % 1) + HOUR
+
+
+def next_daily_time(now, at):
+    hour, minute = (int(part) for part in at.split(":"))
+    current = time.localtime(now)
+    target = time.mktime((current.tm_year, current.tm_mon, current.tm_mday, hour, minute, 0, 0, 0, -1))
+    if target <= now:
+        target += DAY
+    return target
+
+
+class _Job:
+    __slots__ = ("key", "callback", "daily_at", "generation", "interval")
+
+    def __init__(self, key, callback, daily_at, generation, interval=None):
+        self.key = key
+        self.callback = callback
+        self.daily_at = daily_at
+        self.generation = generation
+        self.interval = interval    # 정각 슬롯 대신 실행할 때마다 다음 간격(초)을 돌려주는 함수
+
+
+class HourlyScheduler:
+    # 모든 아이템의 정각 작업을 하나의 힙으로 관리한다.
+    # 힙 원소: (실행시각, 순번, 슬롯, 세대, 키) / 취소는 세대 비교로 지연 삭제
+    def __init__(self, jitter_seconds=0, clock=time.time, rng=None):
+        self.jitter_seconds = jitter_seconds
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._heap = []
+        self._jobs = {}
+        self._counter = itertools.count()
+        self._generations = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.last_tick_lag = 0.0
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _push(self, job, now, first_due=None):
+        if first_due is not None:
+            # 첫 실행 시각을 직접 정한 경우 (재시작 후 분산 갱신), 이후는 평소대로
+            slot = due = first_due
+        elif job.interval is not None:
+            slot = due = now + job.interval()
+        elif job.daily_at is None:
+            slot = next_hour_boundary(now)
+            # 정각에 요청이 몰리지 않도록 슬롯 안에서 임의로 분산
+            due = slot + (self.rng.uniform(0, self.jitter_seconds) if self.jitter_seconds else 0)
+        else:
+            slot = due = next_daily_time(now, job.daily_at)
+        heapq.heappush(self._heap, (due, next(self._counter), slot, job.generation, job.key))
+
+    def every_hour(self, key, callback, first_due=None):
+        self._add(key, callback, None, first_due)
+
+    def every_interval(self, key, callback, interval, first_due=None):
+        # interval(): 다음 실행까지의 초 (적응형 크롤링 간격), 실행할 때마다 다시 묻는다
+        self._add(key, callback, None, first_due, interval)
+
+    def every_day_at(self, key, at, callback):
+        self._add(key, callback, at)
+
+    def _add(self, key, callback, daily_at, first_due=None, interval=None):
+        with self._lock:
+            job = _Job(key, callback, daily_at, next(self._generations), interval)
+            self._jobs[key] = job
+            self._push(job, self.clock(), first_due)
+
+    def remove(self, key):
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def next_due(self):
+        with self._lock:
+            self._discard_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def _discard_cancelled(self):
+        heap = self._heap
+        while heap:
+            job = self._jobs.get(heap[0][4])
+            if job is not None and job.generation == heap[0][3]:
+                return
+            heapq.heappop(heap)
+
+    def pop_due(self, now=None):
+        # 실행할 작업을 슬롯별 배치로 묶어서 반환 {slot: [callback, ...]}
+        now = self.clock() if now is None else now
+        batches = {}
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                due, _, slot, generation, key = heapq.heappop(heap)
+                job = self._jobs.get(key)
+                if job is None or job.generation != generation:
+                    continue
+                self.last_tick_lag = now - due
+                batches.setdefault(slot, []).append(job.callback)
+                # 다음 슬롯으로 재등록 (슬롯 기준으로 계산해서 밀리지 않게 함)
+                self._push(job, max(now, slot))
+        return batches
+
+    def run_pending(self, dispatch):
+        batches = self.pop_due()
+        for slot in sorted(batches):
+            dispatch(slot, batches[slot])
+        return sum(len(batch) for batch in batches.values())
+
+    def run_forever(self, dispatch, max_sleep=1.0):
+        while not self._stop.is_set():
+            self.run_pending(dispatch)
+            due = self.next_due()
+            wait = max_sleep if due is None else min(max_sleep, max(0.0, due - self.clock()))
+            self._stop.wait(wait)
+
+    def start(self, dispatch, max_sleep=1.0):
+        thread = threading.Thread(target=self.run_forever, args=(dispatch, max_sleep), daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
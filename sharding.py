@@ -0,0 +1,413 @@
+import hashlib
+import itertools
+import multiprocessing
+import threading
+import time
+from bisect import bisect, insort
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import wait
+
+from governor import CircuitOpenError, get_governor, set_governor
+from response_cache import get_response_cache
+
+# 부모 <-> 워커 파이프 메시지
+#   부모 -> 워커: (FETCH, [link, ...]), (STOP,), (GRANT, 요청 번호, 기다릴 초), (REFUSED, 요청 번호, host, retry_in)
+#   워커 -> 부모: (PRICE, link, price, ts), (ERROR, link, message), (BLOCKED, link, message), (RESERVE, 요청 번호, url),
+#                 (CHECK, 요청 번호, url), (STATUS, url, status_code, retry_after), (PARSED, url, found)
+FETCH = "fetch"
+STOP = "stop"
+PRICE = "price"
+ERROR = "error"
+BLOCKED = "blocked"     # 차단 중이라 건너뜀 (CircuitOpenError)
+# 요청 속도 제한은 부모의 governor 하나로 (워커 수와 상관없이 호스트별 속도가 전체 합, 한 워커가 본 429/403이 모두에 적용)
+RESERVE = "reserve"
+CHECK = "check"
+GRANT = "grant"
+REFUSED = "refused"
+STATUS = "status"
+PARSED = "parsed"
+
+# 상품이 워커 사이에 고르게 나뉘도록 워커 하나당 링에 올리는 가상 노드 수
+REPLICAS = 64
+
+# 시작 후 이 시간 안에 죽은 워커는 바로 다시 띄우지 않고 RESPAWN_BACKOFF초부터 두 배씩 (MAX_RESPAWN_BACKOFF까지) 기다린다
+# (계속 죽는 워커가 재시작을 반복하지 않도록, 그래도 워커가 모두 죽은 채로 남지 않도록)
+MIN_UPTIME = 10.0
+RESPAWN_BACKOFF = 10.0
+MAX_RESPAWN_BACKOFF = 300.0
+
+
+def ring_hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    # 일관된 해싱: 워커가 빠지거나 추가되면 그 워커 몫의 상품만 옮겨 간다
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        self.replicas = replicas
+        self.points = []    # (해시, 노드) 정렬 리스트
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len({node for _, node in self.points})
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            insort(self.points, (ring_hash(f"{node}#{replica}"), node))
+
+    def remove(self, node):
+        self.points = [point for point in self.points if point[1] != node]
+
+    def node_for(self, key):
+        if not self.points:
+            return None
+        index = bisect(self.points, (ring_hash(key),)) % len(self.points)
+        return self.points[index][1]
+
+
+class GovernorClient:
+    # 워커 프로세스의 governor: 토큰 예약과 응답 결과를 파이프로 부모의 RateGovernor에 맡긴다 (RateGovernor와 같은 메서드)
+    def __init__(self, send):
+        self.send = send
+        self._ids = itertools.count()
+        self._pending = {}      # 요청 번호 -> [Event, 응답]
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def reserve(self, url):
+        return self._ask(RESERVE, url)
+
+    def check(self, url):
+        self._ask(CHECK, url)
+
+    def _ask(self, kind, url):
+        # 부모에 묻고 GRANT가 오면 그 값을, REFUSED면 CircuitOpenError
+        done = threading.Event()
+        with self._lock:
+            if self.closed:
+                raise OSError("shard worker is stopping")
+            request_id = next(self._ids)
+            waiter = self._pending[request_id] = [done, None]
+        try:
+            self.send((kind, request_id, url))
+        except OSError:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise
+        done.wait()
+        reply = waiter[1]
+        if reply[0] == REFUSED:
+            raise CircuitOpenError(reply[2], reply[3])
+        if reply[0] != GRANT:
+            raise OSError("shard worker is stopping")
+        return reply[2]
+
+    def acquire(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+            self.check(url)
+
+    def record_status(self, url, status_code, retry_after=None):
+        self.send((STATUS, url, status_code, retry_after))
+
+    def record_parse(self, url, found):
+        self.send((PARSED, url, found))
+
+    def resolve(self, message):
+        # 워커의 수신 루프가 받은 GRANT/REFUSED를 기다리는 스레드에 넘긴다
+        with self._lock:
+            waiter = self._pending.pop(message[1], None)
+        if waiter is not None:
+            waiter[1] = message
+            waiter[0].set()
+
+    def close(self):
+        # 더 이상 답이 오지 않으므로 기다리는 스레드를 모두 깨운다
+        with self._lock:
+            self.closed = True
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter[1] = (STOP,)
+            waiter[0].set()
+
+
+def _fetch_price(product_link):
+    # 워커 프로세스마다 자기 Fetcher/ResponseCache를 쓴다 (같은 상품은 늘 같은 워커라 캐시가 유지됨)
+    return get_response_cache().fetch_price(product_link)
+
+
+def worker_main(conn, fetch_price=None, threads=8):
+    # 워커 프로세스: 받은 링크를 스레드풀로 가져와 파싱하고 결과를 파이프로 바로 돌려보낸다
+    fetch_price = fetch_price or _fetch_price
+    send_lock = threading.Lock()
+    pool = ThreadPoolExecutor(max_workers=threads)
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    # 이 프로세스의 Fetcher(get_fetcher)가 쓰는 governor를 부모로 보내는 GovernorClient로
+    governor = GovernorClient(send)
+    set_governor(governor)
+
+    def run(product_link):
+        try:
+            message = (PRICE, product_link, fetch_price(product_link), time.time())
+        except CircuitOpenError as e:
+            message = (BLOCKED, product_link, str(e))
+        except Exception as e:
+            message = (ERROR, product_link, str(e))
+        try:
+            send(message)
+        except OSError:
+            pass
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == STOP:
+            break
+        if message[0] in (GRANT, REFUSED):
+            governor.resolve(message)
+            continue
+        for product_link in message[1]:
+            pool.submit(run, product_link)
+    governor.close()
+    pool.shutdown(wait=True)
+    conn.close()
+
+
+class _Worker:
+    __slots__ = ("slot", "process", "conn", "send_lock", "inflight", "started_at")
+
+    def __init__(self, slot, process, conn):
+        self.slot = slot
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.inflight = set()
+        self.started_at = time.monotonic()
+
+
+class ShardPool:
+    # PriceServer는 소켓만 맡고, 상품 크롤링/파싱은 product_link 해시로 고른 워커 프로세스가 한다 (GIL 분산)
+    # 워커가 죽으면 링에서 빼고 처리 중이던 상품을 남은 워커에 다시 나눈 뒤, 같은 자리에 새 워커를 띄운다
+    # on_price(link, price, ts), on_error(link, message, blocked): 워커의 크롤링 결과 (받는 스레드에서 호출)
+    # on_orphaned(links): 마지막 워커가 죽어 맡길 곳이 없는 처리 중이던 상품
+    # governor: 모든 워커의 요청 속도를 함께 제한하는 RateGovernor (기본은 이 프로세스의 get_governor())
+    def __init__(self, workers, on_price, on_error=None, fetch_price=None, threads_per_worker=8, respawn=True,
+                 replicas=REPLICAS, governor=None, on_orphaned=None):
+        self.context = multiprocessing.get_context("spawn")
+        self.on_price = on_price
+        self.on_error = on_error
+        self.on_orphaned = on_orphaned
+        self.governor = governor or get_governor()
+        self.fetch_price = fetch_price      # 워커에서 실행할 함수 (피클 가능한 모듈 수준 함수)
+        self.threads_per_worker = threads_per_worker
+        self.respawn = respawn
+        self.ring = HashRing(replicas=replicas)
+        self.workers = {}
+        self.respawn_at = {}    # 빈 자리 -> 다시 띄울 시각 (time.monotonic)
+        self.backoff = {}       # 빈 자리 -> 다음에 기다릴 초
+        self._lock = threading.Lock()
+        self.running = True
+
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.deaths = 0
+        self.rebalanced = 0
+
+        for slot in range(workers):
+            self._spawn(slot)
+        self._receiver = threading.Thread(target=self._receive, daemon=True)
+        self._receiver.start()
+
+    def _spawn(self, slot):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=worker_main, args=(child_conn, self.fetch_price,
+                                                                 self.threads_per_worker), daemon=True)
+        process.start()
+        child_conn.close()
+        self.workers[slot] = _Worker(slot, process, parent_conn)
+        self.ring.add(slot)
+
+    def owner(self, product_link):
+        return self.ring.node_for(product_link)
+
+    def submit(self, product_links):
+        # 상품들을 담당 워커별로 묶어서 한 번에 보낸다
+        if isinstance(product_links, str):
+            product_links = [product_links]
+        batches = {}
+        with self._lock:
+            for product_link in product_links:
+                slot = self.ring.node_for(product_link)
+                if slot is None:
+                    raise RuntimeError("no live shard workers")
+                worker = self.workers[slot]
+                worker.inflight.add(product_link)
+                batches.setdefault(worker, []).append(product_link)
+            self.submitted += sum(len(batch) for batch in batches.values())
+        for worker, batch in batches.items():
+            try:
+                with worker.send_lock:
+                    worker.conn.send((FETCH, batch))
+            except OSError:
+                # 보내는 중에 워커가 죽었으면 처리 중이던 상품과 함께 재분배
+                self._handle_death(worker.slot, worker)
+
+    def _respawn_due(self):
+        # 일찍 죽어서 기다리던 자리에 새 워커를 띄운다
+        if not self.respawn_at:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for slot, due in list(self.respawn_at.items()):
+                if due <= now and self.running:
+                    del self.respawn_at[slot]
+                    self._spawn(slot)
+                    print(f"Respawned shard worker {slot} ({len(self.ring)} workers)")
+
+    def _receive(self):
+        while self.running:
+            self._respawn_due()
+            with self._lock:
+                workers = {worker.conn: worker for worker in self.workers.values()}
+            if not workers:
+                time.sleep(0.1)
+                continue
+            try:
+                ready = wait(list(workers), timeout=0.5)
+            except (OSError, ValueError):
+                # 기다리는 사이 다른 스레드가 죽은 워커의 파이프를 닫은 경우
+                continue
+            for conn in ready:
+                worker = workers[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    self._handle_death(worker.slot, worker)
+                    continue
+                self._dispatch(worker, message)
+            # 파이프는 살아 있지만 프로세스가 끝난 경우
+            for worker in workers.values():
+                if self.workers.get(worker.slot) is not worker or worker.process.is_alive():
+                    continue
+                try:
+                    pending = worker.conn.poll()
+                except OSError:
+                    pending = False
+                # 남은 결과를 다 읽은 뒤에 정리
+                if not pending:
+                    self._handle_death(worker.slot, worker)
+
+    def _dispatch(self, worker, message):
+        if message[0] in (RESERVE, CHECK, STATUS, PARSED):
+            self._govern(worker, message)
+            return
+        with self._lock:
+            worker.inflight.discard(message[1])
+            self.completed += 1
+        if message[0] == PRICE:
+            self.on_price(message[1], message[2], message[3])
+        else:
+            with self._lock:
+                self.errors += 1
+            if self.on_error is not None:
+                self.on_error(message[1], message[2], message[0] == BLOCKED)
+            elif message[0] != BLOCKED:
+                # 차단 중에 건너뛴 것은 상품마다 출력하지 않는다 (governor가 차단/복구를 한 번씩 출력)
+                print(f"Exception occurred during crawling {message[1]}: {message[2]}")
+
+    def _govern(self, worker, message):
+        # 워커의 Fetcher 대신 부모 governor에 예약/기록 (reserve는 기다리지 않고 기다릴 초만 돌려준다)
+        if message[0] == STATUS:
+            self.governor.record_status(*message[1:])
+            return
+        if message[0] == PARSED:
+            self.governor.record_parse(*message[1:])
+            return
+        try:
+            if message[0] == CHECK:
+                self.governor.check(message[2])
+                reply = (GRANT, message[1], 0.0)
+            else:
+                reply = (GRANT, message[1], self.governor.reserve(message[2]))
+        except CircuitOpenError as e:
+            reply = (REFUSED, message[1], e.host, e.retry_in)
+        try:
+            with worker.send_lock:
+                worker.conn.send(reply)
+        except OSError:
+            pass
+
+    def _handle_death(self, slot, worker):
+        with self._lock:
+            if self.workers.get(slot) is not worker:
+                return
+            del self.workers[slot]
+            self.ring.remove(slot)
+            self.deaths += 1
+            orphaned = list(worker.inflight)
+            self.submitted -= len(orphaned)
+            self.rebalanced += len(orphaned)
+            uptime = time.monotonic() - worker.started_at
+            delay = None
+            if self.running and self.respawn:
+                if uptime >= MIN_UPTIME:
+                    self.backoff[slot] = RESPAWN_BACKOFF
+                    self._spawn(slot)
+                else:
+                    delay = self.backoff.get(slot, RESPAWN_BACKOFF)
+                    self.backoff[slot] = min(MAX_RESPAWN_BACKOFF, delay * 2)
+                    self.respawn_at[slot] = time.monotonic() + delay
+        worker.conn.close()
+        print(f"Shard worker {slot} died (exit code {worker.process.exitcode}), "
+              f"rebalancing {len(orphaned)} in-flight products over {len(self.ring)} workers"
+              + (f", respawning in {delay:.0f}s" if delay is not None else ""))
+        if orphaned and self.running:
+            try:
+                self.submit(orphaned)
+            except RuntimeError:
+                # 남은 워커가 없으면 처리 중이던 상품을 돌려준다 (PriceServer는 직접 크롤링)
+                if self.on_orphaned is not None:
+                    self.on_orphaned(orphaned)
+
+    def alive(self):
+        with self._lock:
+            return len(self.workers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": len(self.workers),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "errors": self.errors,
+                "deaths": self.deaths,
+                "rebalanced": self.rebalanced,
+                "inflight": sum(len(worker.inflight) for worker in self.workers.values()),
+            }
+
+    def close(self, timeout=5.0):
+        self.running = False
+        with self._lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send((STOP,))
+            except OSError:
+                pass
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        self._receiver.join(timeout)
@@ -1,12 +1,14 @@
 import threading
 import socket
 import time
-import requests
 import schedule
-from bs4 import BeautifulSoup
 import openpyxl
 from concurrent.futures import ThreadPoolExecutor
 
+from extractor import extract_price
+from fetcher import get_fetcher
+from latest_price import get_latest_prices
+
 EXCEL_FILE = "price_data.xlsx"
 
 class ItemThread(threading.Thread):
@@ -24,18 +26,14 @@ class ItemThread(threading.Thread):
 
     def crawling_test(self):
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
-                "Accept-Language": "ko-KR,ko;q=0.8,en-US;q=0.5,en;q=0.3"
-            }
-            res = requests.get(self.product_link, headers=headers)
-            res.raise_for_status()
-
-            soup = BeautifulSoup(res.text, "html.parser")
-            price_element = soup.select_one(".total-price")
-
-            if price_element:
-                self.crawled_price = int(price_element.get_text(strip=True).replace(",", "").replace("원", ""))
+            # 공유 Fetcher (keep-alive 커넥션 풀, 호스트별 동시 요청 제한, 재시도)
+            res = get_fetcher().get(self.product_link)
+
+            price = extract_price(res.text)
+
+            if price is not None:
+                self.crawled_price = price
+                get_latest_prices().put(self.product_link, price)
                 self.client_socket.send(str(self.crawled_price).encode())
                 current_time = time.strftime("%H:%M")
                 self.hourly_prices.append(self.crawled_price)
@@ -84,8 +82,10 @@ class ItemThread(threading.Thread):
         workbook.close()
 
     def showCurrentPrice(self):
-        self.crawlingTest()
-        print(f"Current price: {self.crawled_price}")
+        # 매번 페이지를 받지 않고 최신 가격 캐시에서 답한다 (TTL이 지났을 때만 다시 가져옴)
+        latest = get_latest_prices().get(self.product_link)
+        self.crawled_price = latest["price"]
+        print(f"Current price: {self.crawled_price} (age {latest['age']}s)")
         self.client_socket.send(str(self.crawled_price).encode())
       
     def run(self):
@@ -0,0 +1,143 @@
+import contextlib
+import json
+import os
+import threading
+
+WATCH_FILE = "price_data.watches"
+
+# 저널이 이만큼 (그리고 스냅샷 상품 수만큼) 이상 길어지면 스냅샷을 새로 쓰고 저널을 비운다
+COMPACT_MIN_RECORDS = 10000
+
+ADDED = "+"
+REMOVED = "-"
+
+_MISSING = object()
+
+
+def watch_path_for(db_path):
+    # 가격 DB 옆에 둔다 (price_data.db -> price_data.watches)
+    return os.path.splitext(db_path)[0] + ".watches"
+
+
+class WatchLog:
+    # 감시 중인 상품 목록(product_link -> product_name)을 디스크에 남긴다
+    #   스냅샷(path): {"watches": [[link, name], ...]} JSON 하나, 임시 파일에 쓰고 os.replace로 교체
+    #   저널(path + ".journal"): 스냅샷 이후의 추가/삭제를 한 줄씩 (["+", link, name], ["-", link])
+    # 한 줄씩 바로 flush하므로 프로세스가 죽어도 남고, 스냅샷 교체와 close 때 fsync
+    def __init__(self, path=WATCH_FILE, compact_min_records=COMPACT_MIN_RECORDS):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_min_records = compact_min_records
+        self.watches = {}
+        self.journal = None
+        self.journal_records = 0
+        self.snapshot_records = 0
+        self.batching = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.watches)
+
+    def load(self):
+        # 스냅샷 + 저널을 읽어 감시 목록을 돌려주고, 바로 새 스냅샷으로 합친 뒤 저널을 다시 연다
+        with self._lock:
+            watches = {}
+            try:
+                with open(self.path, encoding="utf-8") as snapshot:
+                    watches.update(json.load(snapshot)["watches"])
+            except FileNotFoundError:
+                pass
+            replayed = 0
+            try:
+                with open(self.journal_path, encoding="utf-8") as journal:
+                    for line in journal:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # 마지막 줄이 쓰다 만 채로 끝났을 수 있다
+                            print(f"Skipping broken watch journal record: {line[:80]!r}")
+                            continue
+                        if record[0] == ADDED:
+                            watches[record[1]] = record[2]
+                        else:
+                            watches.pop(record[1], None)
+                        replayed += 1
+            except FileNotFoundError:
+                pass
+            self.watches = watches
+            if replayed or not os.path.exists(self.path):
+                self._compact()
+            else:
+                self.snapshot_records = len(watches)
+                self._open_journal()
+            return dict(watches)
+
+    def _open_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.journal_path, "a", encoding="utf-8")
+        self.journal_records = 0
+
+    def _append(self, record):
+        if self.journal is None:
+            self._open_journal()
+        self.journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if not self.batching:
+            self.journal.flush()
+        self.journal_records += 1
+        if self.journal_records >= max(self.compact_min_records, self.snapshot_records):
+            self._compact()
+
+    def add(self, product_link, product_name):
+        with self._lock:
+            if self.watches.get(product_link, _MISSING) == product_name:
+                return
+            self.watches[product_link] = product_name
+            self._append([ADDED, product_link, product_name])
+
+    @contextlib.contextmanager
+    def batch(self):
+        # 대량 등록: 안에서 추가한 줄은 나갈 때 한 번에 flush
+        with self._lock:
+            self.batching += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self.batching -= 1
+                if not self.batching and self.journal is not None:
+                    self.journal.flush()
+
+    def remove(self, product_link):
+        with self._lock:
+            if self.watches.pop(product_link, _MISSING) is _MISSING:
+                return
+            self._append([REMOVED, product_link])
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot:
+            snapshot.write(json.dumps({"watches": list(self.watches.items())}, ensure_ascii=False,
+                                      separators=(",", ":")))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temp_path, self.path)
+        self.snapshot_records = len(self.watches)
+        # 스냅샷이 교체된 뒤에만 저널을 비운다 (중간에 죽어도 스냅샷 + 저널로 복구)
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.journal_path, "w", encoding="utf-8")
+        self.journal_records = 0
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            if self.journal is not None:
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+                self.journal.close()
+                self.journal = None
+
@@ -0,0 +1,187 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import get_metrics
+
+SAMPLE = "sample"
+DAILY_AVERAGE = "daily"
+PRODUCT = "product"
+ROLLUP = "rollup"
+CHANGE = "change"
+BARRIER = "barrier"
+
+_STOP = object()
+
+# 트랜잭션 하나(재시도 포함)의 커밋 시간과 커밋한 기록 수
+FLUSH_SECONDS = get_metrics().histogram("persistence_flush_seconds", "persistence transaction time including retries")
+FLUSH_RECORDS = get_metrics().counter("persistence_records_total", "records committed to the price store")
+FLUSH_DROPPED = get_metrics().counter("persistence_dropped_total", "records dropped because the store rejected them")
+
+# 다른 연결이 쓰고 있어 잠긴 경우만 성공할 때까지 재시도 (읽기 전용 DB, 없는 테이블 같은 오류는 max_retries번까지만)
+TRANSIENT_ERRORS = ("SQLITE_BUSY", "SQLITE_LOCKED")
+
+
+def is_transient(error):
+    name = getattr(error, "sqlite_errorname", None)     # Python 3.11+
+    if name is not None:
+        return name.startswith(TRANSIENT_ERRORS)
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+class PersistenceWriter(threading.Thread):
+    # 모든 아이템이 기록을 큐에 넣으면 이 스레드 하나만 저장소에 쓴다.
+    # flush_interval마다 모인 기록을 하나의 트랜잭션으로 커밋하고, 큐가 가득 차면 넣는 쪽이 기다린다(backpressure)
+    def __init__(self, store, flush_interval=1.0, max_pending=100000, max_batch=50000, retry_delay=1.0,
+                 max_retries=5):
+        super(PersistenceWriter, self).__init__(daemon=True)
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.queue = queue.Queue(maxsize=max_pending)
+
+        self.committed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.backpressure_waits = 0
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # 저장이 밀리면 생산자(크롤링 스레드)를 늦춘다
+            self.backpressure_waits += 1
+            self.queue.put(record)
+
+    def try_put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.backpressure_waits += 1
+            return False
+
+    def add_sample(self, product_link, ts, price):
+        self.put((SAMPLE, product_link, ts, price))
+
+    def add_daily_average(self, product_link, day, average, *stats):
+        # stats: 최저, 최고, 수집 수, 누락 수 (집계 단계에서 함께 계산한 경우)
+        self.put((DAILY_AVERAGE, product_link, day, average) + stats)
+
+    def add_rollup(self, kind, start_day, end_day):
+        # 앞서 넣은 일별 통계가 커밋될 때 같은 트랜잭션에서 주/월 묶음을 다시 계산
+        self.put((ROLLUP, kind, start_day, end_day))
+
+    def add_change(self, seq, product_link, ts, price):
+        # change feed 번호와 함께 가격 변경 기록 (재연결한 클라이언트가 놓친 변경을 다시 받을 때 읽는다)
+        self.put((CHANGE, seq, product_link, ts, price))
+
+    def add_product(self, product_link, product_name):
+        self.put((PRODUCT, product_link, product_name))
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _collect(self):
+        # 첫 기록을 기다린 뒤 flush_interval 동안(또는 max_batch까지) 모은다, 기다리는 쪽(sync)이 있으면 바로 커밋
+        records = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(records) < self.max_batch and records[-1] is not _STOP and records[-1][0] != BARRIER:
+            remaining = deadline - time.monotonic()
+            try:
+                records.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _write(self, records):
+        samples = []
+        daily_averages = []
+        products = []
+        rollups = []
+        changes = []
+        for record in records:
+            kind = record[0]
+            if kind == SAMPLE:
+                samples.append(record[1:])
+            elif kind == DAILY_AVERAGE:
+                daily_averages.append(record[1:])
+            elif kind == ROLLUP:
+                rollups.append(record[1:])
+            elif kind == CHANGE:
+                changes.append(record[1:])
+            else:
+                products.append(record[1:])
+        self.store.write(samples, daily_averages, products, rollups, changes)
+
+    def _commit(self, records):
+        # 잠김(busy/locked)은 성공할 때까지 재시도 (기록을 버리지 않는다)
+        # 그 밖의 OperationalError(읽기 전용, 없는 테이블, 디스크 I/O)는 max_retries번 재시도한 뒤 배치를 버린다
+        # (저장소가 계속 거절해도 큐가 차서 크롤링 스레드가 모두 멈추지 않도록)
+        # 나머지 오류는 기록 자체가 잘못된 것이므로 배치를 반씩 나눠 다시 쓰고, 끝까지 실패하는 기록만 버린다
+        attempts = 0
+        while True:
+            try:
+                self._write(records)
+                return len(records)
+            except sqlite3.OperationalError as e:
+                self.failed_flushes += 1
+                attempts += 1
+                if not is_transient(e) and attempts > self.max_retries:
+                    self.dropped += len(records)
+                    FLUSH_DROPPED.inc(len(records))
+                    print(f"Dropping {len(records)} records after {attempts} failed persistence flushes: {e}")
+                    return 0
+                print(f"Exception occurred during persistence flush: {e}")
+                time.sleep(self.retry_delay)
+            except Exception as e:
+                self.failed_flushes += 1
+                if len(records) == 1:
+                    self.dropped += 1
+                    FLUSH_DROPPED.inc()
+                    print(f"Dropping record the price store rejected: {records[0]!r} ({e})")
+                    return 0
+                middle = len(records) // 2
+                return self._commit(records[:middle]) + self._commit(records[middle:])
+
+    def _flush(self, records):
+        barriers = [record[1] for record in records if record is not _STOP and record[0] == BARRIER]
+        records = [record for record in records if record is not _STOP and record[0] != BARRIER]
+
+        started = time.perf_counter()
+        committed = self._commit(records) if records else 0
+        FLUSH_SECONDS.observe(time.perf_counter() - started)
+        FLUSH_RECORDS.inc(committed)
+        self.committed += committed
+        self.flushes += 1
+        # 이 배치까지 커밋되기를 기다리는 쪽을 깨운다
+        for done in barriers:
+            done.set()
+
+    def run(self):
+        while True:
+            records = self._collect()
+            self._flush(records)
+            for _ in records:
+                self.queue.task_done()
+            if records[-1] is _STOP:
+                return
+
+    def flush(self):
+        # 지금까지 넣은 기록이 모두 커밋될 때까지 대기
+        self.queue.join()
+
+    def sync(self):
+        # 지금까지 넣은 기록이 커밋될 때까지만 대기 (flush와 달리 그 뒤에 계속 들어오는 기록은 기다리지 않는다)
+        done = threading.Event()
+        self.put((BARRIER, done))
+        done.wait()
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.join()